@@ -1,10 +1,9 @@
 from ext.code_highlight import RuleBasedHighlighter, HighlighterRegistry
 
 class PythonRBH(RuleBasedHighlighter):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-
-        from ext.code_highlight import HighlightRule
+    @classmethod
+    def build_rules(cls, rule_set):
+        from ext.code_highlight import HighlightRule, HighlightRegion, keyword_pattern
         from PyQt6.QtCore import QRegularExpression
         from PyQt6.QtGui import QTextCharFormat, QColor, QFont
 
@@ -20,35 +19,37 @@ class PythonRBH(RuleBasedHighlighter):
             "True", "try", "while", "with", "yield"
         ]
 
-        for keyword in keywords:
-            rule = HighlightRule(QRegularExpression(rf"\b{keyword}\b"), keyword_format)
-            self.add_rule(rule)
+        rule_set.add_rule(HighlightRule(QRegularExpression(keyword_pattern(keywords)), keyword_format))
 
         # Class name formatting
         class_format = QTextCharFormat()
         class_format.setForeground(QColor(139, 0, 139))  # Dark magenta
         class_format.setFontWeight(QFont.Weight.Bold)
-        self.add_rule(HighlightRule(QRegularExpression(r"\b[A-Z][a-zA-Z0-9_]*\b"), class_format))
+        rule_set.add_rule(HighlightRule(QRegularExpression(r"\b[A-Z][a-zA-Z0-9_]*\b"), class_format))
 
         # Function/method formatting
         function_format = QTextCharFormat()
         function_format.setForeground(QColor(0, 139, 139))  # Dark cyan
-        self.add_rule(HighlightRule(QRegularExpression("\\b[a-zA-Z_][a-zA-Z0-9_]*(?=\\()"), function_format))
+        rule_set.add_rule(HighlightRule(QRegularExpression("\\b[a-zA-Z_][a-zA-Z0-9_]*(?=\\()"), function_format))
 
         # String formatting
         string_format = QTextCharFormat()
         string_format.setForeground(QColor(163, 21, 21))  # Red-brown
-        self.add_rule(HighlightRule(QRegularExpression("\".*\""), string_format))
-        self.add_rule(HighlightRule(QRegularExpression("'.*'"), string_format))
+        rule_set.add_rule(HighlightRule(QRegularExpression("\".*\""), string_format))
+        rule_set.add_rule(HighlightRule(QRegularExpression("'.*'"), string_format))
+
+        # Multi-line string formatting
+        rule_set.add_region(HighlightRegion(QRegularExpression('"""'), QRegularExpression('"""'), string_format))
+        rule_set.add_region(HighlightRegion(QRegularExpression("'''"), QRegularExpression("'''"), string_format))
 
         # Comment formatting
         comment_format = QTextCharFormat()
         comment_format.setForeground(QColor(0, 128, 0))  # Green
-        self.add_rule(HighlightRule(QRegularExpression("#[^\n]*"), comment_format))
+        rule_set.add_rule(HighlightRule(QRegularExpression("#[^\n]*"), comment_format))
 
         # Number formatting
         number_format = QTextCharFormat()
         number_format.setForeground(QColor(255, 69, 0))  # Orange-red
-        self.add_rule(HighlightRule(QRegularExpression("\\b[0-9]+\\b"), number_format))
+        rule_set.add_rule(HighlightRule(QRegularExpression("\\b[0-9]+\\b"), number_format))
 
 HighlighterRegistry.get_instance().register(PythonRBH)
@@ -0,0 +1,95 @@
+import json
+import os
+import platform
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import logging
+logger = logging.getLogger(Path(__file__).name)
+
+# Params
+PROJECT_PATH = Path(__file__).parent.parent
+ASSETS_PATH = PROJECT_PATH / "assets"
+
+
+# Methods
+def create_offscreen_app():
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+    from PyQt6.QtWidgets import QApplication
+    return QApplication.instance() or QApplication(sys.argv[:1])
+
+
+def load_highlighters():
+    import ext.code_highlight
+    ext.code_highlight.HighlighterRegistry()
+    ext.code_highlight.TokenCache()
+
+    import utility.script
+    utility.script.SEARCH_PATH = ASSETS_PATH / "script"
+    utility.script.load_scripts()
+
+    import utility.grammar
+    utility.grammar.SEARCH_PATH = ASSETS_PATH / "grammar"
+    utility.grammar.load_grammars()
+
+
+def percentiles(samples: list[float], points: tuple[int, ...] = (50, 90, 99)) -> dict[str, float]:
+    if not samples:
+        return {}
+
+    ordered = sorted(samples)
+    ret = {f'p{point}': ordered[min(len(ordered) - 1, len(ordered) * point // 100)] for point in points}
+    ret['max'] = ordered[-1]
+    return ret
+
+
+def peak_rss_kb() -> int | None:
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def environment() -> dict:
+    from PyQt6.QtCore import PYQT_VERSION_STR, QT_VERSION_STR
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pyqt': PYQT_VERSION_STR,
+        'qt': QT_VERSION_STR,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+    }
+
+
+def write_report(report: dict, output: Path | None):
+    data = json.dumps(report, indent=2)
+    if output is None:
+        print(data)
+        return
+
+    with open(output, mode='w', encoding='utf-8') as f:
+        f.write(data)
+    logger.info("Report written to '%s'", output)
+
+
+def find_regressions(report: dict, baseline: dict, key_fields: tuple[str, ...], metric: str,
+                     tolerance: float, higher_is_better: bool) -> list[str]:
+    def key(result: dict) -> tuple:
+        return tuple(result[field] for field in key_fields)
+
+    baseline_results = {key(result): result for result in baseline.get('results', [])}
+    regressions = []
+    for result in report['results']:
+        base = baseline_results.get(key(result), None)
+        if base is None or not base.get(metric):
+            continue
+
+        ratio = result[metric] / base[metric]
+        regressed = ratio < 1 - tolerance if higher_is_better else ratio > 1 + tolerance
+        if regressed:
+            regressions.append(f"{key(result)}: {metric} {base[metric]:.6g} -> {result[metric]:.6g}")
+    return regressions
@@ -0,0 +1,191 @@
+import argparse
+import json
+import random
+import sys
+import tracemalloc
+from pathlib import Path
+from time import perf_counter
+
+from benchmark.common import create_offscreen_app, load_highlighters, percentiles, peak_rss_kb, environment, \
+    write_report, find_regressions, PROJECT_PATH
+
+import logging
+logger = logging.getLogger(Path(__file__).name)
+
+# Params
+DEFAULT_LINES = [1_000, 10_000, 100_000, 1_000_000]
+DEFAULT_TOLERANCE = 0.2
+SYNTHETIC_SEED = 0
+
+# Private params
+_WORDS = ['data', 'value', 'item', 'node', 'result', 'index', 'buffer', 'config', 'path', 'count']
+_KEYWORDS = ['if', 'for', 'while', 'return', 'yield', 'not', 'and', 'or', 'in', 'is']
+
+
+# Methods
+def __word(rnd: random.Random) -> str:
+    return f'{rnd.choice(_WORDS)}_{rnd.randint(0, 999)}'
+
+
+def synthetic_corpus(lines: int, seed: int = SYNTHETIC_SEED) -> str:
+    rnd = random.Random(seed)
+    out: list[str] = []
+    while len(out) < lines:
+        kind = rnd.randint(0, 9)
+        indent = ' ' * 4 * rnd.randint(0, 3)
+        if kind == 0:
+            out.append(f'class {__word(rnd).title()}(Base{rnd.randint(0, 9)}):')
+        elif kind == 1:
+            out.append(f'{indent}def {__word(rnd)}(self, {__word(rnd)}, {__word(rnd)}=None):')
+        elif kind == 2:
+            out.append(f'{indent}{__word(rnd)} = "{__word(rnd)} {rnd.randint(0, 10 ** 6)}"  # {__word(rnd)}')
+        elif kind == 3:
+            out.append(f'{indent}{rnd.choice(_KEYWORDS)} {__word(rnd)} {rnd.choice(_KEYWORDS)} {__word(rnd)}:')
+        elif kind == 4:
+            out.extend([f'{indent}"""', f'{indent}{__word(rnd)} {__word(rnd)} {__word(rnd)}', f'{indent}"""'])
+        elif kind == 5:
+            out.append('')
+        else:
+            out.append(f'{indent}{__word(rnd)} = {__word(rnd)}({rnd.randint(0, 1000)}, \'{__word(rnd)}\')')
+    return '\n'.join(out[:lines])
+
+
+def real_corpus(paths: list[Path], lines: int) -> str:
+    source: list[str] = []
+    for path in paths:
+        with open(path, mode='r', encoding='utf-8', errors='replace') as f:
+            source.extend(f.read().splitlines())
+    if not source:
+        return ''
+
+    repeats = lines // len(source) + 1
+    return '\n'.join((source * repeats)[:lines])
+
+
+def __timed_type(highlighter_type: type, samples: list[float]) -> type:
+    def highlightBlock(self, text):
+        start = perf_counter()
+        highlighter_type.highlightBlock(self, text)
+        samples.append(perf_counter() - start)
+
+    return type(f'Timed{highlighter_type.__name__}', (highlighter_type,), {'highlightBlock': highlightBlock})
+
+
+def __create_highlighter(highlighter_type: type, document):
+    highlighter = highlighter_type(None)
+    # Measure the engine itself: no worker pool and no lazy viewport mode
+    highlighter.background = False
+    highlighter.lazy = False
+    highlighter.setDocument(document)
+    return highlighter
+
+
+def run_case(highlighter_type: type, corpus_name: str, text: str, lines: int, measure_memory: bool) -> dict:
+    from PyQt6.QtGui import QTextDocument
+    from ext.code_highlight import TokenCache
+
+    document = QTextDocument()
+    document.setPlainText(text)
+
+    TokenCache.get_instance().clear()
+    samples: list[float] = []
+    highlighter = __create_highlighter(__timed_type(highlighter_type, samples), document)
+    start = perf_counter()
+    highlighter.rehighlight()
+    seconds = perf_counter() - start
+    highlighter.setDocument(None)
+
+    result = {
+        'highlighter': highlighter_type.__name__,
+        'corpus': corpus_name,
+        'lines': lines,
+        'seconds': seconds,
+        'lines_per_sec': lines / seconds if seconds else 0.0,
+        'block_latency_us': {k: v * 1e6 for k, v in percentiles(samples).items()},
+        'token_cache': TokenCache.get_instance().stats().__dict__,
+        'peak_traced_bytes': None,
+        'peak_rss_kb': None,
+    }
+
+    if measure_memory:
+        TokenCache.get_instance().clear()
+        tracemalloc.start()
+        highlighter = __create_highlighter(highlighter_type, document)
+        highlighter.rehighlight()
+        result['peak_traced_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        highlighter.setDocument(None)
+    result['peak_rss_kb'] = peak_rss_kb()
+
+    logger.info("%s on %s x%s: %.0f lines/s", result['highlighter'], corpus_name, lines, result['lines_per_sec'])
+    return result
+
+
+def __parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='python -m benchmark.highlight',
+                                     description='Headless syntax highlighting throughput benchmark')
+    parser.add_argument('--lines', type=int, nargs='+', default=DEFAULT_LINES,
+                        help='corpus sizes in lines')
+    parser.add_argument('--highlighter', nargs='+', default=None,
+                        help='registered highlighter names, all of them by default')
+    parser.add_argument('--corpus', type=Path, nargs='*', default=None,
+                        help='source files of the real corpus, project python files by default')
+    parser.add_argument('--no-synthetic', action='store_true', help='skip the synthetic corpus')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--output', type=Path, default=None, help='JSON report path, stdout by default')
+    parser.add_argument('--baseline', type=Path, default=None, help='JSON report to compare lines/sec with')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='allowed relative slowdown against the baseline')
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    import utility.log
+    utility.log.setup_logging()
+    args = __parse_args(sys.argv[1:] if argv is None else argv)
+
+    _app = create_offscreen_app()
+    load_highlighters()
+    from ext.code_highlight import HighlighterRegistry, RuleBasedHighlighter
+
+    registry = HighlighterRegistry.get_instance()
+    names = args.highlighter or registry.names()
+    highlighter_types = [RuleBasedHighlighter] if args.highlighter is None else []
+    for name in names:
+        highlighter_type = registry.get(name)
+        if highlighter_type is None:
+            logger.error("Highlighter '%s' is not registered", name)
+            return 2
+        highlighter_types.append(highlighter_type)
+
+    corpus_paths = args.corpus
+    if corpus_paths is None:
+        corpus_paths = sorted(p for p in PROJECT_PATH.rglob('*.py') if 'venv' not in p.parts)
+
+    results = []
+    for lines in args.lines:
+        corpora = [('real', real_corpus(corpus_paths, lines))]
+        if not args.no_synthetic:
+            corpora.append(('synthetic', synthetic_corpus(lines)))
+
+        for corpus_name, text in corpora:
+            for highlighter_type in highlighter_types:
+                results.append(run_case(highlighter_type, corpus_name, text, lines, not args.no_memory))
+
+    report = {'benchmark': 'highlight', 'environment': environment(), 'results': results}
+    write_report(report, args.output)
+
+    if args.baseline is not None:
+        with open(args.baseline, mode='r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = find_regressions(report, baseline, ('highlighter', 'corpus', 'lines'), 'lines_per_sec',
+                                       args.tolerance, higher_is_better=True)
+        for regression in regressions:
+            logger.error("Regression %s", regression)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,139 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+from time import perf_counter
+
+from benchmark.common import create_offscreen_app, load_highlighters, percentiles, environment, write_report, \
+    find_regressions
+from benchmark.highlight import synthetic_corpus
+
+import logging
+logger = logging.getLogger(Path(__file__).name)
+
+# Params
+DEFAULT_LINES = [10_000, 100_000, 1_000_000]
+DEFAULT_FRAMES = 300
+DEFAULT_TOLERANCE = 0.2
+VIEW_WIDTH_PX = 1000
+VIEW_HEIGHT_PX = 800
+# Lines scrolled per frame: a wheel notch, a page, and a scrollbar drag crossing the whole file
+MODES = ['wheel', 'page', 'drag']
+
+
+# Methods
+def __mode_step(mode: str, lines: int, page: int, frames: int) -> int:
+    if mode == 'wheel':
+        return 3
+    if mode == 'page':
+        return page
+    return max(1, lines // frames)
+
+
+def run_case(app, text: str, lines: int, mode: str, frames: int, highlighter_name: str | None) -> dict:
+    from window.components.code_editor import CodeEditor
+
+    editor = CodeEditor()
+    editor.resize(VIEW_WIDTH_PX, VIEW_HEIGHT_PX)
+    editor.setPlainText(text)
+    highlighter = None
+    if highlighter_name is not None:
+        from ext.code_highlight import HighlighterRegistry
+        highlighter = HighlighterRegistry.get_instance().get(highlighter_name)(editor.document())
+    editor.show()
+    app.processEvents()
+
+    scroll_bar = editor.verticalScrollBar()
+    step = __mode_step(mode, lines, scroll_bar.pageStep(), frames)
+    gutter = editor.line_number_area
+
+    frame_samples: list[float] = []
+    gutter_samples: list[float] = []
+    value = 0
+    for _ in range(frames):
+        value = value + step if value + step <= scroll_bar.maximum() else 0
+
+        start = perf_counter()
+        scroll_bar.setValue(value)
+        # Delivers the update requests the scroll posted, so only what was exposed gets painted
+        app.processEvents()
+        frame_samples.append(perf_counter() - start)
+
+        # The whole gutter, as painted after a jump or a resize
+        start = perf_counter()
+        gutter.repaint()
+        gutter_samples.append(perf_counter() - start)
+
+    if highlighter is not None:
+        highlighter.setDocument(None)
+    editor.close()
+    editor.deleteLater()
+    app.processEvents()
+
+    mean_frame_ms = sum(frame_samples) / len(frame_samples) * 1e3
+    result = {
+        'mode': mode,
+        'lines': lines,
+        'highlighter': highlighter_name,
+        'frames': frames,
+        'lines_per_frame': step,
+        'mean_frame_ms': mean_frame_ms,
+        'fps': 1e3 / mean_frame_ms if mean_frame_ms else 0.0,
+        'frame_ms': {k: v * 1e3 for k, v in percentiles(frame_samples).items()},
+        'gutter_paint_ms': {k: v * 1e3 for k, v in percentiles(gutter_samples).items()},
+    }
+    logger.info("%s scroll over %s lines: %.2f ms/frame, gutter p90 %.3f ms", mode, lines, mean_frame_ms,
+                result['gutter_paint_ms']['p90'])
+    return result
+
+
+def __parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='python -m benchmark.scroll',
+                                     description='Headless editor scrolling frame time benchmark')
+    parser.add_argument('--lines', type=int, nargs='+', default=DEFAULT_LINES, help='document sizes in lines')
+    parser.add_argument('--mode', nargs='+', choices=MODES, default=MODES, help='scrolling patterns')
+    parser.add_argument('--frames', type=int, default=DEFAULT_FRAMES, help='frames per case')
+    parser.add_argument('--highlighter', default=None, help='registered highlighter name, none by default')
+    parser.add_argument('--output', type=Path, default=None, help='JSON report path, stdout by default')
+    parser.add_argument('--baseline', type=Path, default=None, help='JSON report to compare frame times with')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='allowed relative slowdown against the baseline')
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    import utility.log
+    utility.log.setup_logging()
+    args = __parse_args(sys.argv[1:] if argv is None else argv)
+
+    app = create_offscreen_app()
+    if args.highlighter is not None:
+        load_highlighters()
+        from ext.code_highlight import HighlighterRegistry
+        if HighlighterRegistry.get_instance().get(args.highlighter) is None:
+            logger.error("Highlighter '%s' is not registered", args.highlighter)
+            return 2
+
+    results = []
+    for lines in args.lines:
+        text = synthetic_corpus(lines)
+        for mode in args.mode:
+            results.append(run_case(app, text, lines, mode, args.frames, args.highlighter))
+
+    report = {'benchmark': 'scroll', 'environment': environment(), 'results': results}
+    write_report(report, args.output)
+
+    if args.baseline is not None:
+        with open(args.baseline, mode='r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = find_regressions(report, baseline, ('mode', 'lines', 'highlighter'), 'mean_frame_ms',
+                                       args.tolerance, higher_is_better=False)
+        for regression in regressions:
+            logger.error("Regression %s", regression)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
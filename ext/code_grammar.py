@@ -0,0 +1,163 @@
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+
+from PyQt6.QtCore import QRegularExpression
+from PyQt6.QtGui import QTextCharFormat, QColor, QFont
+
+from ext.code_highlight import RuleBasedHighlighter, RuleSet, HighlightRule, HighlightRegion, keyword_pattern
+
+import logging
+logger = logging.getLogger(Path(__file__).name)
+
+# Params
+GRAMMAR_VERSION = 1
+
+
+class GrammarError(Exception):
+    def __init__(self, msg):
+        super().__init__(msg)
+
+
+@dataclass
+class GrammarFormat:
+    color: str | None = None
+    bold: bool = False
+    italic: bool = False
+
+    def to_char_format(self) -> QTextCharFormat:
+        char_format = QTextCharFormat()
+        if self.color is not None:
+            char_format.setForeground(QColor(self.color))
+        if self.bold:
+            char_format.setFontWeight(QFont.Weight.Bold)
+        if self.italic:
+            char_format.setFontItalic(True)
+        return char_format
+
+
+@dataclass
+class GrammarToken:
+    format: str
+    pattern: str
+    end: str | None = None
+    case_insensitive: bool = False
+
+    def rexp(self, pattern: str) -> QRegularExpression:
+        options = QRegularExpression.PatternOption.NoPatternOption
+        if self.case_insensitive:
+            options = QRegularExpression.PatternOption.CaseInsensitiveOption
+        return QRegularExpression(pattern, options)
+
+
+# Grammar reduced to plain patterns: keyword lists are already turned into trie-shaped alternations
+@dataclass
+class CompiledGrammar:
+    highlighter_name: str
+    formats: dict[str, GrammarFormat] = field(default_factory=dict)
+    tokens: list[GrammarToken] = field(default_factory=list)
+    version: int = GRAMMAR_VERSION
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @staticmethod
+    def from_dict(data: dict) -> 'CompiledGrammar':
+        return CompiledGrammar(
+            data['highlighter_name'],
+            {key: GrammarFormat(**value) for key, value in data['formats'].items()},
+            [GrammarToken(**token) for token in data['tokens']],
+            data['version'],
+        )
+
+
+def __check_type(what: str, value, expected: type | tuple[type, ...]):
+    if not isinstance(value, expected):
+        raise GrammarError(f'{what} has an invalid type {type(value).__name__}')
+
+
+def __compile_color(color: str | list[int] | None) -> str | None:
+    if color is None:
+        return None
+
+    __check_type('Color', color, (str, list))
+    if isinstance(color, list):
+        if len(color) not in (3, 4) or not all(isinstance(channel, int) for channel in color):
+            raise GrammarError(f'Invalid color {color}, expected [r, g, b] or [r, g, b, a]')
+        qcolor = QColor(*color)
+    else:
+        qcolor = QColor(color)
+    if not qcolor.isValid():
+        raise GrammarError(f'Invalid color {color}')
+    return qcolor.name()
+
+
+def __compile_format(key: str, value: dict) -> GrammarFormat:
+    __check_type(f"Format '{key}'", value, dict)
+    bold, italic = value.get('bold', False), value.get('italic', False)
+    __check_type(f"Bold of format '{key}'", bold, bool)
+    __check_type(f"Italic of format '{key}'", italic, bool)
+    return GrammarFormat(__compile_color(value.get('color', None)), bold, italic)
+
+
+def __compile_token(token: dict, formats: dict[str, GrammarFormat]) -> GrammarToken:
+    __check_type('Token', token, dict)
+    format_key = token.get('format', None)
+    if not isinstance(format_key, str) or format_key not in formats:
+        raise GrammarError(f"Unknown format '{format_key}'")
+    case_insensitive = token.get('case_insensitive', False)
+    __check_type(f"Case insensitivity of a token of format '{format_key}'", case_insensitive, bool)
+
+    if 'keywords' in token:
+        keywords = token['keywords']
+        if not isinstance(keywords, list) or not all(isinstance(word, str) and word for word in keywords):
+            raise GrammarError(f"Keywords of format '{format_key}' require a list of words")
+        grammar_token = GrammarToken(format_key, keyword_pattern(keywords), None, case_insensitive)
+    elif 'begin' in token and 'end' in token:
+        grammar_token = GrammarToken(format_key, token['begin'], token['end'], case_insensitive)
+    elif 'pattern' in token:
+        grammar_token = GrammarToken(format_key, token['pattern'], None, case_insensitive)
+    else:
+        raise GrammarError(f"Token of format '{format_key}' requires keywords, pattern or begin and end")
+
+    for pattern in (grammar_token.pattern, grammar_token.end):
+        if pattern is None:
+            continue
+        __check_type(f"Pattern of format '{format_key}'", pattern, str)
+        if not (rexp := grammar_token.rexp(pattern)).isValid():
+            raise GrammarError(f"Invalid pattern '{pattern}': {rexp.errorString()}")
+    return grammar_token
+
+
+def compile_grammar(data: dict) -> CompiledGrammar:
+    highlighter_name = data.get('highlighter_name', None)
+    if not highlighter_name or not isinstance(highlighter_name, str):
+        raise GrammarError('Grammar requires highlighter_name')
+
+    try:
+        formats_data, tokens_data = data.get('formats', {}), data.get('tokens', [])
+        __check_type('Formats', formats_data, dict)
+        __check_type('Tokens', tokens_data, list)
+
+        formats = {key: __compile_format(key, value) for key, value in formats_data.items()}
+        tokens = [__compile_token(token, formats) for token in tokens_data]
+    except GrammarError as err:
+        raise GrammarError(f"Grammar '{highlighter_name}': {err}")
+    return CompiledGrammar(highlighter_name, formats, tokens)
+
+
+class GrammarHighlighter(RuleBasedHighlighter):
+    grammar: CompiledGrammar | None = None
+
+    @classmethod
+    def build_rules(cls, rule_set: RuleSet):
+        formats = {key: value.to_char_format() for key, value in cls.grammar.formats.items()}
+        for token in cls.grammar.tokens:
+            char_format = formats[token.format]
+            if token.end is None:
+                rule_set.add_rule(HighlightRule(token.rexp(token.pattern), char_format))
+            else:
+                rule_set.add_region(HighlightRegion(token.rexp(token.pattern), token.rexp(token.end), char_format))
+
+
+def grammar_highlighter_type(grammar: CompiledGrammar) -> type:
+    return type(grammar.highlighter_name, (GrammarHighlighter,), {'grammar': grammar})
@@ -1,12 +1,44 @@
+import re
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from itertools import groupby
 from pathlib import Path
+from threading import Lock
+from time import perf_counter, perf_counter_ns
 
-from PyQt6.QtCore import QRegularExpression
-from PyQt6.QtGui import QSyntaxHighlighter, QTextCharFormat
+from PyQt6.QtCore import QRegularExpression, QTimer, pyqtSignal
+from PyQt6.QtGui import QSyntaxHighlighter, QTextCharFormat, QTextBlock, QTextLayout, QTextDocument
 from dataclasses import dataclass
 
+from ext.code_profiler import RuleProfiler
+
 import logging
 logger = logging.getLogger(Path(__file__).name)
 
+# Params
+COMPILE_RULES = True
+BACKGROUND_MIN_BLOCKS = 2000
+BACKGROUND_CHUNK_BLOCKS = 500
+SYNC_BUDGET_BLOCKS = 100
+TOKENIZE_WORKERS = 2
+LAZY_HIGHLIGHT = True
+LAZY_MIN_BLOCKS = 50000
+LAZY_MARGIN_BLOCKS = 100
+LAZY_IDLE_SLICE_MS = 8
+TOKEN_CACHE_SIZE = 20000
+
+# Private params
+# Backreferences and named groups of a rule would clash once the rule is merged into an alternation
+_UNMERGEABLE_REXP = re.compile(r"\\[1-9gk]|\(\?(?:P?<(?![=!])|'|P=)")
+
+FormatSpan = tuple[int, int, QTextCharFormat]
+
+_TOKENIZE_POOL: ThreadPoolExecutor | None = None
+_RULE_SET_ID_SEQ: int = 0
+# Lazy block states carry the tag of the attachment that computed them, any other state reads as unformatted
+_LAZY_TAG_SHIFT = 24
+_LAZY_TAG_SEQ: int = 0
+
 
 @dataclass
 class HighlightRule:
@@ -14,21 +46,782 @@ class HighlightRule:
     format: QTextCharFormat
 
 
+@dataclass
+class HighlightRegion:
+    begin: QRegularExpression
+    end: QRegularExpression
+    format: QTextCharFormat
+    # Rules added after the region claim their matches, so a region can not begin inside them
+    rules_before: int = 0
+
+
+@dataclass
+class RuleGroup:
+    rexp: QRegularExpression
+    format: QTextCharFormat
+    rules: list[HighlightRule]
+    order: int = 0
+
+
+@dataclass
+class TokenizedBlock:
+    text: str
+    state_in: int
+    ranges: list[QTextLayout.FormatRange]
+    state_out: int
+
+
+def _tokenize_pool() -> ThreadPoolExecutor:
+    global _TOKENIZE_POOL
+    if _TOKENIZE_POOL is None:
+        _TOKENIZE_POOL = ThreadPoolExecutor(max_workers=TOKENIZE_WORKERS, thread_name_prefix='tokenize')
+    return _TOKENIZE_POOL
+
+
+def _new_rule_set_id() -> int:
+    global _RULE_SET_ID_SEQ
+    _RULE_SET_ID_SEQ += 1
+    return _RULE_SET_ID_SEQ
+
+
+@dataclass
+class TokenCacheStats:
+    hits: int
+    misses: int
+    size: int
+    max_size: int
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+# LRU of tokenized lines shared by all highlighters, keyed on (rule set id, incoming state, line text).
+# Used from worker threads as well, hence the lock
+class TokenCache:
+    __INSTANCE: 'TokenCache' = None
+
+    @staticmethod
+    def get_instance() -> 'TokenCache':
+        return TokenCache.__INSTANCE
+
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE):
+        current_instance = TokenCache.__INSTANCE
+        if current_instance is not None:
+            logger.warning('There is already a global instance of TokenCache that is going to be replaced')
+        TokenCache.__INSTANCE = self
+
+        self.__entries: OrderedDict[tuple[int, int, str], tuple[list[FormatSpan], int]] = OrderedDict()
+        self.__lock = Lock()
+        self.__max_size = max_size
+        self.__hits = 0
+        self.__misses = 0
+
+    def get(self, key: tuple[int, int, str]) -> tuple[list[FormatSpan], int] | None:
+        with self.__lock:
+            entry = self.__entries.get(key, None)
+            if entry is None:
+                self.__misses += 1
+                return None
+            self.__entries.move_to_end(key)
+            self.__hits += 1
+            return entry
+
+    def put(self, key: tuple[int, int, str], entry: tuple[list[FormatSpan], int]):
+        with self.__lock:
+            self.__entries[key] = entry
+            self.__entries.move_to_end(key)
+            self.__evict()
+
+    def resize(self, max_size: int):
+        with self.__lock:
+            self.__max_size = max_size
+            self.__evict()
+        logger.debug("TokenCache resized to %s entries", max_size)
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            self.__hits = 0
+            self.__misses = 0
+
+    def stats(self) -> TokenCacheStats:
+        with self.__lock:
+            return TokenCacheStats(self.__hits, self.__misses, len(self.__entries), self.__max_size)
+
+    def __evict(self):
+        while len(self.__entries) > self.__max_size:
+            self.__entries.popitem(last=False)
+
+
+def __keyword_trie_pattern(node: dict) -> str:
+    alternatives = [re.escape(char) + __keyword_trie_pattern(child) for char, child in sorted(node.items()) if char]
+    if not alternatives:
+        return ''
+
+    optional = '' in node
+    if len(alternatives) == 1 and not optional:
+        return alternatives[0]
+    group = '(?:' + '|'.join(alternatives) + ')'
+    return group + '?' if optional else group
+
+
+def keyword_pattern(words: list[str]) -> str:
+    # One trie-shaped alternation: words sharing a prefix never rescan it, unlike a flat "\bif\b|\bin\b|..."
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    return rf'\b{__keyword_trie_pattern(trie)}\b'
+
+
+def _is_mergeable(rule: HighlightRule) -> bool:
+    return rule.rexp.isValid() and not _UNMERGEABLE_REXP.search(rule.rexp.pattern())
+
+
+def _can_merge(prev: HighlightRule, rule: HighlightRule) -> bool:
+    return (_is_mergeable(prev) and _is_mergeable(rule)
+            and prev.format == rule.format
+            and prev.rexp.patternOptions() == rule.rexp.patternOptions())
+
+
+def _merge_rules(rules: list[HighlightRule], order: int) -> list[RuleGroup]:
+    if len(rules) == 1:
+        rule = rules[0]
+        return [RuleGroup(rule.rexp, rule.format, rules, order)]
+
+    pattern = '|'.join(f'(?<r{idx}>{rule.rexp.pattern()})' for idx, rule in enumerate(rules))
+    rexp = QRegularExpression(pattern, rules[0].rexp.patternOptions())
+    if not rexp.isValid():
+        logger.warning("Unable to merge %s rules: %s", len(rules), rexp.errorString())
+        return [RuleGroup(rule.rexp, rule.format, [rule], order + idx) for idx, rule in enumerate(rules)]
+
+    return [RuleGroup(rexp, rules[0].format, rules, order)]
+
+
+def _is_claimed(spans: list[tuple[int, int, int]], pos: int, rules_before: int) -> bool:
+    return any(start <= pos < start + length and order >= rules_before for start, length, order in spans)
+
+
+# Ordered rules, later ones take precedence on overlapping ranges. In compiled mode consecutive rules
+# sharing a format are merged into one alternation, so a block is scanned once per group, not per rule.
+# Regions may span several blocks: the block state is the index of the region left open, or -1
+class RuleSet:
+    def __init__(self, compiled: bool = COMPILE_RULES):
+        self.rules: list[HighlightRule] = []
+        self.regions: list[HighlightRegion] = []
+        self.compiled = compiled
+        self.id = _new_rule_set_id()
+        self.profiler: RuleProfiler | None = None
+
+        self.__groups: list[RuleGroup] | None = None
+
+    def add_rule(self, rule: HighlightRule):
+        self.rules.append(rule)
+        self.__invalidate()
+
+    def add_region(self, region: HighlightRegion):
+        region.rules_before = len(self.rules)
+        self.regions.append(region)
+        self.__invalidate()
+
+    def __invalidate(self):
+        self.__groups = None
+        self.id = _new_rule_set_id()
+
+    def copy(self) -> 'RuleSet':
+        rule_set = RuleSet(self.compiled)
+        rule_set.rules = list(self.rules)
+        rule_set.regions = list(self.regions)
+        return rule_set
+
+    def groups(self) -> list[RuleGroup]:
+        if self.__groups is None:
+            self.__groups = self.__compile()
+        return self.__groups
+
+    def __compile(self) -> list[RuleGroup]:
+        if not self.compiled:
+            groups = [RuleGroup(rule.rexp, rule.format, [rule], idx) for idx, rule in enumerate(self.rules)]
+            for group in groups:
+                group.rexp.optimize()
+            return groups
+
+        boundaries = {region.rules_before for region in self.regions}
+        groups: list[RuleGroup] = []
+        pending: list[HighlightRule] = []
+        for idx, rule in enumerate(self.rules):
+            if pending and (idx in boundaries or not _can_merge(pending[-1], rule)):
+                groups.extend(_merge_rules(pending, idx - len(pending)))
+                pending = []
+            pending.append(rule)
+        if pending:
+            groups.extend(_merge_rules(pending, len(self.rules) - len(pending)))
+        for group in groups:
+            group.rexp.optimize()
+
+        logger.debug("Compiled %s rules into %s groups", len(self.rules), len(groups))
+        return groups
+
+    def tokenize(self, text: str, state: int = -1) -> tuple[list[FormatSpan], int]:
+        cache = TokenCache.get_instance()
+        if cache is None or self.profiler is not None:
+            return self.__tokenize(text, state)
+
+        key = (self.id, state, text)
+        tokenized = cache.get(key)
+        if tokenized is None:
+            tokenized = self.__tokenize(text, state)
+            cache.put(key, tokenized)
+        return tokenized
+
+    def __tokenize(self, text: str, state: int) -> tuple[list[FormatSpan], int]:
+        spans: list[FormatSpan] = []
+        ordered: list[tuple[int, int, int]] = []
+        for group in self.groups():
+            started, first_span = (perf_counter_ns(), len(spans)) if self.profiler is not None else (0, 0)
+            match_iterator = group.rexp.globalMatch(text)
+            while match_iterator.hasNext():
+                match = match_iterator.next()
+                spans.append((match.capturedStart(), match.capturedLength(), group.format))
+                if self.regions:
+                    ordered.append((match.capturedStart(), match.capturedLength(), group.order))
+            if self.profiler is not None:
+                match_lengths = [length for _, length, _ in spans[first_span:]]
+                self.profiler.record_rule(group.order, perf_counter_ns() - started, len(text), match_lengths)
+
+        if not self.regions:
+            return spans, -1
+
+        pos = 0
+        if 0 <= state < len(self.regions):
+            region = self.regions[state]
+            end_match = region.end.match(text)
+            if not end_match.hasMatch():
+                spans.append((0, len(text), region.format))
+                return spans, state
+            pos = end_match.capturedEnd()
+            spans.append((0, pos, region.format))
+
+        while pos <= len(text):
+            begin_match, region_idx = self.__find_region_begin(text, pos, ordered)
+            if begin_match is None:
+                break
+
+            region = self.regions[region_idx]
+            start = begin_match.capturedStart()
+            end_match = region.end.match(text, begin_match.capturedEnd())
+            if not end_match.hasMatch():
+                spans.append((start, len(text) - start, region.format))
+                return spans, region_idx
+            spans.append((start, end_match.capturedEnd() - start, region.format))
+            pos = max(end_match.capturedEnd(), start + 1)
+
+        return spans, -1
+
+    def __find_region_begin(self, text: str, pos: int, ordered: list[tuple[int, int, int]]):
+        found, found_idx = None, -1
+        for idx, region in enumerate(self.regions):
+            match = region.begin.match(text, pos)
+            while match.hasMatch() and _is_claimed(ordered, match.capturedStart(), region.rules_before):
+                match = region.begin.match(text, match.capturedStart() + 1)
+            if match.hasMatch() and (found is None or match.capturedStart() < found.capturedStart()):
+                found, found_idx = match, idx
+        return found, found_idx
+
+
+def _flatten(spans: list[FormatSpan]) -> list[FormatSpan]:
+    # Later spans override earlier ones, the same way consecutive QSyntaxHighlighter.setFormat calls do
+    if not spans:
+        return []
+
+    chars: list[QTextCharFormat | None] = [None] * max(start + length for start, length, _ in spans)
+    for start, length, text_format in spans:
+        chars[start:start + length] = [text_format] * length
+
+    flat: list[FormatSpan] = []
+    pos = 0
+    for _, run in groupby(chars, key=id):
+        run_length = sum(1 for _ in run)
+        if chars[pos] is not None:
+            flat.append((pos, run_length, chars[pos]))
+        pos += run_length
+    return flat
+
+
+def _format_ranges(spans: list[FormatSpan]) -> list[QTextLayout.FormatRange]:
+    ranges: list[QTextLayout.FormatRange] = []
+    for start, length, text_format in _flatten(spans):
+        format_range = QTextLayout.FormatRange()
+        format_range.start, format_range.length, format_range.format = start, length, text_format
+        ranges.append(format_range)
+    return ranges
+
+
+def _tokenize_chunk(rule_set: RuleSet, texts: list[str], state: int) -> list[TokenizedBlock]:
+    tokenized: list[TokenizedBlock] = []
+    for text in texts:
+        spans, state_out = rule_set.tokenize(text, state)
+        tokenized.append(TokenizedBlock(text, state, _format_ranges(spans), state_out))
+        state = state_out
+    return tokenized
+
+
+def _new_lazy_tag() -> int:
+    global _LAZY_TAG_SEQ
+    # Kept positive in a 32 bit state
+    _LAZY_TAG_SEQ = _LAZY_TAG_SEQ % 127 + 1
+    return _LAZY_TAG_SEQ
+
+
+# Lazy mode keeps in the block state whether the exit state was computed from a known entry state
+def _encode_state(tag: int, state: int, exact: bool) -> int:
+    return (tag << _LAZY_TAG_SHIFT) | ((state + 1) << 1) | int(exact)
+
+
+# (formatted, exact, state); states left by another highlighter or an earlier attachment are not formatted
+def _decode_state(value: int, tag: int) -> tuple[bool, bool, int]:
+    if value < 0 or value >> _LAZY_TAG_SHIFT != tag:
+        return False, False, -1
+    return True, bool(value & 1), ((value & ((1 << _LAZY_TAG_SHIFT) - 1)) >> 1) - 1
+
+
+def _is_lazy_candidate(document) -> bool:
+    return LAZY_HIGHLIGHT and isinstance(document, QTextDocument) and document.blockCount() >= LAZY_MIN_BLOCKS
+
+
+@dataclass
+class _TokenizeJob:
+    generation: int
+    state_in: int
+    blocks: list[QTextBlock]
+    tokenized: list[TokenizedBlock] | None = None
+
+
+# Large documents are tokenized by a worker pool, chunks nearest to the viewport first. The GUI thread
+# only applies the finished format ranges, blocks waiting for a worker keep their previous formats.
+# Huge documents are not attached to QSyntaxHighlighter at all (it would run over every block): in lazy
+# mode blocks near the viewport are formatted on demand and the rest in idle time slices
 class RuleBasedHighlighter(QSyntaxHighlighter):
+    tokenized = pyqtSignal(object)
+
     def __init__(self, parent=None):
-        super().__init__(parent)
+        lazy_document = parent if _is_lazy_candidate(parent) else None
+        super().__init__(parent if lazy_document is None else None)
+
+        # Rules built by build_rules are compiled once per type and shared by every instance
+        registry = HighlighterRegistry.get_instance()
+        self.rule_set = registry.rule_set(type(self)) if registry is not None else self.new_rule_set()
+        self._highlighting_rules: list[HighlightRule] = self.rule_set.rules
+        self.__shared_rules = registry is not None
+        self.__unprofiled_rule_set: RuleSet | None = None
+
+        self.background = True
+        self.lazy = LAZY_HIGHLIGHT
+        self.viewport_range: callable = None
+
+        self.__generation = 0
+        self.__sync_budget = SYNC_BUDGET_BLOCKS
+        self.__flush_scheduled = False
+        self.__pending: set[int] = set()
+        self.__queue: list[tuple[QTextBlock, int]] = []
+        self.__running = 0
+
+        self.tokenized.connect(self.__apply_tokenized)
+
+        self.__lazy_document: QTextDocument | None = None
+        self.__lazy_tag = 0
+        self.__block_count = 0
+        self.__fill_number = 0
+        self.__dirty: list[tuple[QTextBlock, QTextBlock | None]] = []
+        self.__viewport_scheduled = False
+        self.__idle_timer = QTimer(self)
+        self.__idle_timer.setInterval(0)
+        self.__idle_timer.timeout.connect(self.__idle_step)
+
+        if lazy_document is not None:
+            self.setParent(lazy_document)
+            self.__attach_lazy(lazy_document)
+
+    def setDocument(self, doc):
+        self.cancel_background()
+        previous = self.document()
+        if previous is not None:
+            blocked = previous.blockSignals(True)
+            try:
+                self.__detach_lazy()
+                super().setDocument(None)
+            finally:
+                previous.blockSignals(blocked)
+
+        if self.lazy and _is_lazy_candidate(doc):
+            self.__attach_lazy(doc)
+        else:
+            super().setDocument(doc)
+
+    def document(self) -> QTextDocument | None:
+        return self.__lazy_document or super().document()
+
+    def is_lazy(self) -> bool:
+        return self.__lazy_document is not None
+
+    def cancel_background(self):
+        self.__generation += 1
+        self.__pending.clear()
+        self.__queue.clear()
+
+    def is_background_busy(self) -> bool:
+        return bool(self.__pending or self.__queue or self.__running or self.__idle_timer.isActive())
 
-        self._highlighting_rules: list[HighlightRule] = []
+    @classmethod
+    def build_rules(cls, rule_set: RuleSet):
+        pass
+
+    @classmethod
+    def new_rule_set(cls) -> RuleSet:
+        rule_set = RuleSet()
+        cls.build_rules(rule_set)
+        rule_set.groups()
+        return rule_set
+
+    # Rules added per instance detach it from the shared set
+    def __own_rule_set(self) -> RuleSet:
+        self.stop_profiling()
+        if self.__shared_rules:
+            self.rule_set = self.rule_set.copy()
+            self._highlighting_rules = self.rule_set.rules
+            self.__shared_rules = False
+        return self.rule_set
 
     def add_rule(self, rule: HighlightRule):
-        self._highlighting_rules.append(rule)
+        self.__own_rule_set().add_rule(rule)
+
+    def add_region(self, region: HighlightRegion):
+        self.__own_rule_set().add_region(region)
+
+    @property
+    def profiler(self) -> RuleProfiler | None:
+        return self.rule_set.profiler
+
+    # Profiling runs every rule on its own, synchronously and without the token cache,
+    # so the recorded time is the rule's own cost rather than the merged group's
+    def start_profiling(self) -> RuleProfiler:
+        if self.profiler is not None:
+            return self.profiler
+
+        self.__unprofiled_rule_set = self.rule_set
+        self.rule_set = self.rule_set.copy()
+        self.rule_set.compiled = False
+        self.rule_set.profiler = RuleProfiler([rule.rexp.pattern() for rule in self.rule_set.rules])
+        self._highlighting_rules = self.rule_set.rules
+        self.__rehighlight_all()
+        return self.rule_set.profiler
+
+    def stop_profiling(self) -> RuleProfiler | None:
+        profiler = self.profiler
+        if profiler is None:
+            return None
+
+        self.rule_set = self.__unprofiled_rule_set
+        self._highlighting_rules = self.rule_set.rules
+        self.__unprofiled_rule_set = None
+        return profiler
+
+    def __rehighlight_all(self):
+        document = self.document()
+        if document is not None:
+            self.setDocument(document)
+
+    def __tokenize_block(self, block: QTextBlock, text: str, state_in: int) -> tuple[list[FormatSpan], int]:
+        profiler = self.profiler
+        if profiler is None:
+            return self.rule_set.tokenize(text, state_in)
+
+        started = perf_counter_ns()
+        tokenized = self.rule_set.tokenize(text, state_in)
+        profiler.record_block(block.blockNumber(), len(text), perf_counter_ns() - started)
+        return tokenized
 
     def highlightBlock(self, text):
-        for rule in self._highlighting_rules:
-            match_iterator = rule.rexp.globalMatch(text)
-            while match_iterator.hasNext():
-                match = match_iterator.next()
-                self.setFormat(match.capturedStart(), match.capturedLength(), rule.format)
+        # QSyntaxHighlighter moves on to the next block only while the resulting state differs
+        state_in = self.previousBlockState()
+        block = self.currentBlock()
+
+        if self.__defer(block):
+            for format_range in block.layout().formats():
+                self.setFormat(format_range.start, format_range.length, format_range.format)
+            self.setCurrentBlockState(state_in)
+            return
+
+        spans, state = self.__tokenize_block(block, text, state_in)
+        for start, length, text_format in spans:
+            self.setFormat(start, length, text_format)
+        self.setCurrentBlockState(state)
+
+    def __defer(self, block: QTextBlock) -> bool:
+        if not self.background or self.profiler is not None or self.document().blockCount() < BACKGROUND_MIN_BLOCKS:
+            return False
+
+        self.__schedule_flush()
+        if self.__sync_budget > 0:
+            self.__sync_budget -= 1
+            return False
+
+        self.__pending.add(block.blockNumber())
+        return True
+
+    def __schedule_flush(self):
+        if not self.__flush_scheduled:
+            self.__flush_scheduled = True
+            QTimer.singleShot(0, self.__flush)
+
+    def __flush(self):
+        self.__flush_scheduled = False
+        self.__sync_budget = SYNC_BUDGET_BLOCKS
+        if not self.__pending:
+            return
+
+        document = self.document()
+        numbers = sorted(self.__pending)
+        self.__pending.clear()
+
+        run_start = prev = numbers[0]
+        for number in numbers[1:] + [-1]:
+            if number != prev + 1 or prev - run_start + 1 >= BACKGROUND_CHUNK_BLOCKS:
+                self.__queue.append((document.findBlockByNumber(run_start), prev - run_start + 1))
+                run_start = number
+            prev = number
+
+        self.__submit()
+
+    def __next_chunk(self) -> tuple[QTextBlock, int]:
+        first_visible, last_visible = self.viewport_range() if self.viewport_range else (0, 0)
+
+        def distance(chunk: tuple[QTextBlock, int]) -> int:
+            first = chunk[0].blockNumber()
+            last = first + chunk[1] - 1
+            return max(0, first - last_visible, first_visible - last)
+
+        idx = min(range(len(self.__queue)), key=lambda i: distance(self.__queue[i]))
+        return self.__queue.pop(idx)
+
+    def __submit(self):
+        self.rule_set.groups()
+
+        while self.__queue and self.__running < TOKENIZE_WORKERS:
+            block, count = self.__next_chunk()
+            if not block.isValid():
+                continue
+
+            prev_block = block.previous()
+            job = _TokenizeJob(self.__generation, prev_block.userState() if prev_block.isValid() else -1, [])
+            while block.isValid() and len(job.blocks) < count:
+                job.blocks.append(block)
+                block = block.next()
+
+            texts = [block.text() for block in job.blocks]
+            future = _tokenize_pool().submit(_tokenize_chunk, self.rule_set, texts, job.state_in)
+            future.add_done_callback(lambda f, j=job: self.__emit_tokenized(j, f))
+            self.__running += 1
+
+    def __emit_tokenized(self, job: _TokenizeJob, future: Future):
+        # Runs in a worker thread, the signal delivers the job to the GUI thread
+        try:
+            job.tokenized = future.result()
+        except Exception as e:
+            logger.error("Background tokenization failed: %s", e)
+            job.tokenized = []
+
+        try:
+            self.tokenized.emit(job)
+        except RuntimeError:
+            pass
+
+    def __apply_tokenized(self, job: _TokenizeJob):
+        self.__running -= 1
+        if job.generation == self.__generation and job.tokenized:
+            self.__apply(job)
+        self.__submit()
+
+    def __apply(self, job: _TokenizeJob):
+        first = job.blocks[0]
+        prev_block = first.previous()
+        if (prev_block.userState() if prev_block.isValid() else -1) != job.state_in:
+            self.__queue.append((first, len(job.blocks)))
+            return
+
+        # Blocks edited since the job was submitted are already rehighlighted by QSyntaxHighlighter
+        block, applied, prev_state = first, None, -1
+        for expected, tokenized in zip(job.blocks, job.tokenized):
+            if block != expected or block.text() != tokenized.text:
+                break
+            prev_state = block.userState()
+            block.layout().setFormats(tokenized.ranges)
+            block.setUserState(tokenized.state_out)
+            applied, block = block, block.next()
+
+        if applied is None:
+            return
+        self.document().markContentsDirty(first.position(), applied.position() + applied.length() - first.position())
+
+        # The exit state changed, so the following blocks were tokenized from a wrong guess
+        if block.isValid() and prev_state != applied.userState():
+            self.__queue.append((block, BACKGROUND_CHUNK_BLOCKS))
+
+
+    def update_viewport(self):
+        if self.__lazy_document is not None and not self.__viewport_scheduled:
+            self.__viewport_scheduled = True
+            QTimer.singleShot(0, self.__format_viewport)
+
+    def __attach_lazy(self, document: QTextDocument):
+        self.__lazy_document = document
+        # Whatever states the blocks hold now read as unformatted, without visiting them
+        self.__lazy_tag = _new_lazy_tag()
+        self.__block_count = document.blockCount()
+        self.__fill_number = 0
+        self.__dirty.clear()
+
+        document.contentsChange.connect(self.__on_lazy_change)
+        self.update_viewport()
+        self.__idle_timer.start()
+        logger.debug("Lazy highlighting of %s blocks", self.__block_count)
+
+    def __detach_lazy(self):
+        document = self.__lazy_document
+        if document is None:
+            return
+        self.__lazy_document = None
+        self.__idle_timer.stop()
+        document.contentsChange.disconnect(self.__on_lazy_change)
+
+        # Attached for a moment as a plain QSyntaxHighlighter, whose detaching clears the formats of every block
+        # in one pass without running any highlighting. Block states are left as they are, see __attach_lazy
+        super().setDocument(document)
+        super().setDocument(None)
+
+    def __margin_range(self) -> tuple[int, int]:
+        first_visible, last_visible = self.viewport_range() if self.viewport_range else (0, 0)
+        return max(0, first_visible - LAZY_MARGIN_BLOCKS), last_visible + LAZY_MARGIN_BLOCKS
+
+    def __format_lazy_block(self, block: QTextBlock) -> int:
+        prev_block = block.previous()
+        _, exact, state_in = _decode_state(prev_block.userState(), self.__lazy_tag) if prev_block.isValid() \
+            else (True, True, -1)
+
+        spans, state_out = self.__tokenize_block(block, block.text(), state_in)
+        block.layout().setFormats(_format_ranges(spans))
+        block.setUserState(_encode_state(self.__lazy_tag, state_out, exact))
+        return state_out
+
+    def __mark_formatted(self, first: QTextBlock | None, last: QTextBlock | None):
+        if first is not None:
+            self.__lazy_document.markContentsDirty(first.position(), last.position() + last.length() - first.position())
+
+    def __format_viewport(self):
+        self.__viewport_scheduled = False
+        if self.__lazy_document is None:
+            return
+
+        # Blocks whose previous state is unknown yet are formatted from a guess and verified in idle time
+        lowest, highest = self.__margin_range()
+        block = self.__lazy_document.findBlockByNumber(lowest)
+        first = last = None
+        number = lowest
+        while block.isValid() and number <= highest:
+            if not _decode_state(block.userState(), self.__lazy_tag)[0]:
+                self.__format_lazy_block(block)
+                first, last = block if first is None else first, block
+            block = block.next()
+            number += 1
+        self.__mark_formatted(first, last)
+
+    def __on_lazy_change(self, position: int, _removed: int, added: int):
+        document = self.__lazy_document
+        first = document.findBlock(position)
+        last = document.findBlock(position + added)
+        first_number = first.blockNumber()
+
+        delta = document.blockCount() - self.__block_count
+        self.__block_count = document.blockCount()
+        if first_number < self.__fill_number:
+            self.__fill_number = max(first_number, self.__fill_number + delta)
+
+        deadline = perf_counter() + LAZY_IDLE_SLICE_MS / 1000
+        self.__propagate(first, last if last.isValid() else None, deadline)
+        self.update_viewport()
+        self.__idle_timer.start()
+
+    def __propagate(self, block: QTextBlock, until: QTextBlock | None, deadline: float):
+        # Reformat changed blocks, then go on while the exit state differs like QSyntaxHighlighter does
+        first = last = block
+        forced = until is not None
+        while True:
+            _, _, old_state = _decode_state(block.userState(), self.__lazy_tag)
+            state_out = self.__format_lazy_block(block)
+            last = block
+            if forced and block == until:
+                forced = False
+
+            block = block.next()
+            if not block.isValid():
+                break
+            if not forced:
+                _, next_exact, _ = _decode_state(block.userState(), self.__lazy_tag)
+                if next_exact and state_out == old_state:
+                    break
+                if not next_exact and block.blockNumber() >= self.__fill_number:
+                    break
+            if perf_counter() >= deadline:
+                self.__dirty.append((block, until if forced else None))
+                break
+
+        self.__mark_formatted(first, last)
+
+    def __idle_step(self):
+        if self.__lazy_document is None:
+            self.__idle_timer.stop()
+            return
+
+        deadline = perf_counter() + LAZY_IDLE_SLICE_MS / 1000
+        while self.__dirty and perf_counter() < deadline:
+            block, until = self.__dirty.pop()
+            if block.isValid():
+                self.__propagate(block, until, deadline)
+
+        if not self.__dirty:
+            self.__fill(deadline)
+            if self.__fill_number >= self.__lazy_document.blockCount():
+                self.__idle_timer.stop()
+
+    def __fill(self, deadline: float):
+        block = self.__lazy_document.findBlockByNumber(self.__fill_number)
+        first = last = None
+        changed = False
+        while block.isValid() and perf_counter() < deadline:
+            formatted, exact, old_state = _decode_state(block.userState(), self.__lazy_tag)
+            if not exact or changed:
+                changed = self.__format_lazy_block(block) != old_state or not formatted
+                first, last = block if first is None else first, block
+            block = block.next()
+            self.__fill_number += 1
+        self.__mark_formatted(first, last)
+
+
+# Detaching clears the formats of every block in one pass, but Qt reports it as a change of the whole text.
+# Signals of the document are held meanwhile, so subscribers to its edits do not rescan it for nothing
+def detach_highlighter(highlighter: QSyntaxHighlighter):
+    document = highlighter.document()
+    if document is None:
+        return
+    blocked = document.blockSignals(True)
+    try:
+        highlighter.setDocument(None)
+    finally:
+        document.blockSignals(blocked)
 
 
 class HighlighterRegistry:
@@ -45,12 +838,27 @@ class HighlighterRegistry:
         HighlighterRegistry.__INSTANCE = self
 
         self.__registry: dict[str, type] = dict()
+        self.__rule_sets: dict[type, RuleSet] = dict()
 
     def register(self, highlighter: type):
         key = highlighter.__name__
+        previous = self.__registry.get(key, None)
+        if previous is not None:
+            self.__rule_sets.pop(previous, None)
         self.__registry[key] = highlighter
 
         logger.info("Registered type %s as %s", highlighter, key)
 
     def get(self, key: str) -> type | None:
         return self.__registry.get(key, None)
+
+    def names(self) -> list[str]:
+        return list(self.__registry.keys())
+
+    def rule_set(self, highlighter: type) -> RuleSet:
+        rule_set = self.__rule_sets.get(highlighter, None)
+        if rule_set is None:
+            rule_set = highlighter.new_rule_set()
+            self.__rule_sets[highlighter] = rule_set
+            logger.debug("Built shared rule set for %s", highlighter.__name__)
+        return rule_set
@@ -1 +1,264 @@
-# TODO
\ No newline at end of file
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from time import perf_counter
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+from PyQt6.QtGui import QTextDocument, QTextBlock
+
+from ext.document_changes import ChangeDispatcher, ContentChange
+
+import logging
+logger = logging.getLogger(Path(__file__).name)
+
+# Params
+COMPLETION_LIMIT = 20
+# Shorter identifiers are neither indexed nor completed
+MIN_IDENTIFIER_CHARS = 3
+INDEX_SLICE_MS = 8
+
+# Private params
+_IDENTIFIER_REXP = re.compile(r'[^\W\d]\w*')
+# Marks a word ending at a trie node, never a key of a single character
+_WORD_END = ''
+
+
+# A definition found in a document: kind is 'class', 'function' or 'import'. Line and column are those of its name,
+# depth is the nesting level, symbols being listed in document order
+@dataclass
+class Symbol:
+    kind: str
+    name: str
+    line: int
+    column: int
+    depth: int = 0
+
+
+# The symbol a name refers to, definitions taking precedence over imports of the name
+def find_definition(symbols: list[Symbol], name: str) -> Symbol | None:
+    imported = None
+    for symbol in symbols:
+        if symbol.kind != 'import':
+            if symbol.name == name:
+                return symbol
+        # Importing a.b binds a
+        elif imported is None and symbol.name.partition('.')[0] == name:
+            imported = symbol
+    return imported
+
+
+# Base of code processors: attached to a document through its binding, it is fed the coalesced edits of the
+# document and answers editor queries. Registered by class name in ProcessorRegistry
+class CodeProcessor(QObject):
+    symbols_changed = pyqtSignal()
+
+    def __init__(self, document: QTextDocument, changes: ChangeDispatcher, parent: QObject | None = None):
+        super().__init__(parent)
+        self.document = document
+        self.changes = changes
+        # Edits made before the processor existed are part of the text it starts from
+        changes.flush()
+        changes.changed.connect(self.on_changes)
+
+    def on_changes(self, changes: list[ContentChange]):
+        pass
+
+    def completions(self, prefix: str, limit: int = COMPLETION_LIMIT) -> list[str]:
+        return []
+
+    def symbols(self) -> list[Symbol]:
+        return []
+
+    def close(self):
+        self.changes.changed.disconnect(self.on_changes)
+
+
+class ProcessorRegistry:
+    __INSTANCE: 'ProcessorRegistry' = None
+
+    @staticmethod
+    def get_instance() -> 'ProcessorRegistry':
+        return ProcessorRegistry.__INSTANCE
+
+    def __init__(self):
+        current_instance = ProcessorRegistry.__INSTANCE
+        if current_instance is not None:
+            logger.warning('There is already a global instance of ProcessorRegistry that is going to be replaced')
+        ProcessorRegistry.__INSTANCE = self
+
+        self.__registry: dict[str, type] = dict()
+
+    def register(self, processor: type):
+        key = processor.__name__
+        self.__registry[key] = processor
+
+        logger.info("Registered type %s as %s", processor, key)
+
+    def get(self, key: str) -> type | None:
+        return self.__registry.get(key, None)
+
+    def names(self) -> list[str]:
+        return list(self.__registry.keys())
+
+
+# Nodes are dicts of the next character; a word ends at a node holding the _WORD_END key
+class PrefixTrie:
+    def __init__(self):
+        self.__root: dict = {}
+        self.__size = 0
+
+    def __len__(self) -> int:
+        return self.__size
+
+    def add(self, word: str):
+        node = self.__root
+        for char in word:
+            node = node.setdefault(char, {})
+        if _WORD_END not in node:
+            node[_WORD_END] = True
+            self.__size += 1
+
+    def remove(self, word: str):
+        path = [self.__root]
+        for char in word:
+            node = path[-1].get(char, None)
+            if node is None:
+                return
+            path.append(node)
+        if path[-1].pop(_WORD_END, None) is None:
+            return
+        self.__size -= 1
+
+        # Branches left without words are pruned
+        for idx in range(len(word), 0, -1):
+            if path[idx]:
+                break
+            del path[idx - 1][word[idx - 1]]
+
+    # In lexicographic order, walking no further than needed for limit words
+    def complete(self, prefix: str, limit: int) -> list[str]:
+        node = self.__root
+        for char in prefix:
+            node = node.get(char, None)
+            if node is None:
+                return []
+
+        words = []
+        stack = [(prefix, node)]
+        while stack and len(words) < limit:
+            word, node = stack.pop()
+            if _WORD_END in node:
+                words.append(word)
+            stack.extend((word + char, node[char]) for char in sorted(node, reverse=True) if char != _WORD_END)
+        return words
+
+
+def _block_identifiers(block: QTextBlock) -> frozenset[str]:
+    return frozenset(word for word in _IDENTIFIER_REXP.findall(block.text()) if len(word) >= MIN_IDENTIFIER_CHARS)
+
+
+# Ranges of blocks [lo, hi) moved along with blocks lo..hi replaced by added ones, parts within them dropped
+def _shift_ranges(ranges: list[tuple[int, int]], lo: int, hi: int, added: int) -> list[tuple[int, int]]:
+    shift = added - (hi - lo)
+    shifted = []
+    for range_lo, range_hi in ranges:
+        if range_lo < lo:
+            shifted.append((range_lo, min(range_hi, lo)))
+        if range_hi > hi:
+            shifted.append((max(range_lo, hi) + shift, range_hi + shift))
+    return shifted
+
+
+# Completes identifiers found in the document. Identifiers are kept per block, so an edit only rescans
+# the blocks it touched; the trie holds every identifier present on at least one line
+class IdentifierCompleter(CodeProcessor):
+    def __init__(self, document: QTextDocument, changes: ChangeDispatcher, parent: QObject | None = None):
+        super().__init__(document, changes, parent)
+        self.trie = PrefixTrie()
+        # Identifiers of each indexed block, block numbers are indexes
+        self.__blocks: list[frozenset[str]] = []
+        # Number of lines each identifier is found on
+        self.__lines: dict[str, int] = {}
+
+        # The document is indexed in time slices, edits meanwhile only touch what is indexed already
+        self.__timer = QTimer(self)
+        self.__timer.setInterval(0)
+        self.__timer.timeout.connect(self.__step)
+        self.__timer.start()
+
+    def is_indexing(self) -> bool:
+        return self.__timer.isActive()
+
+    def on_changes(self, changes: list[ContentChange]):
+        # Replayed block wise in edit order, changed blocks are scanned once the text is final
+        dirty: list[tuple[int, int]] = []
+        for change in changes:
+            lo, hi, added = change.block, change.block + change.blocks_removed, change.blocks_added
+            indexed = len(self.__blocks)
+            if lo >= indexed:
+                continue
+            if hi > indexed:
+                # Crossing the indexing frontier: indexing resumes at the first changed block
+                hi, added = indexed, 0
+            self.__splice(lo, hi, [frozenset()] * added)
+            dirty = _shift_ranges(dirty, lo, hi, added)
+            if added:
+                dirty.append((lo, lo + added))
+
+        for lo, hi in dirty:
+            block = self.document.findBlockByNumber(lo)
+            identifiers = []
+            for _ in range(lo, hi):
+                identifiers.append(_block_identifiers(block))
+                block = block.next()
+            self.__splice(lo, hi, identifiers)
+
+    def completions(self, prefix: str, limit: int = COMPLETION_LIMIT) -> list[str]:
+        if len(prefix) < MIN_IDENTIFIER_CHARS - 1:
+            return []
+        # The word being typed is in the document too, it is no completion of itself
+        words = self.trie.complete(prefix, limit + 1)
+        return [word for word in words if word != prefix][:limit]
+
+    def close(self):
+        self.__timer.stop()
+        super().close()
+
+    def __splice(self, lo: int, hi: int, identifiers: list[frozenset[str]]):
+        lines = self.__lines
+        for words in self.__blocks[lo:hi]:
+            for word in words:
+                count = lines[word] - 1
+                if count == 0:
+                    del lines[word]
+                    self.trie.remove(word)
+                else:
+                    lines[word] = count
+        for words in identifiers:
+            for word in words:
+                count = lines.get(word, 0)
+                if count == 0:
+                    self.trie.add(word)
+                lines[word] = count + 1
+        self.__blocks[lo:hi] = identifiers
+
+    def __step(self):
+        # Pending edits are replayed over what is indexed before indexing goes on with the current text
+        self.changes.flush()
+        indexed = len(self.__blocks)
+        block = self.document.findBlockByNumber(indexed)
+        deadline = perf_counter() + INDEX_SLICE_MS / 1000
+        while block.isValid() and perf_counter() < deadline:
+            # Checking the clock costs about as much as scanning a line
+            identifiers = []
+            for _ in range(64):
+                if not block.isValid():
+                    break
+                identifiers.append(_block_identifiers(block))
+                block = block.next()
+            self.__splice(indexed, indexed, identifiers)
+            indexed += len(identifiers)
+
+        if not block.isValid():
+            self.__timer.stop()
+            logger.debug("Indexed %s identifiers over %s blocks", len(self.trie), len(self.__blocks))
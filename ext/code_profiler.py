@@ -0,0 +1,142 @@
+import json
+import re
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from threading import Lock
+
+import logging
+logger = logging.getLogger(Path(__file__).name)
+
+# Params
+HOT_RULE_SHARE = 0.3
+SLOW_RULE_MEAN_US = 50.0
+WIDE_MATCH_CHARS = 80
+SLOWEST_BLOCKS = 20
+
+# Private params
+_GREEDY_WILDCARD_REXP = re.compile(r"(?<!\\)\.[*+](?![?+])")
+_NESTED_QUANTIFIER_REXP = re.compile(r"\((?:[^()\\]|\\.)*[*+]\)[*+{]")
+
+
+@dataclass
+class RuleStats:
+    index: int
+    pattern: str
+    invocations: int = 0
+    matches: int = 0
+    matched_chars: int = 0
+    scanned_chars: int = 0
+    total_ns: int = 0
+    max_ns: int = 0
+    warnings: list[str] = field(default_factory=list)
+
+    @property
+    def mean_us(self) -> float:
+        return self.total_ns / self.invocations / 1000 if self.invocations else 0.0
+
+    @property
+    def mean_match_chars(self) -> float:
+        return self.matched_chars / self.matches if self.matches else 0.0
+
+
+@dataclass
+class BlockStats:
+    line: int
+    length: int
+    ns: int
+
+
+def pattern_warnings(pattern: str) -> list[str]:
+    warnings = []
+    if _GREEDY_WILDCARD_REXP.search(pattern):
+        warnings.append('greedy wildcard: a match runs to the last possible delimiter and swallows tokens in between')
+    if _NESTED_QUANTIFIER_REXP.search(pattern):
+        warnings.append('nested quantifier: catastrophic backtracking on non-matching input')
+    return warnings
+
+
+# Collects per-rule and per-block timings, safe to feed from tokenize workers
+class RuleProfiler:
+    def __init__(self, patterns: list[str]):
+        self.rules = [RuleStats(idx, pattern, warnings=pattern_warnings(pattern)) for idx, pattern in enumerate(patterns)]
+        self.blocks: list[BlockStats] = []
+        self.block_count = 0
+        self.block_ns = 0
+
+        self.__lock = Lock()
+
+    def record_rule(self, index: int, ns: int, text_length: int, match_lengths: list[int]):
+        with self.__lock:
+            stats = self.rules[index]
+            stats.invocations += 1
+            stats.matches += len(match_lengths)
+            stats.matched_chars += sum(match_lengths)
+            stats.scanned_chars += text_length
+            stats.total_ns += ns
+            stats.max_ns = max(stats.max_ns, ns)
+
+    def record_block(self, line: int, length: int, ns: int):
+        with self.__lock:
+            self.block_count += 1
+            self.block_ns += ns
+            self.blocks.append(BlockStats(line, length, ns))
+            if len(self.blocks) > SLOWEST_BLOCKS * 2:
+                self.blocks.sort(key=lambda block: block.ns, reverse=True)
+                del self.blocks[SLOWEST_BLOCKS:]
+
+    def reset(self):
+        with self.__lock:
+            for stats in self.rules:
+                stats.invocations = stats.matches = stats.matched_chars = stats.scanned_chars = 0
+                stats.total_ns = stats.max_ns = 0
+            self.blocks.clear()
+            self.block_count = self.block_ns = 0
+
+    def __rule_warnings(self, stats: RuleStats, rules_ns: int) -> list[str]:
+        warnings = list(stats.warnings)
+        if rules_ns and stats.total_ns / rules_ns >= HOT_RULE_SHARE:
+            warnings.append(f'hot: {stats.total_ns / rules_ns:.0%} of rule time')
+        if stats.mean_us >= SLOW_RULE_MEAN_US:
+            warnings.append(f'slow: {stats.mean_us:.1f}us per block')
+        if stats.mean_match_chars >= WIDE_MATCH_CHARS:
+            warnings.append(f'wide matches: {stats.mean_match_chars:.0f} chars on average')
+        return warnings
+
+    def report(self) -> dict:
+        with self.__lock:
+            rules_ns = sum(stats.total_ns for stats in self.rules)
+            rules = [
+                asdict(stats) | {
+                    'mean_us': round(stats.mean_us, 3),
+                    'mean_match_chars': round(stats.mean_match_chars, 1),
+                    'share': round(stats.total_ns / rules_ns, 4) if rules_ns else 0.0,
+                    'warnings': self.__rule_warnings(stats, rules_ns),
+                }
+                for stats in sorted(self.rules, key=lambda stats: stats.total_ns, reverse=True)
+            ]
+            blocks = [asdict(block) for block in sorted(self.blocks, key=lambda block: block.ns, reverse=True)]
+            return {
+                'block_count': self.block_count,
+                'block_ms': round(self.block_ns / 1e6, 3),
+                'rules_ms': round(rules_ns / 1e6, 3),
+                'rules': rules,
+                'slowest_blocks': blocks[:SLOWEST_BLOCKS],
+            }
+
+    def dump(self, path: str | Path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+        logger.info("Highlighting profile written to %s", path)
+
+
+def format_report(report: dict) -> str:
+    lines = [f"{report['block_count']} blocks in {report['block_ms']:.1f}ms, rules {report['rules_ms']:.1f}ms", '']
+    for stats in report['rules']:
+        pattern = stats['pattern'].replace('\n', '\\n')
+        lines.append(f"#{stats['index']:<3} {stats['share']:>6.1%} {stats['total_ns'] / 1e6:>9.2f}ms "
+                     f"{stats['invocations']:>8} calls {stats['matches']:>8} matches  {pattern}")
+        lines.extend(f'        ! {warning}' for warning in stats['warnings'])
+    lines.append('')
+    lines.extend(f"line {block['line'] + 1:<8} {block['length']:>6} chars {block['ns'] / 1000:>9.1f}us"
+                 for block in report['slowest_blocks'])
+    return '\n'.join(lines)
@@ -0,0 +1,209 @@
+import re
+from pathlib import Path
+
+from PyQt6.QtGui import QTextBlock, QTextBlockUserData, QTextDocument
+
+import logging
+logger = logging.getLogger(Path(__file__).name)
+
+# Params
+TAB_COLUMNS = 4
+# Bracket matching gives up that many blocks away, it runs on every cursor move (~3 us a block)
+MATCH_SCAN_BLOCKS = 5000
+
+# Private params
+_BRACKET_REXP = re.compile(r'[()\[\]{}]')
+_OPENING = {'(': ')', '[': ']', '{': '}'}
+_CLOSING = {')': '(', ']': '[', '}': '{'}
+
+
+# Structure of a block, computed on first use and kept until the text of the block changes. Bracket depths are
+# relative to the start of the block, all kinds of brackets counted together, so an edit never touches other blocks:
+# delta is the depth at the end, low the lowest depth after a bracket, back_low the same going from the end backwards
+class BlockStructure(QTextBlockUserData):
+    def __init__(self, revision: int, indent: int, delta: int, low: int, back_low: int, folded: bool = False):
+        super().__init__()
+        self.revision = revision
+        # Columns of leading whitespace, -1 for a blank block
+        self.indent = indent
+        self.delta = delta
+        self.low = low
+        self.back_low = back_low
+        # Following blocks are hidden by a fold started here
+        self.folded = folded
+
+
+def block_structure(block: QTextBlock) -> BlockStructure:
+    data = block.userData()
+    if isinstance(data, BlockStructure) and data.revision == block.revision():
+        return data
+
+    text = block.text()
+    stripped = text.lstrip()
+    indent = len(text[:len(text) - len(stripped)].expandtabs(TAB_COLUMNS)) if stripped else -1
+
+    depth, low, low_before = 0, 0, 0
+    for match in _BRACKET_REXP.finditer(text):
+        low_before = min(low_before, depth)
+        depth += 1 if match.group() in _OPENING else -1
+        low = min(low, depth)
+
+    # A fold survives edits of its first line, its blocks are still hidden
+    folded = data.folded if isinstance(data, BlockStructure) else False
+    structure = BlockStructure(block.revision(), indent, depth, low, low_before - depth, folded)
+    block.setUserData(structure)
+    return structure
+
+
+# Text offsets count code points, document positions count UTF-16 units
+def _utf16_offset(text: str, offset: int) -> int:
+    return len(text[:offset].encode('utf-16-le')) // 2
+
+
+def _text_offset(text: str, utf16_offset: int) -> int:
+    return len(text.encode('utf-16-le')[:utf16_offset * 2].decode('utf-16-le', 'ignore'))
+
+
+# Position of the bracket matching the one at position, None when it is unmatched or closed by another kind
+def match_bracket(document: QTextDocument, position: int) -> int | None:
+    block = document.findBlock(position)
+    text = block.text()
+    offset = _text_offset(text, position - block.position())
+    char = text[offset] if offset < len(text) else ''
+
+    if char in _OPENING:
+        found = _match_forward(block, offset)
+    elif char in _CLOSING:
+        found = _match_backward(block, offset)
+    else:
+        return None
+    if found is None:
+        return None
+
+    found_block, found_offset = found
+    found_char = found_block.text()[found_offset]
+    if _OPENING.get(char, None) != found_char and _CLOSING.get(char, None) != found_char:
+        return None
+    return found_block.position() + _utf16_offset(found_block.text(), found_offset)
+
+
+# Depth goes down to -1 at the match, blocks not reaching that low are skipped without reading their text
+def _match_forward(block: QTextBlock, offset: int) -> tuple[QTextBlock, int] | None:
+    depth = 0
+    start = offset + 1
+    for _ in range(MATCH_SCAN_BLOCKS):
+        if start > 0 or depth + block_structure(block).low <= -1:
+            for match in _BRACKET_REXP.finditer(block.text(), start):
+                depth += 1 if match.group() in _OPENING else -1
+                if depth == -1:
+                    return block, match.start()
+        else:
+            depth += block_structure(block).delta
+
+        block = block.next()
+        start = 0
+        if not block.isValid():
+            return None
+    return None
+
+
+def _match_backward(block: QTextBlock, offset: int) -> tuple[QTextBlock, int] | None:
+    depth = 0
+    end = offset
+    for _ in range(MATCH_SCAN_BLOCKS):
+        text = block.text()
+        if end is not None or depth + block_structure(block).back_low <= -1:
+            brackets = list(_BRACKET_REXP.finditer(text, 0, len(text) if end is None else end))
+            for match in reversed(brackets):
+                depth += 1 if match.group() in _CLOSING else -1
+                if depth == -1:
+                    return block, match.start()
+        else:
+            depth -= block_structure(block).delta
+
+        block = block.previous()
+        end = None
+        if not block.isValid():
+            return None
+    return None
+
+
+def _next_non_blank(block: QTextBlock) -> QTextBlock:
+    block = block.next()
+    while block.isValid() and block_structure(block).indent == -1:
+        block = block.next()
+    return block
+
+
+# A fold covers the blocks indented deeper than its first one, blank ones at its end excluded
+def is_fold_start(block: QTextBlock) -> bool:
+    structure = block_structure(block)
+    if structure.folded:
+        return True
+    if structure.indent == -1:
+        return False
+    following = _next_non_blank(block)
+    return following.isValid() and block_structure(following).indent > structure.indent
+
+
+def fold_end(block: QTextBlock) -> QTextBlock:
+    indent = block_structure(block).indent
+    end = block
+    following = _next_non_blank(block)
+    while following.isValid() and block_structure(following).indent > indent:
+        end = following
+        following = _next_non_blank(following)
+    return end
+
+
+# Start of the innermost fold holding block, block itself when it starts one
+def enclosing_fold(block: QTextBlock) -> QTextBlock | None:
+    if is_fold_start(block):
+        return block
+    indent = block_structure(block).indent
+    block = block.previous()
+    while block.isValid():
+        block_indent = block_structure(block).indent
+        if block_indent != -1 and (indent == -1 or block_indent < indent) and is_fold_start(block):
+            return block
+        block = block.previous()
+    return None
+
+
+def _mark_dirty(document: QTextDocument, first: QTextBlock, last: QTextBlock):
+    # Visibility of blocks is only taken into account once they are laid out again, all of them in one pass
+    document.markContentsDirty(first.position(), last.position() + last.length() - first.position())
+
+
+def fold(document: QTextDocument, block: QTextBlock) -> bool:
+    end = fold_end(block)
+    if end == block:
+        return False
+    block_structure(block).folded = True
+
+    first = block.next()
+    hidden = first
+    end_number = end.blockNumber()
+    while hidden.isValid() and hidden.blockNumber() <= end_number:
+        hidden.setVisible(False)
+        hidden = hidden.next()
+    _mark_dirty(document, first, end)
+    return True
+
+
+# Nested folds stay folded. Blocks to show are the hidden ones following block, the fold may have changed since
+def unfold(document: QTextDocument, block: QTextBlock):
+    block_structure(block).folded = False
+
+    first = last = block.next()
+    shown = first
+    while shown.isValid() and not shown.isVisible():
+        shown.setVisible(True)
+        last = shown
+        data = shown.userData()
+        if isinstance(data, BlockStructure) and data.folded:
+            last = fold_end(shown)
+            shown = last
+        shown = shown.next()
+    if first.isValid():
+        _mark_dirty(document, first, last)
@@ -0,0 +1,105 @@
+from dataclasses import dataclass
+from functools import reduce
+from pathlib import Path
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+from PyQt6.QtGui import QTextDocument
+
+import logging
+logger = logging.getLogger(Path(__file__).name)
+
+# Params
+# Changes are dispatched at most once per frame
+CHANGE_DISPATCH_MS = 16
+# Past that many separate ranges, pending changes are merged into a single one covering them all
+MAX_PENDING_CHANGES = 64
+
+
+# Text in [position, position + removed) was replaced by added characters, as QTextDocument.contentsChange reports it.
+# The same for whole blocks: blocks_removed blocks from block on were replaced by blocks_added blocks
+@dataclass
+class ContentChange:
+    position: int
+    removed: int
+    added: int
+    block: int = 0
+    blocks_removed: int = 0
+    blocks_added: int = 0
+
+
+# Single range covering first followed by second; what lies between them counts as replaced
+def _merge_ranges(first: tuple[int, int, int], second: tuple[int, int, int]) -> tuple[int, int, int]:
+    first_start, first_removed, first_added = first
+    second_start, second_removed, second_added = second
+    start = min(first_start, second_start)
+    # Both ends are in the text as it was between the two changes
+    end = max(first_start + first_added, second_start + second_removed)
+    return start, end - first_added + first_removed - start, end - second_removed + second_added - start
+
+
+def merge_changes(first: ContentChange, second: ContentChange) -> ContentChange:
+    chars = _merge_ranges((first.position, first.removed, first.added),
+                          (second.position, second.removed, second.added))
+    blocks = _merge_ranges((first.block, first.blocks_removed, first.blocks_added),
+                           (second.block, second.blocks_removed, second.blocks_added))
+    return ContentChange(*chars, *blocks)
+
+
+def _touches(first: ContentChange, second: ContentChange) -> bool:
+    return first.position <= second.position + second.removed and second.position <= first.position + first.added
+
+
+# Every edit of a document, whatever its origin (typing, paste, drop, undo, a loader or a reload), comes through
+# contentsChange. Bursts are collected and handed to subscribers once per frame as a list of ranges in edit order,
+# adjacent edits such as typed characters merged into one range. Each change is in the coordinates of the text
+# right after it, so subscribers replay them in order
+class ChangeDispatcher(QObject):
+    changed = pyqtSignal(object)
+
+    def __init__(self, document: QTextDocument, parent: QObject | None = None):
+        super().__init__(parent)
+        self.document = document
+        self.__pending: list[ContentChange] = []
+        self.__block_count = document.blockCount()
+
+        self.__timer = QTimer(self)
+        self.__timer.setSingleShot(True)
+        self.__timer.setInterval(CHANGE_DISPATCH_MS)
+        self.__timer.timeout.connect(self.flush)
+
+        document.contentsChange.connect(self.__on_contents_change)
+
+    # Dispatches right away, for subscribers that must not lag behind the text
+    def flush(self):
+        self.__timer.stop()
+        if not self.__pending:
+            return
+        changes, self.__pending = self.__pending, []
+        self.changed.emit(changes)
+
+    def __on_contents_change(self, position: int, removed: int, added: int):
+        # Qt reports an edit block whose insertions and removals cancel out, such as text typed and deleted again,
+        # as nothing removed or added: the text and blocks are the same as before, subscribers have nothing to
+        # redo. Format changes are not filtered here, they come with removed and added both set to their length
+        if removed == 0 and added == 0:
+            return
+
+        # Block numbers are only right at the time of the change, later edits may shift them
+        block_count = self.document.blockCount()
+        first = self.document.findBlock(position)
+        last = self.document.findBlock(position + added)
+        first_number = first.blockNumber() if first.isValid() else block_count - 1
+        blocks_added = (last.blockNumber() if last.isValid() else block_count - 1) - first_number + 1
+        blocks_removed = blocks_added - (block_count - self.__block_count)
+        self.__block_count = block_count
+
+        change = ContentChange(position, removed, added, first_number, blocks_removed, blocks_added)
+        if self.__pending and _touches(self.__pending[-1], change):
+            self.__pending[-1] = merge_changes(self.__pending[-1], change)
+        else:
+            self.__pending.append(change)
+            if len(self.__pending) > MAX_PENDING_CHANGES:
+                self.__pending = [reduce(merge_changes, self.__pending)]
+
+        if not self.__timer.isActive():
+            self.__timer.start()
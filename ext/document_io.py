@@ -0,0 +1,622 @@
+import codecs
+import gzip
+import io
+import locale
+import mmap
+import os
+import tempfile
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+from pathlib import Path
+from queue import Queue, Empty, Full
+from threading import Thread, Event
+from time import perf_counter
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+from PyQt6.QtGui import QTextDocument, QTextCursor
+
+from ext.file_watcher import file_state, line_diff
+
+import logging
+logger = logging.getLogger(Path(__file__).name)
+
+# Params
+DEFAULT_ENCODING = 'utf-8'
+# Tried in order when the beginning of a file is not valid UTF-8, the last one should accept any byte
+FALLBACK_ENCODINGS = ['cp1251', 'latin-1']
+SNIFF_BYTES = 64 * 1024
+LOAD_CHUNK_CHARS = 64 * 1024
+LOAD_SLICE_MS = 16
+LOAD_QUEUE_CHUNKS = 16
+LOAD_CANCEL_POLL_S = 0.1
+IO_WORKERS = 2
+SAVE_CHUNK_CHARS = 1024 * 1024
+# Swap files of edited tabs are written there periodically, None disables autosave
+SWAP_PATH: Path | None = None
+# Swap files hold any text, whatever the encoding of their file
+SWAP_ENCODING = 'utf-8'
+AUTOSAVE_INTERVAL_MS = 30000
+# Unmodified tabs left in background that long give their document up, None disables it
+IDLE_TAB_S: int | None = 600
+IDLE_CHECK_INTERVAL_MS = 60000
+# Keep the text of idle tabs gzip compressed in memory instead of reloading it from disk
+IDLE_TAB_COMPRESS = True
+IDLE_COMPRESS_LEVEL = 6
+# Files from this size on are opened in the read-only memory-mapped viewer
+VIEWER_MIN_BYTES = 256 * 1024 * 1024
+INDEX_CHUNK_BYTES = 64 * 1024
+INDEX_PROGRESS_CHUNKS = 256
+MAX_LINE_BYTES = 64 * 1024
+# A file that grew is only read from its previous end if that many bytes before it are unchanged
+TAIL_CHECK_BYTES = 64 * 1024
+
+# Private params
+# Longer marks first: the UTF-32 LE BOM starts with the UTF-16 LE one
+_BOM_ENCODINGS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+_BLOB_ENCODING = 'utf-8'
+_IO_POOL: ThreadPoolExecutor | None = None
+_SWAP_POOL: ThreadPoolExecutor | None = None
+# os.umask can only be read by setting it
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def __decodes(head: bytes, encoding: str, complete: bool) -> bool:
+    try:
+        codecs.getincrementaldecoder(encoding)().decode(head, final=complete)
+        return True
+    except (UnicodeDecodeError, LookupError):
+        return False
+
+
+# Only the beginning of the file is looked at: a BOM wins, then strict UTF-8 (a multibyte sequence cut
+# by the end of the sample is fine), then the locale encoding and FALLBACK_ENCODINGS
+def detect_encoding(head: bytes, complete: bool = False) -> str:
+    for bom, encoding in _BOM_ENCODINGS:
+        if head.startswith(bom):
+            return encoding
+
+    candidates = ['utf-8', locale.getpreferredencoding(False)] + FALLBACK_ENCODINGS
+    for encoding in candidates:
+        if __decodes(head, encoding, complete):
+            return codecs.lookup(encoding).name
+    return FALLBACK_ENCODINGS[-1]
+
+
+# Encoding of the file as it is on disk now, None when it cannot be read
+def detect_file_encoding(path: str | Path) -> str | None:
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(SNIFF_BYTES)
+            return detect_encoding(head, len(head) < SNIFF_BYTES)
+    except OSError:
+        return None
+
+
+def _tail_digest(data: bytes) -> bytes:
+    return sha256(data[-TAIL_CHECK_BYTES:]).digest()
+
+
+# Digest of the bytes a file ends with at size, None when it cannot be read or is shorter by now
+def file_tail_digest(path: str | Path, size: int) -> bytes | None:
+    start = max(size - TAIL_CHECK_BYTES, 0)
+    try:
+        with open(path, 'rb') as f:
+            f.seek(start)
+            data = f.read(size - start)
+    except OSError:
+        return None
+    return _tail_digest(data) if len(data) == size - start else None
+
+
+def is_ascii_compatible(encoding: str) -> bool:
+    return not codecs.lookup(encoding).name.startswith(('utf-16', 'utf-32'))
+
+
+def _io_pool() -> ThreadPoolExecutor:
+    global _IO_POOL
+    if _IO_POOL is None:
+        _IO_POOL = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix='file-io')
+    return _IO_POOL
+
+
+# Streams a text file into a document: a worker reads and decodes chunks into a bounded queue,
+# the event loop drains it in time slices, so neither slow storage nor a huge file blocks the window.
+# Undo is disabled while loading, and the loaded text does not count as a modification
+class DocumentLoader(QObject):
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal()
+    failed = pyqtSignal(str)
+    chunk_ready = pyqtSignal()
+
+    def __init__(self, path: str | Path, document: QTextDocument, encoding: str | None = None,
+                 blob: bytes | None = None, parent: QObject | None = None):
+        super().__init__(parent)
+        self.path = Path(path)
+        self.document = document
+        self.encoding = encoding
+        self.blob = blob
+        self.total_bytes = 0
+        self.loaded_bytes = 0
+        # Bytes of the file the text was read from, it may have grown past total_bytes meanwhile, and their digest
+        self.read_bytes: int | None = None
+        self.read_digest: bytes | None = None
+
+        self.__running = False
+        self.__cancelled = Event()
+        self.__queue: Queue = Queue(LOAD_QUEUE_CHUNKS)
+        self.__cursor: QTextCursor | None = None
+        self.__undo_enabled = document.isUndoRedoEnabled()
+        self.__modified = document.isModified()
+        self.__timer = QTimer(self)
+        self.__timer.setInterval(0)
+        self.__timer.timeout.connect(self.__step)
+        self.chunk_ready.connect(self.__on_chunk_ready)
+
+    def start(self):
+        logger.debug("Loading '%s'", self.path)
+        self.__running = True
+        self.document.setUndoRedoEnabled(False)
+        self.__cursor = QTextCursor(self.document)
+        self.__cursor.movePosition(QTextCursor.MoveOperation.End)
+        _io_pool().submit(self.__read)
+
+    def is_running(self) -> bool:
+        return self.__running
+
+    def cancel(self):
+        if self.is_running():
+            logger.debug("Loading '%s' cancelled at %s bytes", self.path, self.loaded_bytes)
+            self.__cancelled.set()
+            self.__close()
+
+    # Worker side
+    def __read(self):
+        try:
+            # A compressed blob keeps the text of a reclaimed tab, the file encoding is only carried along
+            if self.blob is not None:
+                raw = gzip.GzipFile(fileobj=io.BytesIO(self.blob), mode='rb')
+                self.total_bytes = blob_size(self.blob)
+                text_encoding = _BLOB_ENCODING
+            else:
+                raw = open(self.path, 'rb')
+                self.total_bytes = os.fstat(raw.fileno()).st_size
+                if self.encoding is None:
+                    self.encoding = detect_encoding(raw.read(SNIFF_BYTES), self.total_bytes <= SNIFF_BYTES)
+                    raw.seek(0)
+                    logger.debug("Detected encoding of '%s' as %s", self.path, self.encoding)
+                text_encoding = self.encoding
+
+            # Text mode keeps universal newlines and decodes incrementally across chunk boundaries
+            with io.TextIOWrapper(raw, encoding=text_encoding) as f:
+                while not self.__cancelled.is_set():
+                    chunk = f.read(LOAD_CHUNK_CHARS)
+                    if not chunk:
+                        break
+                    if not self.__put((chunk, min(f.buffer.tell(), self.total_bytes))):
+                        return
+                if self.blob is None:
+                    self.read_bytes = f.buffer.tell()
+            if self.read_bytes is not None:
+                self.read_digest = file_tail_digest(self.path, self.read_bytes)
+            self.__put(None)
+        except Exception as e:
+            self.__put(e)
+
+    def __put(self, item) -> bool:
+        while not self.__cancelled.is_set():
+            try:
+                self.__queue.put(item, timeout=LOAD_CANCEL_POLL_S)
+                self.chunk_ready.emit()
+                return True
+            except Full:
+                pass
+        return False
+
+    # GUI side
+    def __on_chunk_ready(self):
+        if self.__running and not self.__timer.isActive():
+            self.__timer.start()
+
+    def __step(self):
+        deadline = perf_counter() + LOAD_SLICE_MS / 1000
+        while perf_counter() < deadline:
+            try:
+                item = self.__queue.get_nowait()
+            except Empty:
+                self.__timer.stop()
+                break
+
+            if item is None:
+                self.__close()
+                self.loaded_bytes = self.total_bytes
+                self.progress.emit(self.total_bytes, self.total_bytes)
+                self.finished.emit()
+                return
+            if isinstance(item, Exception):
+                logger.error("Unable to load '%s': %s", self.path, item)
+                self.__close()
+                self.failed.emit(str(item))
+                return
+
+            chunk, self.loaded_bytes = item
+            self.__cursor.insertText(chunk)
+
+        self.progress.emit(self.loaded_bytes, self.total_bytes)
+
+    def __close(self):
+        self.__running = False
+        self.__timer.stop()
+        self.__cursor = None
+        self.document.setUndoRedoEnabled(self.__undo_enabled)
+        self.document.setModified(self.__modified)
+
+
+class SaveCancelled(Exception):
+    pass
+
+
+def __fsync_dir(path: Path):
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+# The text goes to a temporary file next to the target, is fsynced and renamed over the target,
+# so a crash or a cancel leaves either the old or the new file, never a truncated one
+def write_atomic(path: str | Path, text: str, cancelled: Event | None = None, encoding: str = DEFAULT_ENCODING):
+    path = Path(path)
+    if path.is_symlink():
+        path = path.resolve()
+
+    fd, temp_name = tempfile.mkstemp(prefix=f'.{path.name}.', suffix='.tmp', dir=path.parent)
+    try:
+        with os.fdopen(fd, 'w', encoding=encoding) as f:
+            for pos in range(0, len(text), SAVE_CHUNK_CHARS):
+                if cancelled is not None and cancelled.is_set():
+                    raise SaveCancelled()
+                f.write(text[pos:pos + SAVE_CHUNK_CHARS])
+            f.flush()
+            os.fsync(f.fileno())
+
+        mode = path.stat().st_mode & 0o7777 if path.exists() else 0o666 & ~_UMASK
+        os.chmod(temp_name, mode)
+        os.replace(temp_name, path)
+    except BaseException:
+        Path(temp_name).unlink(missing_ok=True)
+        raise
+
+    try:
+        __fsync_dir(path.parent)
+    except OSError as e:
+        logger.warning("Unable to sync directory of '%s': %s", path, e)
+
+
+# Writes a text snapshot taken on the GUI thread from a worker, atomically. A text the encoding cannot represent
+# is reported apart from other failures, the file is left untouched then
+class DocumentWriter(QObject):
+    finished = pyqtSignal()
+    failed = pyqtSignal(str)
+    unencodable = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, path: str | Path, text: str, encoding: str = DEFAULT_ENCODING, parent: QObject | None = None):
+        super().__init__(parent)
+        self.path = Path(path)
+        self.encoding = encoding
+        # The file as written, for the tab to tell its own save from changes made by others
+        self.disk_state: tuple[int, int] | None = None
+        self.disk_digest: bytes | None = None
+
+        self.__text: str | None = text
+        self.__running = False
+        self.__cancelled = Event()
+
+    def start(self):
+        logger.debug("Saving '%s'", self.path)
+        self.__running = True
+        _io_pool().submit(self.__write)
+
+    def is_running(self) -> bool:
+        return self.__running
+
+    def cancel(self):
+        self.__cancelled.set()
+
+    def __write(self):
+        text, self.__text = self.__text, None
+        try:
+            write_atomic(self.path, text, self.__cancelled, self.encoding)
+        except SaveCancelled:
+            logger.debug("Saving '%s' cancelled", self.path)
+            self.__running = False
+            self.cancelled.emit()
+            return
+        except UnicodeEncodeError as e:
+            logger.warning("Unable to save '%s' as %s: %s", self.path, self.encoding, e)
+            self.__running = False
+            self.unencodable.emit(str(e))
+            return
+        except Exception as e:
+            logger.error("Unable to save '%s': %s", self.path, e)
+            self.__running = False
+            self.failed.emit(str(e))
+            return
+
+        self.disk_state = file_state(self.path)
+        if self.disk_state is not None:
+            self.disk_digest = file_tail_digest(self.path, self.disk_state[1])
+        self.__running = False
+        self.finished.emit()
+
+
+# Rereads a file changed on disk and diffs it against the text it was open with, both in a worker. A file that only
+# grew is read from where the text ends instead (tail_from, its size when last read, tail_digest that of the bytes
+# it ended with): the new bytes are appended to the last line of the text. Replacements are None when the file
+# turns out to be changed before tail_from, it has to be reloaded as a whole then
+class DocumentReloader(QObject):
+    finished = pyqtSignal()
+    failed = pyqtSignal(str)
+
+    def __init__(self, path: str | Path, text: str | None, encoding: str = DEFAULT_ENCODING,
+                 parent: QObject | None = None, tail_from: int | None = None, tail_digest: bytes | None = None,
+                 last_line: str = '', line_count: int = 1):
+        super().__init__(parent)
+        self.path = Path(path)
+        self.encoding = encoding
+        self.tail_from = tail_from
+        self.tail_digest = tail_digest
+        self.last_line = last_line
+        self.line_count = line_count
+        # Size is that of the bytes read, so the next tail starts right after them; seen_state is the file as it was
+        # found, a change since then is still to be read
+        self.disk_state: tuple[int, int] | None = None
+        self.disk_digest: bytes | None = None
+        self.seen_state: tuple[int, int] | None = None
+        self.replacements: list[tuple[int, int, list[str]]] | None = []
+
+        self.__text: str | None = text
+
+    def start(self):
+        _io_pool().submit(self.__reload if self.tail_from is None else self.__reload_tail)
+
+    def __reload(self):
+        text, self.__text = self.__text, None
+        try:
+            state = self.seen_state = file_state(self.path)
+            with open(self.path, mode='rb') as f:
+                raw = f.read()
+            new_text = io.TextIOWrapper(io.BytesIO(raw), encoding=self.encoding).read()
+            self.disk_state = (state[0], len(raw)) if state is not None else None
+            self.disk_digest = _tail_digest(raw)
+            self.replacements = line_diff(text.split('\n'), new_text.split('\n'))
+        except Exception as e:
+            logger.warning("Unable to reload '%s': %s", self.path, e)
+            self.failed.emit(str(e))
+            return
+        logger.debug("'%s' reloaded with %s changed ranges", self.path, len(self.replacements))
+        self.finished.emit()
+
+    def __reload_tail(self):
+        try:
+            self.replacements = self.__read_tail()
+        except Exception as e:
+            logger.warning("Unable to reload '%s': %s", self.path, e)
+            self.failed.emit(str(e))
+            return
+        if self.replacements is None:
+            logger.debug("'%s' did not just grow, it is reloaded as a whole", self.path)
+        self.finished.emit()
+
+    def __read_tail(self) -> list[tuple[int, int, list[str]]] | None:
+        state = self.seen_state = file_state(self.path)
+        if state is None or state[1] < self.tail_from:
+            return None
+        start = max(self.tail_from - TAIL_CHECK_BYTES, 0)
+        with open(self.path, mode='rb') as f:
+            f.seek(start)
+            raw = f.read()
+
+        # Something was inserted or rewritten before the end of the text, not just appended
+        head, raw = raw[:self.tail_from - start], raw[self.tail_from - start:]
+        if _tail_digest(head) != self.tail_digest:
+            return None
+        # The text ends with a line break read from a lone CR, the tail may start with the LF of a CRLF
+        if head.endswith(b'\r'):
+            return None
+        # Bytes of a character or a CRLF cut by the end of what is written so far are left for the next time
+        raw = raw.removesuffix(b'\r')
+        decoder = codecs.getincrementaldecoder(self.encoding)()
+        tail = decoder.decode(raw, final=False)
+        read = len(raw) - len(decoder.getstate()[0])
+        self.disk_state = (state[0], self.tail_from + read)
+        self.disk_digest = _tail_digest(head + raw[:read])
+
+        if not tail:
+            return []
+        lines = tail.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+        lines[0] = self.last_line + lines[0]
+        return [(self.line_count - 1, self.line_count, lines)]
+
+
+# Idle tabs are packed as UTF-8 whatever their file encoding is, so any text survives the round trip
+class DocumentCompressor(QObject):
+    finished = pyqtSignal(bytes)
+    failed = pyqtSignal(str)
+
+    def __init__(self, text: str, parent: QObject | None = None):
+        super().__init__(parent)
+        self.__text: str | None = text
+
+    def start(self):
+        _io_pool().submit(self.__compress)
+
+    def __compress(self):
+        text, self.__text = self.__text, None
+        try:
+            blob = gzip.compress(text.encode(_BLOB_ENCODING), IDLE_COMPRESS_LEVEL)
+        except Exception as e:
+            logger.error("Unable to compress document: %s", e)
+            self.failed.emit(str(e))
+            return
+        logger.debug("Document of %s chars compressed to %s bytes", len(text), len(blob))
+        self.finished.emit(blob)
+
+
+# gzip trailer keeps the uncompressed size modulo 2^32, enough for progress reporting
+def blob_size(blob: bytes) -> int:
+    return int.from_bytes(blob[-4:], 'little')
+
+
+def _swap_pool() -> ThreadPoolExecutor:
+    global _SWAP_POOL
+    if _SWAP_POOL is None:
+        # A single worker keeps writes and removals of the same swap file in order
+        _SWAP_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix='swap')
+    return _SWAP_POOL
+
+
+def swap_file_path(key: str) -> Path | None:
+    if SWAP_PATH is None:
+        return None
+    return SWAP_PATH / f'{sha256(key.encode()).hexdigest()[:16]}.swp'
+
+
+def __write_swap(path: Path, text: str):
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_atomic(path, text, encoding=SWAP_ENCODING)
+        logger.debug("Swap file '%s' written", path)
+    except Exception as e:
+        logger.error("Unable to write swap file '%s': %s", path, e)
+
+
+def __drop_swap(path: Path):
+    try:
+        path.unlink(missing_ok=True)
+    except OSError as e:
+        logger.error("Unable to remove swap file '%s': %s", path, e)
+
+
+def save_swap(path: Path, text: str):
+    _swap_pool().submit(__write_swap, path, text)
+
+
+def drop_swap(path: Path):
+    _swap_pool().submit(__drop_swap, path)
+
+
+# Sparse line index over a read-only memory map: only the number of lines before every
+# INDEX_CHUNK_BYTES boundary is stored, so a multi-GB file costs a few hundred KB of index
+class LineIndex(QObject):
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal()
+
+    def __init__(self, path: str | Path, encoding: str | None = None, parent: QObject | None = None):
+        super().__init__(parent)
+        self.path = Path(path)
+        self.encoding = encoding
+        self.total_bytes = 0
+        self.indexed_bytes = 0
+
+        self.__file = None
+        self.__map: mmap.mmap | None = None
+        self.__checkpoints: list[int] = [0]
+        self.__newlines = 0
+        self.__thread: Thread | None = None
+        self.__cancelled = False
+        self.__bom_bytes = 0
+
+    def open(self):
+        self.__file = open(self.path, 'rb')
+        self.total_bytes = os.fstat(self.__file.fileno()).st_size
+        if self.total_bytes > 0:
+            self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.encoding is None:
+            head = self.__map[:SNIFF_BYTES] if self.__map is not None else b''
+            self.encoding = detect_encoding(head, self.total_bytes <= SNIFF_BYTES)
+        # Lines are split on the newline byte
+        if not is_ascii_compatible(self.encoding):
+            raise ValueError(f'{self.encoding} encoded files are not supported by the viewer')
+        if codecs.lookup(self.encoding).name == 'utf-8-sig':
+            self.encoding = 'utf-8'
+            self.__bom_bytes = len(codecs.BOM_UTF8)
+
+    def start(self):
+        self.__thread = Thread(target=self.__build, name=f'LineIndex({self.path.name})', daemon=True)
+        self.__thread.start()
+
+    def is_complete(self) -> bool:
+        return self.indexed_bytes >= self.total_bytes
+
+    def close(self):
+        self.__cancelled = True
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        if self.__map is not None:
+            self.__map.close()
+            self.__map = None
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+    # Lines are numbered the way QTextDocument numbers blocks: a trailing newline opens one more empty line
+    def line_count(self) -> int:
+        return self.__newlines + 1
+
+    def line_offset(self, line: int) -> int:
+        if line <= 0:
+            return self.__bom_bytes
+
+        chunk_idx = bisect_left(self.__checkpoints, line) - 1
+        pos = chunk_idx * INDEX_CHUNK_BYTES
+        for _ in range(line - self.__checkpoints[chunk_idx]):
+            pos = self.__map.find(b'\n', pos) + 1
+        return pos
+
+    def lines(self, first: int, count: int) -> list[str]:
+        last = min(first + count, self.line_count())
+        if self.__map is None or first >= last:
+            return [''] * max(0, last - first)
+
+        # Overlong lines are cut for display, the rest of the line is skipped without decoding
+        lines = []
+        pos = self.line_offset(first)
+        for _ in range(first, last):
+            end = self.__map.find(b'\n', pos)
+            if end == -1:
+                end = self.total_bytes
+            raw = self.__map[pos:min(end, pos + MAX_LINE_BYTES)]
+            lines.append(raw.decode(self.encoding, errors='replace').rstrip('\r'))
+            pos = end + 1
+        return lines
+
+    def __build(self):
+        started = perf_counter()
+        for chunk_idx, offset in enumerate(range(0, self.total_bytes, INDEX_CHUNK_BYTES)):
+            if self.__cancelled:
+                return
+            if chunk_idx > 0:
+                self.__checkpoints.append(self.__newlines)
+            self.__newlines += self.__map[offset:offset + INDEX_CHUNK_BYTES].count(b'\n')
+            self.indexed_bytes = min(offset + INDEX_CHUNK_BYTES, self.total_bytes)
+            if chunk_idx % INDEX_PROGRESS_CHUNKS == 0:
+                self.progress.emit(self.indexed_bytes, self.total_bytes)
+
+        self.indexed_bytes = self.total_bytes
+        logger.debug("Indexed %s lines of '%s' in %.2fs", self.line_count(), self.path, perf_counter() - started)
+        self.progress.emit(self.total_bytes, self.total_bytes)
+        self.finished.emit()
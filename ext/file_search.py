@@ -0,0 +1,231 @@
+import mmap
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, Future
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Thread, Event, Lock, Semaphore
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+import logging
+logger = logging.getLogger(Path(__file__).name)
+
+# Params
+SEARCH_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+FILES_PER_TASK = 64
+# Tasks queued ahead of the workers, the walk waits beyond that
+MAX_PENDING_TASKS = 64
+MAX_FILE_BYTES = 64 * 1024 * 1024
+MAX_MATCHES_PER_FILE = 1000
+# The search stops once that many lines matched
+MAX_RESULTS = 10000
+MAX_LINE_CHARS = 300
+# A NUL byte there marks a file of unknown suffix as binary
+SNIFF_BYTES = 8192
+SKIP_DIRS = ['.git', '.hg', '.svn', '__pycache__', 'node_modules', '.venv', 'venv', '.idea', '.mypy_cache',
+             '.pytest_cache', '.tox', '.cache']
+
+# Private params
+_PROCESS_POOL: ProcessPoolExecutor | None = None
+
+
+@dataclass
+class LineMatch:
+    line: int
+    column: int
+    text: str
+
+
+@dataclass
+class FileMatches:
+    path: str
+    matches: list[LineMatch]
+
+
+def _process_pool() -> ProcessPoolExecutor:
+    global _PROCESS_POOL
+    if _PROCESS_POOL is None:
+        # Forking a process running Qt threads is not safe, workers start clean
+        _PROCESS_POOL = ProcessPoolExecutor(SEARCH_WORKERS, multiprocessing.get_context('spawn'))
+    return _PROCESS_POOL
+
+
+# Patterns are bytes: files are matched as they are on disk, without decoding them. Case folding of bytes only
+# covers ASCII, so a case insensitive query with other characters is a str pattern and files are decoded for it
+def compile_file_query(query: str, regex: bool = False, case_sensitive: bool = False) -> re.Pattern:
+    flags = re.MULTILINE if case_sensitive else re.MULTILINE | re.IGNORECASE
+    pattern = query if regex else re.escape(query)
+    if not case_sensitive and not query.isascii():
+        return re.compile(pattern, flags)
+    return re.compile(pattern.encode('utf-8'), flags)
+
+
+def walk_files(root: str, skip_suffixes: set[str], cancelled: Event | None = None):
+    skip_dirs = set(SKIP_DIRS)
+    stack = [root]
+    while stack and not (cancelled is not None and cancelled.is_set()):
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in skip_dirs:
+                            stack.append(entry.path)
+                    elif entry.is_file() and os.path.splitext(entry.name)[1].lower() not in skip_suffixes:
+                        yield entry.path
+                except OSError:
+                    continue
+
+
+def _search_file(path: str, pattern: re.Pattern, text_suffixes: frozenset[str]) -> FileMatches | None:
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0 or size > MAX_FILE_BYTES:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if os.path.splitext(path)[1].lower() not in text_suffixes and data.find(b'\0', 0, SNIFF_BYTES) != -1:
+                return None
+
+            if isinstance(pattern.pattern, str):
+                matches = _search_lines(data[:].decode('utf-8', 'replace'), pattern, '\n', lambda text: text)
+            else:
+                matches = _search_lines(data, pattern, b'\n', lambda raw: raw.decode('utf-8', 'replace'))
+    return FileMatches(path, matches) if matches else None
+
+
+# Haystack is either the raw bytes of a file or its decoded text, decode turns a part of it into text
+def _search_lines(haystack, pattern: re.Pattern, newline, decode) -> list[LineMatch]:
+    matches = []
+    line, counted, pos = 0, 0, 0
+    while len(matches) < MAX_MATCHES_PER_FILE:
+        m = pattern.search(haystack, pos)
+        if m is None:
+            break
+        line_start = haystack.rfind(newline, 0, m.start()) + 1
+        line_end = haystack.find(newline, m.start())
+        if line_end == -1:
+            line_end = len(haystack)
+        line += haystack[counted:line_start].count(newline)
+        counted = line_start
+
+        text = decode(haystack[line_start:line_end]).rstrip('\r')
+        column = len(decode(haystack[line_start:m.start()]))
+        matches.append(LineMatch(line, column, text[:MAX_LINE_CHARS]))
+        # A line is reported once, whatever the number of matches in it
+        pos = max(line_end + 1, m.end())
+    return matches
+
+
+def _search_files(paths: list[str], pattern: re.Pattern, text_suffixes: frozenset[str]) -> list[FileMatches]:
+    results = []
+    for path in paths:
+        try:
+            file_matches = _search_file(path, pattern, text_suffixes)
+        except (OSError, ValueError):
+            continue
+        if file_matches is not None:
+            results.append(file_matches)
+    return results
+
+
+# Walks the tree in a thread and searches batches of files in worker processes, results come in as they are ready
+class FolderSearch(QObject):
+    matched = pyqtSignal(object)
+    finished = pyqtSignal()
+
+    def __init__(self, root: str | Path, pattern: re.Pattern, skip_suffixes: set[str], text_suffixes: set[str],
+                 parent: QObject | None = None):
+        super().__init__(parent)
+        self.root = str(root)
+        self.pattern = pattern
+        self.skip_suffixes = {suffix.lower() for suffix in skip_suffixes}
+        self.text_suffixes = frozenset(suffix.lower() for suffix in text_suffixes)
+        self.files_count = 0
+        self.matches_count = 0
+        self.truncated = False
+
+        self.__cancelled = Event()
+        self.__lock = Lock()
+        self.__futures: set[Future] = set()
+        self.__walking = False
+        self.__running = False
+        self.__slots = Semaphore(MAX_PENDING_TASKS)
+
+    def start(self):
+        logger.debug("Searching '%s' in '%s'", self.pattern.pattern, self.root)
+        self.__running = self.__walking = True
+        Thread(target=self.__walk, name='folder-search', daemon=True).start()
+
+    def is_running(self) -> bool:
+        return self.__running
+
+    def cancel(self):
+        self.__cancelled.set()
+        with self.__lock:
+            futures = list(self.__futures)
+        for future in futures:
+            future.cancel()
+
+    def __walk(self):
+        batch = []
+        try:
+            for path in walk_files(self.root, self.skip_suffixes, self.__cancelled):
+                batch.append(path)
+                if len(batch) == FILES_PER_TASK:
+                    self.__submit(batch)
+                    batch = []
+            if batch:
+                self.__submit(batch)
+        finally:
+            with self.__lock:
+                self.__walking = False
+            self.__finish_if_done()
+
+    def __submit(self, paths: list[str]):
+        while not self.__slots.acquire(timeout=0.1):
+            if self.__cancelled.is_set():
+                return
+        if self.__cancelled.is_set():
+            self.__slots.release()
+            return
+
+        future = _process_pool().submit(_search_files, paths, self.pattern, self.text_suffixes)
+        with self.__lock:
+            self.files_count += len(paths)
+            self.__futures.add(future)
+        future.add_done_callback(self.__on_done)
+
+    # Runs in a thread of the pool
+    def __on_done(self, future: Future):
+        self.__slots.release()
+        with self.__lock:
+            self.__futures.discard(future)
+
+        if not future.cancelled() and not self.__cancelled.is_set():
+            try:
+                results = future.result()
+            except Exception as e:
+                logger.warning("Folder search task failed: %s", e)
+                results = []
+            if results:
+                with self.__lock:
+                    self.matches_count += sum(len(file_matches.matches) for file_matches in results)
+                    truncated = self.matches_count >= MAX_RESULTS
+                self.matched.emit(results)
+                if truncated:
+                    self.truncated = True
+                    self.cancel()
+        self.__finish_if_done()
+
+    def __finish_if_done(self):
+        with self.__lock:
+            if not self.__running or self.__walking or self.__futures:
+                return
+            self.__running = False
+        logger.debug("Folder search done: %s files, %s matching lines", self.files_count, self.matches_count)
+        self.finished.emit()
@@ -0,0 +1,136 @@
+import os
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import Iterable
+
+from PyQt6.QtCore import QObject, QTimer, QFileSystemWatcher, pyqtSignal
+from PyQt6.QtGui import QTextDocument, QTextCursor
+
+import logging
+logger = logging.getLogger(Path(__file__).name)
+
+# Params
+WATCH_DEBOUNCE_MS = 300
+# Changed middles longer than that are replaced as a whole, matching them line by line is quadratic
+DIFF_MAX_LINES = 5000
+
+
+# (modification time, size) of a file, None when it is gone
+def file_state(path: str | Path) -> tuple[int, int] | None:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+# Replacements (first old line, end old line, new lines) turning old into new, in ascending order
+def line_diff(old: list[str], new: list[str]) -> list[tuple[int, int, list[str]]]:
+    prefix = 0
+    limit = min(len(old), len(new))
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    limit -= prefix
+    while suffix < limit and old[-suffix - 1] == new[-suffix - 1]:
+        suffix += 1
+
+    old_end, new_end = len(old) - suffix, len(new) - suffix
+    if prefix == old_end and prefix == new_end:
+        return []
+    if old_end - prefix > DIFF_MAX_LINES or new_end - prefix > DIFF_MAX_LINES:
+        return [(prefix, old_end, new[prefix:new_end])]
+
+    matcher = SequenceMatcher(None, old[prefix:old_end], new[prefix:new_end], autojunk=False)
+    return [
+        (prefix + i1, prefix + i2, new[prefix + j1:prefix + j2])
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != 'equal'
+    ]
+
+
+# Lines map one to one onto blocks; untouched blocks keep their highlighting, cursors move along with the text
+def apply_line_diff(document: QTextDocument, replacements: list[tuple[int, int, list[str]]]):
+    cursor = QTextCursor(document)
+    # Going from the end keeps line numbers of the replacements not applied yet valid
+    for idx, (first, end, lines) in enumerate(reversed(replacements)):
+        # One undo step, but separate edit blocks: a single one would report, and rehighlight, everything in between
+        if idx == 0:
+            cursor.beginEditBlock()
+        else:
+            cursor.joinPreviousEditBlock()
+        __apply_replacement(document, cursor, first, end, lines)
+        cursor.endEditBlock()
+
+
+def __apply_replacement(document: QTextDocument, cursor: QTextCursor, first: int, end: int, lines: list[str]):
+    block_count = document.blockCount()
+    if first == end:
+        if first < block_count:
+            cursor.setPosition(document.findBlockByNumber(first).position())
+            cursor.insertText('\n'.join(lines) + '\n')
+        else:
+            cursor.movePosition(QTextCursor.MoveOperation.End)
+            cursor.insertText('\n' + '\n'.join(lines))
+        return
+
+    if lines:
+        cursor.setPosition(document.findBlockByNumber(first).position())
+        last = document.findBlockByNumber(end - 1)
+        cursor.setPosition(last.position() + last.length() - 1, QTextCursor.MoveMode.KeepAnchor)
+        cursor.insertText('\n'.join(lines))
+    elif end < block_count:
+        cursor.setPosition(document.findBlockByNumber(first).position())
+        cursor.setPosition(document.findBlockByNumber(end).position(), QTextCursor.MoveMode.KeepAnchor)
+        cursor.removeSelectedText()
+    else:
+        previous = document.findBlockByNumber(first - 1)
+        cursor.setPosition(previous.position() + previous.length() - 1)
+        cursor.movePosition(QTextCursor.MoveOperation.End, QTextCursor.MoveMode.KeepAnchor)
+        cursor.removeSelectedText()
+
+
+# Reports each watched file once a burst of changes to it has settled
+class FileWatcher(QObject):
+    file_changed = pyqtSignal(str)
+
+    def __init__(self, parent: QObject | None = None):
+        super().__init__(parent)
+        self.__paths: set[str] = set()
+        self.__pending: set[str] = set()
+
+        self.__watcher = QFileSystemWatcher(self)
+        self.__watcher.fileChanged.connect(self.__on_file_changed)
+
+        self.__timer = QTimer(self)
+        self.__timer.setSingleShot(True)
+        self.__timer.setInterval(WATCH_DEBOUNCE_MS)
+        self.__timer.timeout.connect(self.__flush)
+
+    def set_paths(self, paths: Iterable[str]):
+        paths = set(paths)
+        watched = set(self.__watcher.files())
+        removed = [path for path in self.__paths - paths if path in watched]
+        if removed:
+            self.__watcher.removePaths(removed)
+        added = paths - self.__paths
+        self.__paths = paths
+        self.__pending &= paths
+        self.__watch(added)
+
+    def __watch(self, paths: Iterable[str]):
+        watched = set(self.__watcher.files())
+        paths = [path for path in paths if path not in watched and os.path.isfile(path)]
+        if paths:
+            self.__watcher.addPaths(paths)
+
+    def __on_file_changed(self, path: str):
+        self.__pending.add(path)
+        self.__timer.start()
+
+    def __flush(self):
+        pending, self.__pending = self.__pending, set()
+        # Files replaced by a rename, as atomic saves do, fall out of the watch list
+        self.__watch(pending)
+        for path in sorted(pending):
+            logger.debug("'%s' changed on disk", path)
+            self.file_changed.emit(path)
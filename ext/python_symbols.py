@@ -0,0 +1,182 @@
+import ast
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, Future
+from dataclasses import replace
+from hashlib import sha256
+from pathlib import Path
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+from PyQt6.QtGui import QTextDocument
+
+from ext.code_processor import IdentifierCompleter, Symbol
+from ext.document_changes import ChangeDispatcher, ContentChange
+
+import logging
+logger = logging.getLogger(Path(__file__).name)
+
+# Params
+# Symbols are parsed again once edits paused that long
+SYMBOL_DEBOUNCE_MS = 300
+SYMBOL_WORKERS = 1
+# Parsed texts remembered by content hash, shared by all tabs
+SYMBOL_CACHE_SIZE = 128
+# Larger texts are not parsed
+MAX_SYMBOL_CHARS = 8 * 1024 * 1024
+
+# Private params
+_PROCESS_POOL: ProcessPoolExecutor | None = None
+_SYMBOL_CACHE: OrderedDict[bytes, list[Symbol]] = OrderedDict()
+
+
+def _process_pool() -> ProcessPoolExecutor:
+    global _PROCESS_POOL
+    if _PROCESS_POOL is None:
+        # Forking a process running Qt threads is not safe, workers start clean
+        _PROCESS_POOL = ProcessPoolExecutor(SYMBOL_WORKERS, multiprocessing.get_context('spawn'))
+    return _PROCESS_POOL
+
+
+def _symbol(kind: str, name: str, node: ast.AST, lines: list[str], depth: int) -> Symbol:
+    line = node.lineno - 1
+    text = lines[line] if line < len(lines) else ''
+    # Offsets of ast count UTF-8 bytes
+    column = len(text.encode('utf-8')[:node.col_offset].decode('utf-8', 'replace'))
+    name_column = text.find(name, column)
+    return Symbol(kind, name, line, name_column if name_column != -1 else column, depth)
+
+
+def _collect_symbols(node: ast.AST, lines: list[str], depth: int, symbols: list[Symbol]):
+    for child in ast.iter_child_nodes(node):
+        if isinstance(child, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            kind = 'class' if isinstance(child, ast.ClassDef) else 'function'
+            symbols.append(_symbol(kind, child.name, child, lines, depth))
+            _collect_symbols(child, lines, depth + 1, symbols)
+        elif isinstance(child, (ast.Import, ast.ImportFrom)):
+            for alias in child.names:
+                if alias.name != '*':
+                    symbols.append(_symbol('import', alias.asname or alias.name, alias, lines, depth))
+        # Definitions under if, try, with or loops belong to the enclosing scope
+        elif isinstance(child, (ast.stmt, ast.excepthandler, ast.match_case)):
+            _collect_symbols(child, lines, depth, symbols)
+
+
+# Runs in a worker process; None for a text that does not parse
+def parse_symbols(text: str) -> list[Symbol] | None:
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        return None
+    symbols = []
+    _collect_symbols(tree, text.split('\n'), 0, symbols)
+    return symbols
+
+
+# Symbols moved along with the edited lines, until the text is parsed again
+def _shift_symbols(symbols: list[Symbol], changes: list[ContentChange]) -> list[Symbol]:
+    for change in changes:
+        lo, hi, added = change.block, change.block + change.blocks_removed, change.blocks_added
+        shift = added - (hi - lo)
+        if shift == 0:
+            continue
+        last = lo + max(added, 1) - 1
+        shifted = []
+        for symbol in symbols:
+            if symbol.line >= hi:
+                symbol = replace(symbol, line=symbol.line + shift)
+            elif symbol.line > last:
+                symbol = replace(symbol, line=last)
+            shifted.append(symbol)
+        symbols = shifted
+    return symbols
+
+
+# Python files: identifiers are completed as by IdentifierCompleter, and classes, functions and imports are listed
+# for the outline and go to definition. The text is parsed with ast in a worker process once edits pause,
+# in the meantime symbols follow the edited lines
+class PythonSymbolIndexer(IdentifierCompleter):
+    parsed = pyqtSignal(bytes, object)
+
+    def __init__(self, document: QTextDocument, changes: ChangeDispatcher, parent: QObject | None = None):
+        super().__init__(document, changes, parent)
+        self.__symbols: list[Symbol] = []
+        self.__future: Future | None = None
+        # Edits made after the text being parsed was taken, replayed over its symbols
+        self.__unparsed: list[ContentChange] = []
+
+        self.__parse_timer = QTimer(self)
+        self.__parse_timer.setSingleShot(True)
+        self.__parse_timer.setInterval(SYMBOL_DEBOUNCE_MS)
+        self.__parse_timer.timeout.connect(self.__parse)
+        self.parsed.connect(self.__on_parsed)
+        self.__parse_timer.start()
+
+    def on_changes(self, changes: list[ContentChange]):
+        super().on_changes(changes)
+        self.__symbols = _shift_symbols(self.__symbols, changes)
+        if self.__future is not None:
+            self.__unparsed.extend(changes)
+        self.__parse_timer.start()
+
+    def symbols(self) -> list[Symbol]:
+        return self.__symbols
+
+    def is_parsing(self) -> bool:
+        return self.__future is not None or self.__parse_timer.isActive()
+
+    def close(self):
+        self.__parse_timer.stop()
+        if self.__future is not None:
+            self.__future.cancel()
+            self.__future = None
+        super().close()
+
+    def __set_symbols(self, symbols: list[Symbol]):
+        if symbols != self.__symbols:
+            self.__symbols = symbols
+            self.symbols_changed.emit()
+
+    def __parse(self):
+        # One parse at a time, the next one is started once it is done
+        if self.__future is not None:
+            return
+        if self.document.characterCount() > MAX_SYMBOL_CHARS:
+            self.__set_symbols([])
+            return
+
+        # Edits still pending are part of the text taken here
+        self.changes.flush()
+        text = self.document.toPlainText()
+        key = sha256(text.encode('utf-8', 'surrogatepass')).digest()
+        symbols = _SYMBOL_CACHE.get(key, None)
+        if symbols is not None:
+            _SYMBOL_CACHE.move_to_end(key)
+            self.__set_symbols(symbols)
+            return
+
+        self.__unparsed = []
+        future = _process_pool().submit(parse_symbols, text)
+        self.__future = future
+        future.add_done_callback(lambda done: self.parsed.emit(key, done) if done is self.__future else None)
+
+    def __on_parsed(self, key: bytes, future: Future):
+        if future is not self.__future:
+            return
+        self.__future = None
+
+        try:
+            symbols = future.result()
+        except Exception as e:
+            logger.warning("Parsing symbols failed: %s", e)
+            symbols = None
+        # Symbols of the last text that parsed are kept while the code is broken
+        if symbols is not None:
+            _SYMBOL_CACHE[key] = symbols
+            while len(_SYMBOL_CACHE) > SYMBOL_CACHE_SIZE:
+                _SYMBOL_CACHE.popitem(last=False)
+            self.__set_symbols(_shift_symbols(symbols, self.__unparsed))
+
+        # The text was edited while parsing, a parse skipped meanwhile is due
+        if self.__unparsed and not self.__parse_timer.isActive():
+            self.__parse_timer.start()
+        self.__unparsed = []
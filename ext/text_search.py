@@ -0,0 +1,375 @@
+import re
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from threading import Event
+from time import perf_counter
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+from PyQt6.QtGui import QTextDocument, QTextCursor
+
+import logging
+logger = logging.getLogger(Path(__file__).name)
+
+# Params
+SEARCH_CHUNK_CHARS = 256 * 1024
+# Longest match found across a chunk boundary
+MAX_MATCH_CHARS = 4096
+SEARCH_SLICE_MS = 8
+SEARCH_QUEUE_CHUNKS = 8
+SEARCH_DEBOUNCE_MS = 150
+# Edits touching more text than that are searched again in background instead of in place
+LOCAL_RESCAN_CHARS = 64 * 1024
+
+# Private params
+_PARAGRAPH_SEPARATOR = '\u2029'
+_ASTRAL_REXP = re.compile('[\U00010000-\U0010ffff]')
+_SEARCH_POOL: ThreadPoolExecutor | None = None
+
+
+def _search_pool() -> ThreadPoolExecutor:
+    global _SEARCH_POOL
+    if _SEARCH_POOL is None:
+        # A single worker keeps chunks of a scan in order
+        _SEARCH_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix='search')
+    return _SEARCH_POOL
+
+
+def compile_query(query: str, regex: bool = False, case_sensitive: bool = False) -> re.Pattern:
+    flags = re.MULTILINE if case_sensitive else re.MULTILINE | re.IGNORECASE
+    return re.compile(query if regex else re.escape(query), flags)
+
+
+def document_text(document: QTextDocument, start: int, end: int) -> str:
+    cursor = QTextCursor(document)
+    cursor.setPosition(start)
+    cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+    return cursor.selectedText().replace(_PARAGRAPH_SEPARATOR, '\n')
+
+
+# Python indexes code points while document positions count UTF-16 units, astral characters take two of them
+class _Positions:
+    def __init__(self, text: str, offset: int):
+        self.offset = offset
+        self.__astral = [] if text.isascii() else [m.start() for m in _ASTRAL_REXP.finditer(text)]
+        self.__astral_units = [idx + k for k, idx in enumerate(self.__astral)]
+
+    def to_document(self, idx: int) -> int:
+        return self.offset + idx + bisect_left(self.__astral, idx)
+
+    def to_text(self, pos: int) -> int:
+        pos -= self.offset
+        return pos - bisect_left(self.__astral_units, pos)
+
+
+# Gap buffer of matches: the ones after the last edit are kept relative to the end of the document,
+# so edits only move matches between the two sides as far as the gap travels, not shift all of them
+class _MatchIndex:
+    def __init__(self):
+        self.length = 0
+        self.__head_starts: list[int] = []
+        self.__head_ends: list[int] = []
+        # Reversed: the last item is the nearest to the gap
+        self.__tail_starts: list[int] = []
+        self.__tail_ends: list[int] = []
+
+    def reset(self, length: int):
+        self.length = length
+        self.__head_starts, self.__head_ends, self.__tail_starts, self.__tail_ends = [], [], [], []
+
+    def __len__(self) -> int:
+        return len(self.__head_starts) + len(self.__tail_starts)
+
+    def span(self, idx: int) -> tuple[int, int]:
+        head = len(self.__head_starts)
+        if idx < head:
+            return self.__head_starts[idx], self.__head_ends[idx]
+        idx = len(self.__tail_starts) - 1 - (idx - head)
+        return self.length - self.__tail_starts[idx], self.length - self.__tail_ends[idx]
+
+    def bisect_starts(self, pos: int, right: bool = False) -> int:
+        return self.__bisect(self.__head_starts, self.__tail_starts, pos, right)
+
+    def bisect_ends(self, pos: int, right: bool = False) -> int:
+        return self.__bisect(self.__head_ends, self.__tail_ends, pos, right)
+
+    def __bisect(self, head: list[int], tail: list[int], pos: int, right: bool) -> int:
+        if right:
+            return bisect_right(head, pos) + len(tail) - bisect_left(tail, self.length - pos)
+        return bisect_left(head, pos) + len(tail) - bisect_right(tail, self.length - pos)
+
+    def append(self, starts: list[int], ends: list[int]):
+        self.__move_gap(len(self))
+        self.__head_starts.extend(starts)
+        self.__head_ends.extend(ends)
+
+    # Matches [lo, hi) give way to new ones after an edit changing the document length by delta
+    def splice(self, lo: int, hi: int, starts: list[int], ends: list[int], delta: int):
+        self.__move_gap(hi)
+        del self.__head_starts[lo:]
+        del self.__head_ends[lo:]
+        self.__head_starts.extend(starts)
+        self.__head_ends.extend(ends)
+        self.length += delta
+
+    def __move_gap(self, idx: int):
+        head, length = len(self.__head_starts), self.length
+        if idx < head:
+            self.__tail_starts.extend(length - pos for pos in reversed(self.__head_starts[idx:]))
+            self.__tail_ends.extend(length - pos for pos in reversed(self.__head_ends[idx:]))
+            del self.__head_starts[idx:]
+            del self.__head_ends[idx:]
+        elif idx > head:
+            moved = idx - head
+            self.__head_starts.extend(length - pos for pos in reversed(self.__tail_starts[-moved:]))
+            self.__head_ends.extend(length - pos for pos in reversed(self.__tail_ends[-moved:]))
+            del self.__tail_starts[-moved:]
+            del self.__tail_ends[-moved:]
+
+
+class _Scan:
+    def __init__(self, pattern: re.Pattern):
+        self.pattern = pattern
+        self.cancelled = Event()
+        self.pending = 0
+        # Worker side: where the last match ended, matches must not overlap it
+        self.last_end = 0
+
+
+# Chunks overlap by MAX_MATCH_CHARS, only matches starting before end belong to the chunk
+def _search_chunk(scan: _Scan, emit: callable, text: str, start: int, end: int):
+    if scan.cancelled.is_set():
+        return
+
+    positions = _Positions(text, start)
+    starts, ends = [], []
+    for m in scan.pattern.finditer(text, positions.to_text(max(start, scan.last_end))):
+        match_start = positions.to_document(m.start())
+        if match_start >= end:
+            break
+        if m.end() == m.start():
+            continue
+        starts.append(match_start)
+        ends.append(positions.to_document(m.end()))
+    if ends:
+        scan.last_end = ends[-1]
+    emit(scan, starts, ends)
+
+
+# Match index of one document: full scans run chunk by chunk in a worker, edits are searched again in place
+class TextSearch(QObject):
+    changed = pyqtSignal()
+    finished = pyqtSignal()
+    batch_ready = pyqtSignal(object, object, object)
+
+    def __init__(self, document: QTextDocument, parent: QObject | None = None):
+        super().__init__(parent)
+        self.document = document
+        self.pattern: re.Pattern | None = None
+
+        # Sorted and non overlapping
+        self.__index = _MatchIndex()
+        self.__scan: _Scan | None = None
+        self.__scan_pos = 0
+
+        self.__timer = QTimer(self)
+        self.__timer.setInterval(0)
+        self.__timer.timeout.connect(self.__step)
+        self.__debounce = QTimer(self)
+        self.__debounce.setSingleShot(True)
+        self.__debounce.setInterval(SEARCH_DEBOUNCE_MS)
+        self.__debounce.timeout.connect(self.__start_scan)
+
+        self.batch_ready.connect(self.__on_batch_ready)
+        document.contentsChange.connect(self.__on_contents_change)
+
+    def set_pattern(self, pattern: re.Pattern | None):
+        self.pattern = pattern
+        self.__restart()
+
+    def is_running(self) -> bool:
+        return self.__scan is not None or self.__debounce.isActive()
+
+    def count(self) -> int:
+        return len(self.__index)
+
+    def span(self, idx: int) -> tuple[int, int]:
+        return self.__index.span(idx)
+
+    def cancel(self):
+        self.__debounce.stop()
+        self.__timer.stop()
+        if self.__scan is not None:
+            self.__scan.cancelled.set()
+            self.__scan = None
+
+    # Indexes of matches overlapping [start, end)
+    def matches_between(self, start: int, end: int) -> range:
+        return range(self.__index.bisect_ends(start, right=True), self.__index.bisect_starts(end))
+
+    def match_after(self, pos: int) -> int | None:
+        if not self.count():
+            return None
+        idx = self.__index.bisect_starts(pos)
+        return idx if idx < self.count() else 0
+
+    def match_before(self, pos: int) -> int | None:
+        if not self.count():
+            return None
+        idx = self.__index.bisect_starts(pos) - 1
+        return idx if idx >= 0 else self.count() - 1
+
+    def index_of(self, start: int, end: int) -> int | None:
+        idx = self.__index.bisect_starts(start)
+        if idx < self.count() and self.__index.span(idx) == (start, end):
+            return idx
+        return None
+
+    # Template in re.sub syntax, the match is taken again with the lines around it for context
+    def expand(self, idx: int, template: str) -> str | None:
+        start, end = self.__index.span(idx)
+        first = self.document.findBlock(start)
+        last = self.document.findBlock(end)
+        region_start, region_end = first.position(), last.position() + last.length() - 1
+        positions = _Positions(text := document_text(self.document, region_start, region_end), region_start)
+
+        m = self.pattern.match(text, positions.to_text(start))
+        if m is None or positions.to_document(m.end()) != end:
+            return None
+        return m.expand(template)
+
+    # All matches are replaced in one edit block, which is one undo step. A scan still going on is not waited for,
+    # the whole document is searched right away instead
+    def replace_all(self, template: str) -> int:
+        if self.pattern is None:
+            return 0
+        if self.is_running():
+            self.__scan_now()
+
+        count = self.count()
+        if '\\' in template:
+            replacements = [self.expand(idx, template) for idx in range(count)]
+        else:
+            replacements = [template] * count
+
+        cursor = QTextCursor(self.document)
+        cursor.beginEditBlock()
+        spans = [self.__index.span(idx) for idx in range(count)]
+        for (start, end), replacement in zip(reversed(spans), reversed(replacements)):
+            if replacement is None:
+                continue
+            cursor.setPosition(start)
+            cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+            cursor.insertText(replacement)
+        cursor.endEditBlock()
+        return count - replacements.count(None)
+
+    def __scan_now(self):
+        self.cancel()
+        text = document_text(self.document, 0, self.document.characterCount() - 1)
+        positions = _Positions(text, 0)
+        starts, ends = [], []
+        for m in self.pattern.finditer(text):
+            if m.end() != m.start():
+                starts.append(positions.to_document(m.start()))
+                ends.append(positions.to_document(m.end()))
+        self.__index.reset(self.document.characterCount())
+        self.__index.append(starts, ends)
+        logger.debug("Found %s matches of '%s' at once", len(starts), self.pattern.pattern)
+
+    def __restart(self):
+        self.cancel()
+        self.__index.reset(self.document.characterCount())
+        if self.pattern is not None:
+            self.__debounce.start()
+        self.changed.emit()
+
+    # Chunks are cut from the document in short GUI slices, the document can't be read from another thread
+    def __start_scan(self):
+        self.__scan = _Scan(self.pattern)
+        self.__scan_pos = 0
+        self.__timer.start()
+        logger.debug("Searching for '%s'", self.pattern.pattern)
+
+    def __step(self):
+        scan = self.__scan
+        doc_end = self.document.characterCount() - 1
+        deadline = perf_counter() + SEARCH_SLICE_MS / 1000
+        while self.__scan_pos < doc_end and scan.pending < SEARCH_QUEUE_CHUNKS and perf_counter() < deadline:
+            start = self.__scan_pos
+            end = self.__boundary(start + SEARCH_CHUNK_CHARS)
+            text = document_text(self.document, start, self.__boundary(end + MAX_MATCH_CHARS))
+            scan.pending += 1
+            _search_pool().submit(_search_chunk, scan, self.batch_ready.emit, text, start, end)
+            self.__scan_pos = end
+
+        if self.__scan_pos >= doc_end:
+            self.__timer.stop()
+            scan.pending += 1
+            _search_pool().submit(self.batch_ready.emit, scan, None, None)
+        elif scan.pending >= SEARCH_QUEUE_CHUNKS:
+            self.__timer.stop()
+
+    # Chunks end at line ends where possible, so that ^ and $ keep their meaning
+    def __boundary(self, pos: int) -> int:
+        doc_end = self.document.characterCount() - 1
+        if pos >= doc_end:
+            return doc_end
+        block = self.document.findBlock(pos)
+        block_end = block.position() + block.length() - 1
+        if block_end - pos <= MAX_MATCH_CHARS:
+            return block_end
+        # Never between the two halves of a surrogate pair
+        return pos + 1 if '\ud800' <= self.document.characterAt(pos - 1) <= '\udbff' else pos
+
+    def __on_batch_ready(self, scan: _Scan, starts: list[int] | None, ends: list[int] | None):
+        if scan is not self.__scan:
+            return
+
+        scan.pending -= 1
+        if starts is None:
+            self.__scan = None
+            logger.debug("Found %s matches of '%s'", self.count(), scan.pattern.pattern)
+            self.finished.emit()
+            self.changed.emit()
+            return
+
+        self.__index.append(starts, ends)
+        if not self.__timer.isActive() and self.__scan_pos < self.document.characterCount() - 1:
+            self.__timer.start()
+        if starts:
+            self.changed.emit()
+
+    # Matches of the edited lines are searched again, the ones after them are shifted
+    def __on_contents_change(self, position: int, removed: int, added: int):
+        if self.pattern is None:
+            return
+        if self.is_running():
+            self.__restart()
+            return
+
+        delta = added - removed
+        region_start = self.document.findBlock(position).position()
+        last = self.document.findBlock(position + added)
+        region_end = last.position() + last.length() - 1
+
+        # Matches touching the edited lines, in positions from before the edit
+        lo = self.__index.bisect_ends(region_start)
+        hi = self.__index.bisect_starts(region_end - delta, right=True)
+        if lo < hi:
+            region_start = min(region_start, self.__index.span(lo)[0])
+            region_end = max(region_end, self.__index.span(hi - 1)[1] + delta)
+        if region_end - region_start > LOCAL_RESCAN_CHARS:
+            self.__restart()
+            return
+
+        text = document_text(self.document, region_start, region_end)
+        positions = _Positions(text, region_start)
+        starts, ends = [], []
+        for m in self.pattern.finditer(text):
+            if m.end() != m.start():
+                starts.append(positions.to_document(m.start()))
+                ends.append(positions.to_document(m.end()))
+
+        self.__index.splice(lo, hi, starts, ends, delta)
+        self.changed.emit()
@@ -1,4 +1,6 @@
 import ext.code_highlight
+import ext.code_processor
+import ext.python_symbols
 
 
 def main():
@@ -39,6 +41,10 @@ def main():
     logger.debug("==Localization setup step ended")
 
     ext.code_highlight.HighlighterRegistry()
+    ext.code_highlight.TokenCache()
+    ext.code_processor.ProcessorRegistry()
+    ext.code_processor.ProcessorRegistry.get_instance().register(ext.code_processor.IdentifierCompleter)
+    ext.code_processor.ProcessorRegistry.get_instance().register(ext.python_symbols.PythonSymbolIndexer)
 
     logger.debug("Scripts setup step=============")
     import utility.script
@@ -46,12 +52,25 @@ def main():
     utility.script.load_scripts()
     logger.debug("=======Scripts setup step ended")
 
+    logger.debug("Grammars setup step============")
+    import utility.grammar
+    utility.grammar.SEARCH_PATH = __ASSETS_PATH / "grammar"
+    utility.grammar.CACHE_PATH = Path(__file__).parent / ".cache" / "grammar"
+    utility.grammar.load_grammars()
+    logger.debug("======Grammars setup step ended")
+
+    import ext.document_io
+    ext.document_io.SWAP_PATH = Path(__file__).parent / ".cache" / "swap"
+
     logger.debug("Binding setup step=============")
     import utility.bindng
     utility.bindng.SEARCH_PATH = __ASSETS_PATH / "binding"
     utility.bindng.load_bindings()
     logger.debug("=======Binding setup step ended")
 
+    import utility.session
+    utility.session.SESSION_PATH = Path(__file__).parent / ".cache" / "session.json"
+
     logger.debug("Notepad init...")
     from window.main_window import Notepad
     notepad = Notepad()
@@ -0,0 +1,43 @@
+import time
+from pathlib import Path
+
+import pytest
+from PyQt6.QtCore import QCoreApplication
+
+from ext.document_io import DocumentReloader, file_tail_digest
+
+
+@pytest.fixture(scope='module')
+def app():
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+# The file held old when the text was read, it holds new now
+def reload_tail(app, path: Path, old: bytes, new: bytes, last_line: str, line_count: int) -> DocumentReloader:
+    path.write_bytes(old)
+    digest = file_tail_digest(path, len(old))
+    path.write_bytes(new)
+
+    reloader = DocumentReloader(path, None, 'utf-8', None, len(old), digest, last_line, line_count)
+    done = []
+    reloader.finished.connect(lambda: done.append(True))
+    reloader.failed.connect(lambda error: done.append(error))
+    reloader.start()
+    deadline = time.monotonic() + 5
+    while not done and time.monotonic() < deadline:
+        app.processEvents()
+    assert done == [True]
+    return reloader
+
+
+def test_appended_text_goes_onto_the_last_line(app, tmp_path):
+    path = tmp_path / 'log.txt'
+    reloader = reload_tail(app, path, b'alpha\nbeta\ngamma', b'alpha\nbeta\ngamma continued\ndelta\n', 'gamma', 3)
+    assert reloader.replacements == [(2, 3, ['gamma continued', 'delta', ''])]
+    assert reloader.disk_state[1] == path.stat().st_size
+
+
+def test_insert_before_the_old_end_is_no_append(app, tmp_path):
+    path = tmp_path / 'log.txt'
+    reloader = reload_tail(app, path, b'alpha\nbeta\ngamma\n', b'alpha\nINSERTED\nbeta\ngamma\n', '', 4)
+    assert reloader.replacements is None
@@ -3,6 +3,7 @@ from pathlib import Path
 from PyQt6.QtGui import QIcon, QSyntaxHighlighter
 from utility.icon import find_icon
 from ext.code_highlight import HighlighterRegistry
+from ext.code_processor import ProcessorRegistry
 from dataclasses import dataclass
 import toml
 
@@ -12,6 +13,16 @@ logger = logging.getLogger(Path(__file__).name)
 # Params
 SEARCH_PATH: Path | None = None
 FILTER_BY_EXT = ['.toml']
+# Never opened as text, e.g. skipped by find in folder without reading them
+BINARY_SUFFIXES = [
+    '.png', '.jpg', '.jpeg', '.gif', '.bmp', '.ico', '.webp', '.tiff', '.psd',
+    '.ttf', '.otf', '.woff', '.woff2',
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.rar', '.tar', '.jar', '.whl', '.egg',
+    '.pyc', '.pyo', '.pyd', '.so', '.dll', '.dylib', '.exe', '.o', '.a', '.lib', '.obj', '.class', '.bin',
+    '.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx', '.odt',
+    '.mp3', '.wav', '.ogg', '.flac', '.mp4', '.mkv', '.avi', '.mov', '.webm',
+    '.db', '.sqlite', '.pkl', '.npy', '.npz', '.parquet',
+]
 
 # Private params
 @dataclass
@@ -20,6 +31,7 @@ class Binding:
     suffixes: list[str]
     icon: QIcon
     highlighter_type: type | None
+    processor_type: type | None
 
 _LOADED_BINDINGS: list[Binding] = list()
 
@@ -30,6 +42,7 @@ def __load_binding(path_binding: Path) -> Binding:
     suffixes: list[str] = bind_dict['suffixes']
     icon_name: str = bind_dict['icon_name']
     highlighter_name: str | None = bind_dict.get('highlighter_name', None)
+    processor_name: str | None = bind_dict.get('processor_name', None)
 
     icon = find_icon(icon_name)
     if icon is None:
@@ -39,7 +52,13 @@ def __load_binding(path_binding: Path) -> Binding:
     if highlighter_name is not None:
         highlighter_type = HighlighterRegistry.get_instance().get(highlighter_name)
 
-    binding = Binding(name, suffixes, icon, highlighter_type)
+    processor_type = None
+    if processor_name is not None:
+        processor_type = ProcessorRegistry.get_instance().get(processor_name)
+        if processor_type is None:
+            logger.warning("Binding '%s' refers to unknown processor '%s'", name, processor_name)
+
+    binding = Binding(name, suffixes, icon, highlighter_type, processor_type)
     _LOADED_BINDINGS.append(binding)
 
     return binding
@@ -81,3 +100,8 @@ def load_bindings():
 
 def match_binding_by_path(file_path: Path) -> Binding | None:
     return next((b for b in _LOADED_BINDINGS if file_path.suffix in b.suffixes), None)
+
+
+# Suffixes some binding claims, such files are text without looking into them
+def text_suffixes() -> set[str]:
+    return {suffix for binding in _LOADED_BINDINGS for suffix in binding.suffixes}
@@ -0,0 +1,104 @@
+import json
+from hashlib import sha256
+from os import listdir
+from pathlib import Path
+import toml
+
+from ext.code_highlight import HighlighterRegistry
+from ext.code_grammar import CompiledGrammar, GrammarError, GRAMMAR_VERSION, compile_grammar, grammar_highlighter_type
+
+import logging
+logger = logging.getLogger(Path(__file__).name)
+
+# Params
+SEARCH_PATH: Path | None = None
+CACHE_PATH: Path | None = None
+FILTER_BY_EXT = ['.toml']
+
+
+# Methods
+def __cache_file(path_grammar: Path, raw: bytes) -> Path | None:
+    if CACHE_PATH is None:
+        return None
+    digest = sha256(raw + str(GRAMMAR_VERSION).encode()).hexdigest()[:16]
+    return CACHE_PATH / f'{path_grammar.stem}-{digest}.json'
+
+
+def __read_cache(cache_file: Path | None) -> CompiledGrammar | None:
+    if cache_file is None or not cache_file.is_file():
+        return None
+
+    try:
+        with open(cache_file, mode='r', encoding='utf-8') as f:
+            return CompiledGrammar.from_dict(json.load(f))
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as err:
+        logger.warning("Ignored broken grammar cache '%s' because of %s", cache_file, err)
+        return None
+
+
+def __write_cache(cache_file: Path | None, grammar: CompiledGrammar):
+    if cache_file is None:
+        return
+
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(cache_file, mode='w', encoding='utf-8') as f:
+            json.dump(grammar.to_dict(), f)
+    except OSError as err:
+        logger.warning("Unable to write grammar cache '%s' because of %s", cache_file, err)
+
+
+def __load_grammar(path_grammar: Path) -> CompiledGrammar:
+    with open(path_grammar, mode='rb') as f:
+        raw = f.read()
+
+    cache_file = __cache_file(path_grammar, raw)
+    grammar = __read_cache(cache_file)
+    if grammar is not None:
+        logger.debug("Grammar '%s' taken from cache '%s'", path_grammar, cache_file)
+        return grammar
+
+    try:
+        grammar = compile_grammar(toml.loads(raw.decode('utf-8')))
+    except (toml.TomlDecodeError, UnicodeDecodeError) as err:
+        raise GrammarError(str(err))
+    __write_cache(cache_file, grammar)
+    return grammar
+
+
+def __filter_grammar(path: Path) -> bool:
+    return path.is_file() and (path.suffix in FILTER_BY_EXT)
+
+
+def __scan_grammars() -> list[Path]:
+    logger.debug("Attempt to scan grammars with SEARCH_PATH=%s and FILTER_BY_EXT=%s", SEARCH_PATH, FILTER_BY_EXT)
+
+    if SEARCH_PATH is None:
+        logger.error("Unable to scan grammars as SEARCH_PATH not set")
+        return []
+    if not SEARCH_PATH.exists():
+        logger.error("SEARCH_PATH set to '%s' not exists", SEARCH_PATH)
+        return []
+    if not SEARCH_PATH.is_dir():
+        logger.error("SEARCH_PATH set to '%s' exists, but requires to be a folder", SEARCH_PATH)
+        return []
+
+    filtered = filter(__filter_grammar, [SEARCH_PATH / sub_path for sub_path in listdir(SEARCH_PATH)])
+    return list(filtered)
+
+
+def load_grammars():
+    grammar_paths = __scan_grammars()
+    logger.debug("Found grammars: %s", list(map(str, grammar_paths)))
+
+    if len(grammar_paths) == 0:
+        logger.warning("No grammars loaded")
+        return
+
+    for grammar_path in grammar_paths:
+        try:
+            grammar = __load_grammar(grammar_path)
+            HighlighterRegistry.get_instance().register(grammar_highlighter_type(grammar))
+            logger.debug("Loaded grammar '%s'", grammar_path)
+        except GrammarError as err:
+            logger.warning("Ignored grammar '%s' because of %s", grammar_path, err)
@@ -0,0 +1,44 @@
+import json
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+
+import logging
+logger = logging.getLogger(Path(__file__).name)
+
+# Params
+SESSION_PATH: Path | None = None
+
+
+@dataclass
+class Session:
+    files: list[str] = field(default_factory=list)
+    current: int = 0
+
+
+# Methods
+def load_session() -> Session | None:
+    if SESSION_PATH is None or not SESSION_PATH.is_file():
+        return None
+
+    try:
+        with open(SESSION_PATH, mode='r', encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise TypeError(f'a {type(data).__name__} instead of an object')
+        return Session([str(file) for file in data['files']], int(data.get('current', 0)))
+    except (OSError, ValueError, KeyError, TypeError) as err:
+        logger.warning("Ignored broken session '%s' because of %s", SESSION_PATH, err)
+        return None
+
+
+def save_session(session: Session):
+    if SESSION_PATH is None:
+        return
+
+    try:
+        SESSION_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(SESSION_PATH, mode='w', encoding='utf-8') as f:
+            json.dump(asdict(session), f, indent=2)
+        logger.debug("Session of %s files saved to '%s'", len(session.files), SESSION_PATH)
+    except OSError as err:
+        logger.warning("Unable to write session '%s' because of %s", SESSION_PATH, err)
@@ -1,18 +1,43 @@
-from PyQt6.QtCore import QRect, Qt, pyqtSignal, QObject
-from PyQt6.QtGui import QFont, QTextBlock, QPainter, QFontMetrics, QColor, QTextFormat, QKeyEvent, QTextCursor, \
-    QSyntaxHighlighter
-from PyQt6.QtWidgets import QPlainTextEdit, QWidget, QTextEdit, QLabel, QHBoxLayout, QVBoxLayout
-
+import re
+from collections import OrderedDict
+from pathlib import Path
+
+from PyQt6.QtCore import QRect, QPointF, QPoint, Qt, QEvent, QTimer, pyqtSignal, QObject
+from PyQt6.QtGui import QFont, QTextBlock, QPainter, QColor, QTextFormat, QKeyEvent, QTextCursor, \
+    QSyntaxHighlighter, QStaticText, QTransform, QPolygonF
+from PyQt6.QtWidgets import QPlainTextEdit, QWidget, QTextEdit, QLabel, QHBoxLayout, QVBoxLayout, QLineEdit, \
+    QCheckBox, QPushButton
+
+from ext.code_highlight import RuleBasedHighlighter, detach_highlighter
+import ext.document_io
+from ext.document_io import DocumentLoader, DocumentWriter, DocumentCompressor, DocumentReloader
+from ext.document_changes import ChangeDispatcher, ContentChange
+from ext.code_processor import CodeProcessor
+from ext.code_structure import match_bracket, block_structure, is_fold_start, enclosing_fold, fold, unfold
+from ext.text_search import TextSearch, compile_query
 from utility.bindng import Binding
 from utility.locale import LocaleManager
+from window.components.suggestion_list import SuggestionList
 
 locm = LocaleManager.get_instance
 
+# Params
+# Line numbers kept laid out for the gutter, a few screens worth in every open tab
+LINE_NUMBER_CACHE_SIZE = 1024
+
+# Private params
+_WORD_PREFIX_REXP = re.compile(r'[^\W\d]\w*$')
+_WORD_REXP = re.compile(r'[^\W\d]\w*')
+
 
 def qlabel_tooltip_setter(o, txt):
     o.setToolTip(txt)
 
 
+def placeholder_setter(o, txt):
+    o.setPlaceholderText(txt)
+
+
 class CodeEditorWrapper(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -24,11 +49,23 @@ class CodeEditorWrapper(QWidget):
         self.info_block = InfoBlock(self, self.editor)
         vbox.addWidget(self.info_block)
 
+        # Created on first use, most tabs are never searched
+        self.find_bar: FindBar | None = None
+
         self.setLayout(vbox)
 
+    def show_find_bar(self, replace: bool = False):
+        if self.find_bar is None:
+            self.find_bar = FindBar(self, self.editor)
+            self.layout().insertWidget(1, self.find_bar)
+        self.find_bar.open(replace)
+
 
 class CodeEditor(QPlainTextEdit):
     code_changed = pyqtSignal(QObject)
+    cursor_moved = pyqtSignal()
+    # Symbols of the processor changed, or the processor itself
+    symbols_changed = pyqtSignal()
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -36,20 +73,72 @@ class CodeEditor(QPlainTextEdit):
         self.line_number_area = LineNumberArea(self)
 
         self.highlight_color = QColor(232, 242, 254) # Light blue
+        self.match_color = QColor(255, 238, 160) # Light yellow
+        self.current_match_color = QColor(255, 196, 80) # Orange
+        self.bracket_color = QColor(180, 230, 180) # Light green
         self.tab_width = 4
-        self.is_edited = False
-
+        self.encoding = ext.document_io.DEFAULT_ENCODING
+        self.loader: DocumentLoader | None = None
+        self.writer: DocumentWriter | None = None
+        self.swap_path: Path | None = None
+        self.swap_revision = -1
+        # When the tab was last seen in background, None while it is the current one
+        self.idle_since: float | None = None
+        self.compressor: DocumentCompressor | None = None
+        # (modification time, size) of the file as last loaded or saved, and a digest of the bytes it ended with
+        self.disk_state: tuple[int, int] | None = None
+        self.disk_digest: bytes | None = None
+        self.reloader: DocumentReloader | None = None
+        self.search: TextSearch | None = None
+        self.processor: CodeProcessor | None = None
+        # Created on first use
+        self.suggestions: SuggestionList | None = None
+
+        self.__la_w_px = -1
         self.blockCountChanged.connect(self.update_la_offset)
         self.update_la_offset(0)
 
+        # Edits of any origin, typing, paste, drop, undo or replace, reach subscribers once per frame
+        self.changes = ChangeDispatcher(self.document(), self)
+        self.changes.changed.connect(self.__on_changes)
+
+        # Labels follow the cursor once per burst of moves, the current line is highlighted right away
+        self.__cursor_timer = QTimer(self)
+        self.__cursor_timer.setSingleShot(True)
+        self.__cursor_timer.setInterval(0)
+        self.__cursor_timer.timeout.connect(self.cursor_moved)
+        self.__bracket_selections: list[QTextEdit.ExtraSelection] = []
+        self.cursor_moved.connect(self.__reveal_cursor)
+        self.cursor_moved.connect(self.__update_bracket_selections)
         self.cursorPositionChanged.connect(self.highlight_current_line)
+        self.cursorPositionChanged.connect(self.__cursor_timer.start)
+        self.verticalScrollBar().valueChanged.connect(self.update_match_selections)
         self.highlight_current_line()
 
         self.updateRequest.connect(self.update_on_request)
 
+    # Backed by the modification state of the document: undoing back to the saved text clears it
+    @property
+    def is_edited(self) -> bool:
+        return self.document().isModified()
+
+    @is_edited.setter
+    def is_edited(self, edited: bool):
+        self.document().setModified(edited)
+
+    def is_loading(self) -> bool:
+        return self.loader is not None and self.loader.is_running()
+
+    def is_saving(self) -> bool:
+        return self.writer is not None and self.writer.is_running()
+
     def update_la_offset(self, _):
         la_w_px = self.line_number_area.width_px()
-        self.setViewportMargins(la_w_px, 0, 0, 0)
+        # Called on every full repaint, margins are only touched when the gutter width changed
+        if la_w_px != self.__la_w_px:
+            self.__la_w_px = la_w_px
+            self.setViewportMargins(la_w_px, 0, 0, 0)
+            self.line_number_area.update_on_resize(self.contentsRect())
 
     def update_on_request(self, rect, dy):
         self.line_number_area.update_on_request(rect, dy)
@@ -57,6 +146,25 @@ class CodeEditor(QPlainTextEdit):
         if rect.contains(self.viewport().rect()):
             self.update_la_offset(0)
 
+    def goto(self, line: int, column: int = 0):
+        if self.is_loading():
+            self.loader.finished.connect(lambda: self.goto(line, column))
+            return
+
+        block = self.document().findBlockByNumber(min(max(line, 0), self.blockCount() - 1))
+        # Columns count code points, cursor positions count UTF-16 units
+        offset = len(block.text()[:column].encode('utf-16-le')) // 2
+        cursor = self.textCursor()
+        cursor.setPosition(block.position() + min(offset, block.length() - 1))
+        self.setTextCursor(cursor)
+        self.centerCursor()
+        self.setFocus()
+
+    def visible_block_range(self) -> tuple[int, int]:
+        first = self.firstVisibleBlock().blockNumber()
+        last = self.cursorForPosition(self.viewport().rect().bottomLeft()).blockNumber()
+        return first, last
+
     def highlight_current_line(self):
         extra_selections = []
 
@@ -69,18 +177,184 @@ class CodeEditor(QPlainTextEdit):
             selection.cursor.clearSelection()
             extra_selections.append(selection)
 
-        self.setExtraSelections(extra_selections)
+        self.__line_selections = extra_selections
+        self.setExtraSelections(extra_selections + self.__bracket_selections + self.__match_selections())
+
+    def update_match_selections(self):
+        if self.search is not None:
+            self.setExtraSelections(self.__line_selections + self.__bracket_selections + self.__match_selections())
+
+    # Brackets next to the cursor and their match, answered by the block structure index
+    def __update_bracket_selections(self):
+        selections = []
+        cursor = self.textCursor()
+        if not cursor.hasSelection():
+            position = cursor.position()
+            for bracket in (position, position - 1):
+                if bracket < 0:
+                    continue
+                match = match_bracket(self.document(), bracket)
+                if match is not None:
+                    selections = [self.__bracket_selection(bracket), self.__bracket_selection(match)]
+                    break
+
+        if selections or self.__bracket_selections:
+            self.__bracket_selections = selections
+            self.setExtraSelections(self.__line_selections + selections + self.__match_selections())
+
+    def __bracket_selection(self, position: int) -> QTextEdit.ExtraSelection:
+        selection = QTextEdit.ExtraSelection()
+        selection.format.setBackground(self.bracket_color)
+        selection.cursor = QTextCursor(self.document())
+        selection.cursor.setPosition(position)
+        selection.cursor.setPosition(position + 1, QTextCursor.MoveMode.KeepAnchor)
+        return selection
+
+    # Folds the innermost foldable region around the cursor, or unfolds it
+    def toggle_fold(self, block: QTextBlock | None = None):
+        block = enclosing_fold(self.textCursor().block()) if block is None else block
+        if block is None:
+            return
+        if block_structure(block).folded:
+            unfold(self.document(), block)
+        elif fold(self.document(), block) and not self.textCursor().block().isVisible():
+            cursor = self.textCursor()
+            cursor.setPosition(block.position() + block.length() - 1)
+            self.setTextCursor(cursor)
+        self.line_number_area.update()
+
+    # Moving into folded text, by keys or a jump, unfolds it
+    def __reveal_cursor(self):
+        block = self.textCursor().block()
+        while not block.isVisible():
+            header = block.previous()
+            while header.isValid() and not header.isVisible():
+                header = header.previous()
+            if not header.isValid():
+                break
+            unfold(self.document(), header)
+            self.line_number_area.update()
+
+    # Only matches in the viewport get a selection, whatever the size of the match index
+    def __match_selections(self) -> list[QTextEdit.ExtraSelection]:
+        if self.search is None or self.search.count() == 0:
+            return []
+
+        first = self.firstVisibleBlock().position()
+        last = self.cursorForPosition(self.viewport().rect().bottomRight()).block()
+        cursor = self.textCursor()
+        current = self.search.index_of(cursor.selectionStart(), cursor.selectionEnd())
+
+        selections = []
+        for idx in self.search.matches_between(first, last.position() + last.length()):
+            selection = QTextEdit.ExtraSelection()
+            selection.format.setBackground(self.current_match_color if idx == current else self.match_color)
+            start, end = self.search.span(idx)
+            selection.cursor = QTextCursor(self.document())
+            selection.cursor.setPosition(start)
+            selection.cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+            selections.append(selection)
+        return selections
 
     def resizeEvent(self, event):
         super().resizeEvent(event)
         self.line_number_area.update_on_resize(self.contentsRect())
+        self.update_match_selections()
 
-    def keyPressEvent(self, event: QKeyEvent):
-        event_handled = self.__handle_press_event(event)
-        if event_handled:
-            self.is_edited = True
+    def __on_changes(self, _changes: list[ContentChange]):
+        if not self.is_loading():
             self.code_changed.emit(self)
 
+    def set_processor(self, processor: CodeProcessor | None):
+        if self.processor is not None:
+            self.processor.close()
+            self.processor.deleteLater()
+        self.processor = processor
+        self.hide_suggestions()
+        if processor is not None:
+            processor.symbols_changed.connect(self.symbols_changed)
+        self.symbols_changed.emit()
+
+    def hide_suggestions(self):
+        if self.suggestions is not None:
+            self.suggestions.hide()
+
+    def keyPressEvent(self, event: QKeyEvent):
+        if self.suggestions is not None and self.suggestions.isVisible() and self.__handle_suggestion_key(event):
+            return
+        self.__handle_press_event(event)
+        self.__update_suggestions(event)
+
+    def mousePressEvent(self, event):
+        self.hide_suggestions()
+        super().mousePressEvent(event)
+
+    def focusOutEvent(self, event):
+        self.hide_suggestions()
+        super().focusOutEvent(event)
+
+    def __handle_suggestion_key(self, event: QKeyEvent) -> bool:
+        key = event.key()
+        if key == Qt.Key.Key_Down:
+            self.suggestions.select_next()
+        elif key == Qt.Key.Key_Up:
+            self.suggestions.select_previous()
+        elif key in (Qt.Key.Key_Return, Qt.Key.Key_Enter, Qt.Key.Key_Tab):
+            self.__apply_suggestion(self.suggestions.currentItem())
+        elif key == Qt.Key.Key_Escape:
+            self.hide_suggestions()
+        else:
+            return False
+        return True
+
+    # Typing a word asks the processor for completions of what is typed so far, any other key hides them
+    def __update_suggestions(self, event: QKeyEvent):
+        if self.processor is None or self.isReadOnly():
+            return
+
+        text = event.text()
+        typing = (len(text) == 1 and (text.isalnum() or text == '_')) or \
+            (event.key() == Qt.Key.Key_Backspace and self.suggestions is not None and self.suggestions.isVisible())
+        prefix = self.__word_prefix() if typing else ''
+        words = self.processor.completions(prefix) if prefix else []
+        if not words:
+            self.hide_suggestions()
+            return
+
+        if self.suggestions is None:
+            self.suggestions = SuggestionList(self)
+            self.suggestions.itemClicked.connect(self.__apply_suggestion)
+        rect = self.cursorRect()
+        pos = self.viewport().mapTo(self, rect.bottomLeft())
+        self.suggestions.show_words(words, pos, rect.height())
+
+    def word_under_cursor(self) -> str:
+        cursor = self.textCursor()
+        position = cursor.positionInBlock()
+        for match in _WORD_REXP.finditer(cursor.block().text()):
+            if match.start() > position:
+                break
+            if match.end() >= position:
+                return match.group()
+        return ''
+
+    def __word_prefix(self) -> str:
+        cursor = self.textCursor()
+        if cursor.hasSelection():
+            return ''
+        match = _WORD_PREFIX_REXP.search(cursor.block().text()[:cursor.positionInBlock()])
+        return match.group() if match is not None else ''
+
+    def __apply_suggestion(self, item):
+        self.hide_suggestions()
+        if item is None:
+            return
+        cursor = self.textCursor()
+        cursor.movePosition(QTextCursor.MoveOperation.Left, QTextCursor.MoveMode.KeepAnchor, len(self.__word_prefix()))
+        cursor.insertText(item.text())
+        self.setTextCursor(cursor)
+        self.setFocus()
+
     def __handle_press_event(self, event: QKeyEvent):
         if event.key() == Qt.Key.Key_Tab:
             self.insertPlainText(' ' * self.tab_width)
@@ -109,12 +383,26 @@ class LineNumberArea(QWidget):
         self.left_offset_px = 8
         self.bg_color = QColor(240, 240, 240) # Light gray
         self.nums_color = QColor(100, 100, 100) # Dark gray
+        self.fold_color = QColor(150, 150, 150) # Gray
+        # Fold markers right of the numbers, clicked to fold
+        self.fold_markers = True
+
+        # Width only depends on the font and the digit count of the last line number, both rarely change
+        self.__digits_count = 0
+        self.__width_px = 0
+        self.__fold_px = 0
+        # Numbers laid out once and drawn as prepared glyph runs, most of them are painted over and over
+        self.__numbers: OrderedDict[int, tuple[QStaticText, float]] = OrderedDict()
 
     def __code_editor_block_count(self) -> int:
         return self.__code_editor.blockCount()
 
-    def __code_editor_font_metrics(self) -> QFontMetrics:
-        return self.__code_editor.fontMetrics()
+    def changeEvent(self, event: QEvent):
+        if event.type() == QEvent.Type.FontChange:
+            self.__width_px = 0
+            self.__fold_px = 0
+            self.__numbers.clear()
+        super().changeEvent(event)
 
     def update_on_resize(self, cont_rect: QRect):
         la_rect = QRect(cont_rect.left(), cont_rect.top(), self.width_px(), cont_rect.height())
@@ -130,8 +418,45 @@ class LineNumberArea(QWidget):
         block_count = self.__code_editor_block_count()
         digits_count = len(str(max(1, block_count)))
 
-        ha = self.__code_editor_font_metrics().horizontalAdvance('9')
-        return self.left_offset_px + ha * digits_count
+        if digits_count != self.__digits_count or self.__width_px == 0:
+            ha = self.fontMetrics().horizontalAdvance('9')
+            self.__digits_count = digits_count
+            self.__fold_px = self.fontMetrics().height() if self.fold_markers else 0
+            self.__width_px = self.left_offset_px + ha * digits_count + self.__fold_px
+        return self.__width_px
+
+    def mousePressEvent(self, event):
+        if self.__fold_px and event.position().x() >= self.width() - self.__fold_px:
+            block = self.__code_editor.cursorForPosition(QPoint(0, int(event.position().y()))).block()
+            if is_fold_start(block):
+                self.__code_editor.toggle_fold(block)
+                return
+        super().mousePressEvent(event)
+
+    # A triangle pointing right for a folded block, down otherwise
+    def draw_fold_marker(self, painter: QPainter, left: float, top: float, folded: bool):
+        size = self.__fold_px
+        inset = size * 0.3
+        if folded:
+            points = [QPointF(left + inset, top + inset * 0.7), QPointF(left + size - inset, top + size / 2),
+                      QPointF(left + inset, top + size - inset * 0.7)]
+        else:
+            points = [QPointF(left + inset * 0.7, top + inset), QPointF(left + size - inset * 0.7, top + inset),
+                      QPointF(left + size / 2, top + size - inset)]
+        painter.drawPolygon(QPolygonF(points))
+
+    # Right aligned at right, top being the top of the line
+    def draw_number(self, painter: QPainter, right: float, top: float, number: int):
+        entry = self.__numbers.get(number, None)
+        if entry is None:
+            static_text = QStaticText(str(number))
+            static_text.prepare(QTransform(), self.font())
+            entry = self.__numbers[number] = static_text, static_text.size().width()
+            if len(self.__numbers) > LINE_NUMBER_CACHE_SIZE:
+                self.__numbers.popitem(last=False)
+        else:
+            self.__numbers.move_to_end(number)
+        painter.drawStaticText(QPointF(right - entry[1], top), entry[0])
 
     def paintEvent(self, event):
         ce = self.__code_editor
@@ -145,22 +470,33 @@ class LineNumberArea(QWidget):
         block: QTextBlock = ce.firstVisibleBlock()
         block_number = block.blockNumber()
         top = ce.blockBoundingGeometry(block).translated(ce.contentOffset()).top()
-        bottom = top + ce.blockBoundingRect(block).height()
-        font_height = ce.fontMetrics().height()
-        number_width = self.width() - 5
+        paint_top, paint_bottom = event.rect().top(), event.rect().bottom()
+        number_right = self.width() - 5 - self.__fold_px
+        fold_left = self.width() - self.__fold_px
+        painter.setPen(self.nums_color)
+        painter.setBrush(self.fold_color)
 
         ## draw each visible
-        while block.isValid() and top <= event.rect().bottom():
-            if block.isVisible() and bottom >= event.rect().top():
-                num_txt = str(block_number + 1)
-                painter.setPen(self.nums_color)
-                painter.drawText(0, int(top), number_width, font_height,
-                                 Qt.AlignmentFlag.AlignRight, num_txt)
+        while block.isValid() and top <= paint_bottom:
+            bottom = top + ce.blockBoundingRect(block).height()
+            if bottom >= paint_top and block.isVisible():
+                self.draw_number(painter, number_right, top, block_number + 1)
+                # Fold starts are known from the indents cached per block, nothing is scanned twice
+                if self.__fold_px and is_fold_start(block):
+                    painter.setPen(Qt.PenStyle.NoPen)
+                    self.draw_fold_marker(painter, fold_left, top, block_structure(block).folded)
+                    painter.setPen(self.nums_color)
 
             block = block.next()
             top = bottom
-            bottom = top + ce.blockBoundingRect(block).height()
             block_number += 1
+            if block.isValid() and not block.isVisible():
+                # A folded region is stepped over at once, the layout knows the first block shown after it
+                shown = ce.cursorForPosition(QPoint(0, int(bottom) + 1)).block()
+                if shown.blockNumber() <= block_number or not shown.isVisible():
+                    break
+                block, block_number = shown, shown.blockNumber()
+                top = ce.blockBoundingGeometry(block).translated(ce.contentOffset()).top()
 
 
 class InfoBlock(QWidget):
@@ -176,13 +512,17 @@ class InfoBlock(QWidget):
         self.file_path_label = locm().bind(QLabel(self), 'notepad.info.path', qlabel_tooltip_setter)
 
         self.position_label = locm().bind(QLabel(self), 'notepad.info.cursor_position', qlabel_tooltip_setter)
-        self.editor.cursorPositionChanged.connect(self.__update_position)
+        self.editor.cursor_moved.connect(self.__update_position)
 
         self.binding_label = locm().bind(QLabel(self), 'notepad.info.file_type', qlabel_tooltip_setter)
 
+        self.encoding_label = locm().bind(QLabel(self), 'notepad.info.encoding', qlabel_tooltip_setter)
+        self.update_encoding_label()
+
         layout.addWidget(self.file_path_label)
         layout.addStretch()
         layout.addWidget(self.position_label)
+        layout.addWidget(self.encoding_label)
         layout.addWidget(self.binding_label)
 
         self.setLayout(layout)
@@ -191,20 +531,203 @@ class InfoBlock(QWidget):
     def update_file_path_label(self, txt: str):
         self.file_path_label.setText(txt)
 
+    def update_encoding_label(self):
+        self.encoding_label.setText(self.editor.encoding)
+
     def __update_position(self):
         cursor: QTextCursor = self.editor.textCursor()
         line = cursor.blockNumber()
         cursor_pos = cursor.positionInBlock()
         self.position_label.setText(f'{line}:{cursor_pos}')
 
-    def update_binding(self, binding: Binding):
+    def update_binding(self, binding: Binding | None):
+        editor = self.editor
         if binding:
             self.binding_label.setText(binding.name)
-            editor = self.editor
 
-            if binding.highlighter_type is not None:
-                highlighter_type = binding.highlighter_type
-                self.highlighter = highlighter_type(editor.document())
-        else:
+        processor_type = binding.processor_type if binding else None
+        if processor_type is None:
+            editor.set_processor(None)
+        elif type(editor.processor) is not processor_type:
+            editor.set_processor(processor_type(editor.document(), editor.changes, editor))
+
+        self.set_highlighter(binding.highlighter_type if binding else None)
+
+    # A highlighter of the same type is kept with the formats it applied, another one is detached first:
+    # its formats are cleared, the text and its undo history stay as they are
+    def set_highlighter(self, highlighter_type: type | None):
+        if highlighter_type is not None and type(self.highlighter) is highlighter_type:
+            return
+        editor = self.editor
+
+        if self.highlighter is not None:
+            if isinstance(self.highlighter, RuleBasedHighlighter):
+                editor.updateRequest.disconnect(self.highlighter.update_viewport)
+            detach_highlighter(self.highlighter)
+            self.highlighter.deleteLater()
             self.highlighter = None
-            self.editor.setPlainText(self.editor.toPlainText())
+
+        if highlighter_type is not None:
+            self.highlighter = highlighter_type(editor.document())
+            if isinstance(self.highlighter, RuleBasedHighlighter):
+                self.highlighter.viewport_range = editor.visible_block_range
+                editor.updateRequest.connect(self.highlighter.update_viewport)
+
+
+class FindBar(QWidget):
+    def __init__(self, parent, editor: CodeEditor):
+        super().__init__(parent)
+        self.editor = editor
+        self.search = TextSearch(editor.document(), self)
+        editor.search = self.search
+        # Matches replaced by the last replace all, shown until another search action
+        self.__replaced: int | None = None
+
+        self.find_edit = locm().bind(QLineEdit(self), 'notepad.find.find', placeholder_setter)
+        self.case_box = locm().bind(QCheckBox(self), 'notepad.find.match_case')
+        self.regex_box = locm().bind(QCheckBox(self), 'notepad.find.regex')
+        self.status_label = QLabel(self)
+        # A growing counter must not relayout the editor, that is expensive for large documents
+        self.status_label.setFixedWidth(self.status_label.fontMetrics().horizontalAdvance('0000000/0000000 …'))
+        previous_button = locm().bind(QPushButton(self), 'notepad.find.previous')
+        next_button = locm().bind(QPushButton(self), 'notepad.find.next')
+        close_button = locm().bind(QPushButton(self), 'notepad.find.close')
+
+        self.replace_row = QWidget(self)
+        self.replace_edit = locm().bind(QLineEdit(self.replace_row), 'notepad.find.replace', placeholder_setter)
+        replace_button = locm().bind(QPushButton(self.replace_row), 'notepad.find.replace_one')
+        replace_all_button = locm().bind(QPushButton(self.replace_row), 'notepad.find.replace_all')
+
+        find_layout = QHBoxLayout()
+        find_layout.setContentsMargins(0, 0, 0, 0)
+        find_layout.addWidget(self.find_edit)
+        find_layout.addWidget(self.case_box)
+        find_layout.addWidget(self.regex_box)
+        find_layout.addWidget(self.status_label)
+        find_layout.addWidget(previous_button)
+        find_layout.addWidget(next_button)
+        find_layout.addWidget(close_button)
+
+        replace_layout = QHBoxLayout()
+        replace_layout.setContentsMargins(0, 0, 0, 0)
+        replace_layout.addWidget(self.replace_edit)
+        replace_layout.addWidget(replace_button)
+        replace_layout.addWidget(replace_all_button)
+        self.replace_row.setLayout(replace_layout)
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(4, 2, 4, 0)
+        layout.setSpacing(2)
+        layout.addLayout(find_layout)
+        layout.addWidget(self.replace_row)
+        self.setLayout(layout)
+
+        self.find_edit.textChanged.connect(self.__update_pattern)
+        self.find_edit.returnPressed.connect(self.find_next)
+        self.case_box.toggled.connect(self.__update_pattern)
+        self.regex_box.toggled.connect(self.__update_pattern)
+        self.replace_edit.returnPressed.connect(self.replace)
+        previous_button.clicked.connect(self.find_previous)
+        next_button.clicked.connect(self.find_next)
+        close_button.clicked.connect(self.close_bar)
+        replace_button.clicked.connect(self.replace)
+        replace_all_button.clicked.connect(self.replace_all)
+
+        self.search.changed.connect(self.__update_status)
+        self.search.changed.connect(self.editor.update_match_selections)
+        self.editor.cursor_moved.connect(self.__update_status)
+
+    def open(self, replace: bool = False):
+        self.replace_row.setVisible(replace)
+        self.show()
+
+        cursor = self.editor.textCursor()
+        selected = cursor.selectedText()
+        # Multi-line selections are not taken as a query, selectedText() separates lines with U+2029
+        if selected and '\u2029' not in selected:
+            self.find_edit.setText(re.escape(selected) if self.regex_box.isChecked() else selected)
+        self.find_edit.setFocus()
+        self.find_edit.selectAll()
+
+    def close_bar(self):
+        self.search.set_pattern(None)
+        self.hide()
+        self.editor.setFocus()
+
+    def keyPressEvent(self, event: QKeyEvent):
+        if event.key() == Qt.Key.Key_Escape:
+            self.close_bar()
+            return
+        super().keyPressEvent(event)
+
+    def find_next(self):
+        self.__forget_replaced()
+        self.__select(self.search.match_after(self.editor.textCursor().selectionEnd()))
+
+    def find_previous(self):
+        self.__forget_replaced()
+        self.__select(self.search.match_before(self.editor.textCursor().selectionStart()))
+
+    def replace(self):
+        self.__forget_replaced()
+        if self.editor.isReadOnly() or self.search.pattern is None:
+            return
+
+        cursor = self.editor.textCursor()
+        idx = self.search.index_of(cursor.selectionStart(), cursor.selectionEnd())
+        if idx is not None:
+            replacement = self.search.expand(idx, self.__template())
+            if replacement is not None:
+                cursor.insertText(replacement)
+        self.find_next()
+
+    def replace_all(self):
+        if self.editor.isReadOnly():
+            return
+        replaced = self.search.replace_all(self.__template())
+        # Kept in the status while the matches left are searched again
+        self.__replaced = replaced
+        self.__update_status()
+
+    def __forget_replaced(self):
+        if self.__replaced is not None:
+            self.__replaced = None
+            self.__update_status()
+
+    # Without regex the replacement is taken literally, backslashes included
+    def __template(self) -> str:
+        template = self.replace_edit.text()
+        return template if self.regex_box.isChecked() else template.replace('\\', '\\\\')
+
+    def __select(self, idx: int | None):
+        if idx is None:
+            return
+        start, end = self.search.span(idx)
+        cursor = self.editor.textCursor()
+        cursor.setPosition(start)
+        cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+        self.editor.setTextCursor(cursor)
+
+    def __update_pattern(self):
+        query = self.find_edit.text()
+        try:
+            pattern = compile_query(query, self.regex_box.isChecked(), self.case_box.isChecked()) if query else None
+        except re.error:
+            pattern = None
+        self.__replaced = None
+        self.search.set_pattern(pattern)
+
+    def __update_status(self):
+        if not self.find_edit.text():
+            self.status_label.setText('')
+        elif self.__replaced is not None:
+            self.status_label.setText(locm().localize('notepad.find.replaced') % self.__replaced)
+        elif self.search.pattern is None:
+            self.status_label.setText(locm().localize('notepad.find.invalid'))
+        elif self.search.count() == 0 and not self.search.is_running():
+            self.status_label.setText(locm().localize('notepad.find.no_matches'))
+        else:
+            cursor = self.editor.textCursor()
+            idx = self.search.index_of(cursor.selectionStart(), cursor.selectionEnd())
+            current = '-' if idx is None else idx + 1
+            self.status_label.setText(f'{current}/{self.search.count()}' + (' …' if self.search.is_running() else ''))
@@ -1,4 +1,5 @@
-from PyQt6.QtWidgets import QDialog, QInputDialog
+from PyQt6.QtGui import QFontDatabase
+from PyQt6.QtWidgets import QDialog, QInputDialog, QDialogButtonBox, QPlainTextEdit, QVBoxLayout
 
 from utility.locale import LocaleManager
 
@@ -23,3 +24,27 @@ def getItemAt(parent: any, title: str, label: str, items: list[str], index: int)
         ok_pressed = True
 
     return selected, ok_pressed
+
+
+def showReport(parent: any, title: str, report: str, save: callable = None):
+    dialog = QDialog(parent)
+    dialog.setWindowTitle(title)
+    dialog.resize(900, 500)
+
+    text = QPlainTextEdit(dialog)
+    text.setReadOnly(True)
+    text.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+    text.setFont(QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont))
+    text.setPlainText(report)
+
+    buttons = QDialogButtonBox(dialog)
+    buttons.addButton(locm().localize('button.close'), QDialogButtonBox.ButtonRole.RejectRole)
+    buttons.rejected.connect(dialog.reject)
+    if save is not None:
+        save_button = buttons.addButton(locm().localize('button.save'), QDialogButtonBox.ButtonRole.ActionRole)
+        save_button.clicked.connect(save)
+
+    layout = QVBoxLayout(dialog)
+    layout.addWidget(text)
+    layout.addWidget(buttons)
+    dialog.exec()
@@ -0,0 +1,170 @@
+from PyQt6.QtGui import QFont, QPainter, QColor
+from PyQt6.QtWidgets import QAbstractScrollArea, QWidget, QLabel, QHBoxLayout, QVBoxLayout
+
+from ext.document_io import LineIndex
+from window.components.code_editor import LineNumberArea, qlabel_tooltip_setter
+from utility.locale import LocaleManager
+
+locm = LocaleManager.get_instance
+
+
+class FileViewerWrapper(QWidget):
+    def __init__(self, index: LineIndex, parent=None):
+        super().__init__(parent)
+        vbox = QVBoxLayout()
+
+        self.viewer = FileViewer(index, self)
+        vbox.addWidget(self.viewer)
+
+        self.info_block = ViewerInfoBlock(self, self.viewer)
+        vbox.addWidget(self.info_block)
+
+        self.setLayout(vbox)
+
+
+# Read-only view over a LineIndex: only the lines in the viewport are ever decoded and drawn
+class FileViewer(QAbstractScrollArea):
+    def __init__(self, index: LineIndex, parent=None):
+        super().__init__(parent)
+        self.index = index
+        self.setFont(QFont("JetBrains Mono", 12))
+        self.line_number_area = ViewerLineNumberArea(self)
+
+        self.text_color = QColor(0, 0, 0)
+        self.tab_width = 4
+        self.is_edited = False
+
+        self.__max_width_px = 0
+
+        self.index.progress.connect(self.__on_indexed)
+        self.__on_indexed()
+
+    def blockCount(self) -> int:
+        return self.index.line_count()
+
+    def line_height_px(self) -> int:
+        return self.fontMetrics().lineSpacing()
+
+    def first_visible_line(self) -> int:
+        return self.verticalScrollBar().value()
+
+    def visible_line_count(self) -> int:
+        return self.viewport().height() // self.line_height_px() + 1
+
+    def visible_block_range(self) -> tuple[int, int]:
+        first = self.first_visible_line()
+        return first, min(first + self.visible_line_count(), self.blockCount()) - 1
+
+    def goto(self, line: int):
+        self.verticalScrollBar().setValue(max(0, line - self.visible_line_count() // 2))
+        self.setFocus()
+
+    def close_file(self):
+        self.index.close()
+
+    def __on_indexed(self, *_):
+        self.__update_scroll_range()
+        self.setViewportMargins(self.line_number_area.width_px(), 0, 0, 0)
+        self.line_number_area.update_on_resize(self.contentsRect())
+        self.line_number_area.update()
+        self.viewport().update()
+
+    def __update_scroll_range(self):
+        page = max(1, self.viewport().height() // self.line_height_px())
+        vertical = self.verticalScrollBar()
+        vertical.setPageStep(page)
+        vertical.setRange(0, max(0, self.blockCount() - page))
+
+        horizontal = self.horizontalScrollBar()
+        horizontal.setPageStep(self.viewport().width())
+        horizontal.setRange(0, max(0, self.__max_width_px - self.viewport().width()))
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.__update_scroll_range()
+        self.line_number_area.update_on_resize(self.contentsRect())
+
+    def scrollContentsBy(self, dx, dy):
+        self.viewport().update()
+        if dy:
+            self.line_number_area.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        painter.setPen(self.text_color)
+        metrics = self.fontMetrics()
+        line_height = self.line_height_px()
+        left = 4 - self.horizontalScrollBar().value()
+
+        y = 0
+        for line in self.index.lines(self.first_visible_line(), self.visible_line_count()):
+            text = line.expandtabs(self.tab_width)
+            painter.drawText(left, y + metrics.ascent(), text)
+            y += line_height
+
+            width = metrics.horizontalAdvance(text) + 8
+            if width > self.__max_width_px:
+                self.__max_width_px = width
+                self.__update_scroll_range()
+
+
+class ViewerLineNumberArea(LineNumberArea):
+    def __init__(self, viewer: FileViewer):
+        super().__init__(viewer)
+        self.__viewer = viewer
+        self.fold_markers = False
+
+    def paintEvent(self, event):
+        viewer = self.__viewer
+
+        painter = QPainter(self)
+        painter.fillRect(event.rect(), self.bg_color)
+
+        line_height = viewer.line_height_px()
+        number_right = self.width() - 5
+        painter.setPen(self.nums_color)
+        first, last = viewer.visible_block_range()
+        top = 0
+        for line in range(first, last + 1):
+            self.draw_number(painter, number_right, top, line + 1)
+            top += line_height
+
+
+class ViewerInfoBlock(QWidget):
+    def __init__(self, parent, viewer: FileViewer):
+        super().__init__(parent)
+        self.viewer = viewer
+        layout = QHBoxLayout()
+        layout.setContentsMargins(4, 2, 4, 0)
+        layout.setSpacing(6)
+
+        self.highlighter = None
+
+        self.file_path_label = locm().bind(QLabel(self), 'notepad.info.path', qlabel_tooltip_setter)
+        self.lines_label = locm().bind(QLabel(self), 'notepad.info.lines', qlabel_tooltip_setter)
+        self.encoding_label = locm().bind(QLabel(self), 'notepad.info.encoding', qlabel_tooltip_setter)
+        self.encoding_label.setText(viewer.index.encoding)
+        self.mode_label = locm().bind(QLabel(self), 'notepad.info.read_only')
+
+        layout.addWidget(self.file_path_label)
+        layout.addStretch()
+        layout.addWidget(self.lines_label)
+        layout.addWidget(self.encoding_label)
+        layout.addWidget(self.mode_label)
+
+        self.setLayout(layout)
+        self.setFixedHeight(self.sizeHint().height())
+
+        self.viewer.index.progress.connect(self.__update_lines)
+        self.__update_lines()
+
+    def update_file_path_label(self, txt: str):
+        self.file_path_label.setText(txt)
+
+    def __update_lines(self, *_):
+        index = self.viewer.index
+        lines = index.line_count()
+        if index.is_complete():
+            self.lines_label.setText(f'{lines}')
+        else:
+            self.lines_label.setText(f'{lines}+ ({index.indexed_bytes * 100 // max(1, index.total_bytes)}%)')
@@ -0,0 +1,46 @@
+from PyQt6.QtCore import Qt, pyqtSignal
+from PyQt6.QtWidgets import QWidget, QTreeWidget, QTreeWidgetItem, QVBoxLayout
+
+from ext.code_processor import Symbol
+
+
+# Symbols of the current tab as a tree, a click goes to the definition. Items refer to symbols by index, so the
+# location is looked up when activated and follows edits made since the tree was built
+class OutlinePanel(QWidget):
+    symbol_activated = pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.tree = QTreeWidget(self)
+        self.tree.setHeaderHidden(True)
+        self.tree.setUniformRowHeights(True)
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(4, 2, 4, 2)
+        layout.addWidget(self.tree)
+        self.setLayout(layout)
+
+        self.tree.itemClicked.connect(self.__on_item_activated)
+        self.tree.itemActivated.connect(self.__on_item_activated)
+
+    def show_symbols(self, symbols: list[Symbol]):
+        self.tree.clear()
+        # Items of the enclosing symbols, one per depth
+        parents: list[QTreeWidgetItem] = []
+        items = []
+        for symbol_idx, symbol in enumerate(symbols):
+            item = QTreeWidgetItem([symbol.name])
+            item.setToolTip(0, f'{symbol.kind} {symbol.name}')
+            item.setData(0, Qt.ItemDataRole.UserRole, symbol_idx)
+
+            del parents[symbol.depth:]
+            if parents:
+                parents[-1].addChild(item)
+            else:
+                items.append(item)
+            parents.append(item)
+        self.tree.addTopLevelItems(items)
+        self.tree.expandAll()
+
+    def __on_item_activated(self, item: QTreeWidgetItem):
+        self.symbol_activated.emit(item.data(0, Qt.ItemDataRole.UserRole))
@@ -0,0 +1,17 @@
+from pathlib import Path
+
+from PyQt6.QtWidgets import QWidget
+
+
+# Stands in for a file tab that was never activated or was reclaimed while idle: no editor, document or highlighter
+class TabPlaceholder(QWidget):
+    def __init__(self, file_path: Path, parent=None):
+        super().__init__(parent)
+        self.file_path = file_path
+        # Set for reclaimed tabs: gzip compressed text, its file encoding and where the view was left
+        self.blob: bytes | None = None
+        self.encoding: str | None = None
+        self.disk_state: tuple[int, int] | None = None
+        self.disk_digest: bytes | None = None
+        self.cursor_position = 0
+        self.scroll_value = 0
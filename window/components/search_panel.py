@@ -0,0 +1,132 @@
+import re
+from pathlib import Path
+
+from PyQt6.QtCore import Qt, pyqtSignal
+from PyQt6.QtWidgets import QWidget, QLineEdit, QCheckBox, QPushButton, QLabel, QTreeWidget, QTreeWidgetItem, \
+    QHBoxLayout, QVBoxLayout, QFileDialog
+
+from ext.file_search import FolderSearch, FileMatches, compile_file_query
+from utility.bindng import BINARY_SUFFIXES, text_suffixes
+from utility.locale import LocaleManager
+from window.components.code_editor import placeholder_setter
+
+locm = LocaleManager.get_instance
+
+
+# Find in folder: results are listed per file as they stream in, a click opens the matching line
+class SearchPanel(QWidget):
+    location_activated = pyqtSignal(Path, int, int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.search: FolderSearch | None = None
+
+        self.folder_edit = locm().bind(QLineEdit(self), 'notepad.find_in_folder.folder', placeholder_setter)
+        browse_button = locm().bind(QPushButton(self), 'notepad.find_in_folder.browse')
+        self.query_edit = locm().bind(QLineEdit(self), 'notepad.find.find', placeholder_setter)
+        self.case_box = locm().bind(QCheckBox(self), 'notepad.find.match_case')
+        self.regex_box = locm().bind(QCheckBox(self), 'notepad.find.regex')
+        self.search_button = locm().bind(QPushButton(self), 'notepad.find_in_folder.search')
+        self.cancel_button = locm().bind(QPushButton(self), 'button.cancel')
+        self.cancel_button.setEnabled(False)
+        self.status_label = QLabel(self)
+
+        self.results = QTreeWidget(self)
+        self.results.setHeaderHidden(True)
+        self.results.setUniformRowHeights(True)
+
+        query_layout = QHBoxLayout()
+        query_layout.setContentsMargins(0, 0, 0, 0)
+        query_layout.addWidget(self.folder_edit, 1)
+        query_layout.addWidget(browse_button)
+        query_layout.addWidget(self.query_edit, 2)
+        query_layout.addWidget(self.case_box)
+        query_layout.addWidget(self.regex_box)
+        query_layout.addWidget(self.search_button)
+        query_layout.addWidget(self.cancel_button)
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(4, 2, 4, 2)
+        layout.addLayout(query_layout)
+        layout.addWidget(self.results)
+        layout.addWidget(self.status_label)
+        self.setLayout(layout)
+
+        browse_button.clicked.connect(self.__browse)
+        self.query_edit.returnPressed.connect(self.start_search)
+        self.search_button.clicked.connect(self.start_search)
+        self.cancel_button.clicked.connect(self.cancel_search)
+        self.results.itemClicked.connect(self.__on_item_activated)
+        self.results.itemActivated.connect(self.__on_item_activated)
+
+    def open(self, folder: Path | None = None):
+        if folder is not None and not self.folder_edit.text():
+            self.folder_edit.setText(str(folder))
+        self.query_edit.setFocus()
+        self.query_edit.selectAll()
+
+    def start_search(self):
+        self.cancel_search()
+        self.results.clear()
+
+        folder = Path(self.folder_edit.text()).expanduser()
+        query = self.query_edit.text()
+        if not query or not folder.is_dir():
+            self.status_label.setText(locm().localize('notepad.find_in_folder.no_folder') if query else '')
+            return
+        try:
+            pattern = compile_file_query(query, self.regex_box.isChecked(), self.case_box.isChecked())
+        except re.error:
+            self.status_label.setText(locm().localize('notepad.find.invalid'))
+            return
+
+        self.search = FolderSearch(folder.resolve(), pattern, set(BINARY_SUFFIXES), text_suffixes(), self)
+        self.search.matched.connect(self.__on_matched)
+        self.search.finished.connect(self.__on_finished)
+        self.cancel_button.setEnabled(True)
+        self.status_label.setText('…')
+        self.search.start()
+
+    def cancel_search(self):
+        if self.search is not None and self.search.is_running():
+            self.search.cancel()
+
+    def __browse(self):
+        folder = QFileDialog.getExistingDirectory(self, locm().localize('notepad.find_in_folder.browse'),
+                                                  self.folder_edit.text())
+        if folder:
+            self.folder_edit.setText(folder)
+
+    def __on_matched(self, results: list[FileMatches]):
+        if self.sender() is not self.search:
+            return
+
+        root = Path(self.search.root)
+        for file_matches in results:
+            path = Path(file_matches.path)
+            file_item = QTreeWidgetItem([f'{path.relative_to(root)} ({len(file_matches.matches)})'])
+            file_item.setData(0, Qt.ItemDataRole.UserRole, (path, 0, 0))
+            file_item.addChildren([
+                QTreeWidgetItem([f'{match.line + 1}: {match.text.strip()}'])
+                for match in file_matches.matches
+            ])
+            for item_idx, match in enumerate(file_matches.matches):
+                file_item.child(item_idx).setData(0, Qt.ItemDataRole.UserRole, (path, match.line, match.column))
+            self.results.addTopLevelItem(file_item)
+        self.status_label.setText(f'{self.search.matches_count} / {self.search.files_count} …')
+
+    def __on_finished(self):
+        if self.sender() is not self.search:
+            return
+
+        self.cancel_button.setEnabled(False)
+        status = locm().localize('notepad.find_in_folder.status') % (self.search.matches_count,
+                                                                       self.search.files_count)
+        if self.search.truncated:
+            status += ' ' + locm().localize('notepad.find_in_folder.truncated')
+        self.status_label.setText(status)
+
+    def __on_item_activated(self, item: QTreeWidgetItem):
+        location = item.data(0, Qt.ItemDataRole.UserRole)
+        if location is not None:
+            self.location_activated.emit(*location)
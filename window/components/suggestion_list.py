@@ -1,13 +1,43 @@
+from PyQt6.QtCore import Qt, QSize, QPoint
+from PyQt6.QtWidgets import QListWidget
+
+# Params
+VISIBLE_ROWS = 8
+
+
+# Shown over the editor without taking its focus: the editor keeps receiving keys and forwards navigation ones
 class SuggestionList(QListWidget):
     def __init__(self, parent):
         super().__init__(parent)
         self.setMaximumHeight(100)
         self.hide()
-        self.setWindowFlags(Qt.WindowType.Popup)
+        self.setFocusPolicy(Qt.FocusPolicy.NoFocus)
+        self.setUniformItemSizes(True)
 
     def sizeHint(self):
         return QSize(200, 100)
 
+    # Below the given point, or above it when there is no room left under it
+    def show_words(self, words: list[str], pos: QPoint, line_height: int):
+        self.clear()
+        self.addItems(words)
+        self.setCurrentRow(0)
+
+        height = min(len(words), VISIBLE_ROWS) * self.sizeHintForRow(0) + 2 * self.frameWidth()
+        self.setFixedSize(self.sizeHint().width(), height)
+        parent_rect = self.parentWidget().rect()
+        x = min(pos.x(), max(0, parent_rect.width() - self.width()))
+        y = pos.y() if pos.y() + height <= parent_rect.height() else max(0, pos.y() - line_height - height)
+        self.move(x, y)
+        self.show()
+        self.raise_()
+
+    def select_next(self):
+        self.setCurrentRow((self.currentRow() + 1) % self.count())
+
+    def select_previous(self):
+        self.setCurrentRow((self.currentRow() - 1) % self.count())
+
     def keyPressEvent(self, event):
         if event.key() == Qt.Key.Key_Return or event.key() == Qt.Key.Key_Enter:
             # Apply the currently selected suggestion
@@ -1,13 +1,27 @@
 from pathlib import Path
+from time import monotonic
+from uuid import uuid4
 
-from PyQt6.QtGui import QAction, QKeySequence, QCloseEvent
-from PyQt6.QtWidgets import QMainWindow, QMenu, QFileDialog, QMessageBox, QTabWidget
+from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtGui import QAction, QKeySequence, QCloseEvent, QTextCursor
+from PyQt6.QtWidgets import QMainWindow, QMenu, QFileDialog, QMessageBox, QTabWidget, QDockWidget
 
 from window.components.code_editor import CodeEditor, CodeEditorWrapper, InfoBlock
+from window.components.file_viewer import FileViewerWrapper
+from window.components.placeholder import TabPlaceholder
+from window.components.search_panel import SearchPanel
+from window.components.outline_panel import OutlinePanel
 from utility.bindng import match_binding_by_path
 from utility.locale import LocaleManager
 from utility.icon import find_icon
-from window.components.dialog import getItemAt
+from utility.session import Session, load_session, save_session
+from window.components.dialog import getItemAt, showReport
+from ext.code_highlight import RuleBasedHighlighter
+from ext.code_profiler import RuleProfiler, format_report
+from ext.code_processor import find_definition
+import ext.document_io
+from ext.document_io import DocumentLoader, DocumentWriter, DocumentCompressor, DocumentReloader, LineIndex
+from ext.file_watcher import FileWatcher, file_state, apply_line_diff
 
 locm = LocaleManager.get_instance
 
@@ -29,17 +43,42 @@ class Notepad(QMainWindow):
         self.tabs = QTabWidget(self)
         self.tabs.setTabsClosable(True)
         self.tabs.tabCloseRequested.connect(self.__on_tab_closed)
-
-        self.new_file()
+        self.tabs.currentChanged.connect(self.__on_tab_activated)
+        self.__materializing = False
+        self.__watcher = FileWatcher(self)
+        self.__watcher.file_changed.connect(self.__on_file_changed)
+        # Created on first use
+        self.__search_dock: QDockWidget | None = None
+        self.__outline_dock: QDockWidget | None = None
+        self.tabs.currentChanged.connect(self.__update_outline)
+
+        session = load_session()
+        if session is not None and session.files:
+            self.open_paths([Path(file) for file in session.files], session.current)
+        if self.tabs.count() == 0:
+            self.new_file()
         self.setCentralWidget(self.tabs)
 
         self.__init_menu_file()
+        self.__init_menu_edit()
         self.__init_menu_settings()
 
         self.setGeometry(100, 100, 800, 600)
         locm().bind(self, 'notepad.title', window_title_setter)
         self.setWindowIcon(find_icon('tlex'))
 
+        self.__autosave_timer = QTimer(self)
+        self.__autosave_timer.setInterval(ext.document_io.AUTOSAVE_INTERVAL_MS)
+        self.__autosave_timer.timeout.connect(self.autosave)
+        if ext.document_io.SWAP_PATH is not None:
+            self.__autosave_timer.start()
+
+        self.__reclaim_timer = QTimer(self)
+        self.__reclaim_timer.setInterval(ext.document_io.IDLE_CHECK_INTERVAL_MS)
+        self.__reclaim_timer.timeout.connect(self.reclaim_idle_tabs)
+        if ext.document_io.IDLE_TAB_S is not None:
+            self.__reclaim_timer.start()
+
     def __init_menu_file(self):
         menu_file: QMenu = locm().bind(self.menuBar().addMenu('menu_file'), 'notepad.menu.file', menu_title_setter)
 
@@ -62,19 +101,82 @@ class Notepad(QMainWindow):
         action_save_file_as.triggered.connect(self.save_file_as)
         menu_file.addAction(action_save_file_as)
 
+        action_cancel_file_operation = locm().bind(QAction(self), 'notepad.action.cancel_file_operation')
+        action_cancel_file_operation.triggered.connect(self.cancel_file_operation)
+        menu_file.addAction(action_cancel_file_operation)
+
+    def __init_menu_edit(self):
+        menu_edit: QMenu = locm().bind(self.menuBar().addMenu('menu_edit'), 'notepad.menu.edit', menu_title_setter)
+
+        action_find = locm().bind(QAction(self), 'notepad.action.find')
+        action_find.setShortcut(QKeySequence.StandardKey.Find)
+        action_find.triggered.connect(self.find)
+        menu_edit.addAction(action_find)
+
+        action_replace = locm().bind(QAction(self), 'notepad.action.replace')
+        action_replace.setShortcut(QKeySequence.StandardKey.Replace)
+        action_replace.triggered.connect(self.replace)
+        menu_edit.addAction(action_replace)
+
+        action_find_next = locm().bind(QAction(self), 'notepad.action.find_next')
+        action_find_next.setShortcut(QKeySequence.StandardKey.FindNext)
+        action_find_next.triggered.connect(self.find_next)
+        menu_edit.addAction(action_find_next)
+
+        action_find_previous = locm().bind(QAction(self), 'notepad.action.find_previous')
+        action_find_previous.setShortcut(QKeySequence.StandardKey.FindPrevious)
+        action_find_previous.triggered.connect(self.find_previous)
+        menu_edit.addAction(action_find_previous)
+
+        action_find_in_folder = locm().bind(QAction(self), 'notepad.action.find_in_folder')
+        action_find_in_folder.setShortcut(QKeySequence('Ctrl+Shift+F'))
+        action_find_in_folder.triggered.connect(self.find_in_folder)
+        menu_edit.addAction(action_find_in_folder)
+
+        action_outline = locm().bind(QAction(self), 'notepad.action.outline')
+        action_outline.setShortcut(QKeySequence('Ctrl+Shift+O'))
+        action_outline.triggered.connect(self.show_outline)
+        menu_edit.addAction(action_outline)
+
+        action_goto_definition = locm().bind(QAction(self), 'notepad.action.goto_definition')
+        action_goto_definition.setShortcut(QKeySequence('F12'))
+        action_goto_definition.triggered.connect(self.goto_definition)
+        menu_edit.addAction(action_goto_definition)
+
+        action_toggle_fold = locm().bind(QAction(self), 'notepad.action.toggle_fold')
+        action_toggle_fold.setShortcut(QKeySequence('Ctrl+Shift+['))
+        action_toggle_fold.triggered.connect(self.toggle_fold)
+        menu_edit.addAction(action_toggle_fold)
+
     def closeEvent(self, event: QCloseEvent):
+        save_session(self.session())
         while self.tabs.count() != 0:
             if not self.__on_tab_closed(0):
                 event.ignore()
                 return
+        if self.__search_dock is not None:
+            self.__search_dock.widget().cancel_search()
         event.accept()
 
     def __on_tab_closed(self, tab_idx: int) -> bool:
+        if isinstance(self.tabs.widget(tab_idx), TabPlaceholder):
+            placeholder = self.tabs.widget(tab_idx)
+            self.tabs.removeTab(tab_idx)
+            placeholder.deleteLater()
+            self.__watch_tabs()
+            return True
+        if isinstance(self.tabs.widget(tab_idx), FileViewerWrapper):
+            self.tabs.widget(tab_idx).viewer.close_file()
+            self.__remove_tab(tab_idx)
+            return True
+
         editor_wrapper: CodeEditorWrapper = self.tabs.widget(tab_idx)
         editor: CodeEditor = editor_wrapper.editor
 
+        if editor.is_loading():
+            editor.loader.cancel()
         if not editor.is_edited:
-            self.tabs.removeTab(tab_idx)
+            self.__remove_tab(tab_idx)
             return True
         file_name = self.tabs.tabToolTip(tab_idx)
         if len(file_name) == 0:
@@ -86,10 +188,22 @@ class Notepad(QMainWindow):
         description = locm().localize('notepad.window.close_tab.description') % file_name
         reply = QMessageBox.question(self, title, description)
         if reply == QMessageBox.StandardButton.Yes:
-            self.tabs.removeTab(tab_idx)
+            self.__remove_tab(tab_idx)
             return True
         return False
 
+    # Closed tabs give up their swap file, only a crash leaves one behind
+    def __remove_tab(self, tab_idx: int):
+        editor_wrapper = self.tabs.widget(tab_idx)
+        if isinstance(editor_wrapper, CodeEditorWrapper):
+            self.__drop_swap(editor_wrapper.editor)
+        self.tabs.removeTab(tab_idx)
+
+        # A pending save still reports to its editor, the tab is freed with it otherwise
+        if not isinstance(editor_wrapper, CodeEditorWrapper) or not editor_wrapper.editor.is_saving():
+            editor_wrapper.deleteLater()
+        self.__watch_tabs()
+
     def __init_menu_settings(self):
         menu_settings: QMenu = locm().bind(self.menuBar().addMenu('menu_settings'), 'notepad.menu.settings',
                                            menu_title_setter)
@@ -98,7 +212,12 @@ class Notepad(QMainWindow):
         action_change_language.triggered.connect(self.change_language)
         menu_settings.addAction(action_change_language)
 
-    def __create_new_tab(self, file_path: str | Path, file_data: str | None, focus: bool = True) -> int:
+        action_profile_highlighting = locm().bind(QAction(self), 'notepad.action.profile_highlighting')
+        action_profile_highlighting.triggered.connect(self.toggle_highlighting_profile)
+        menu_settings.addAction(action_profile_highlighting)
+
+    def __create_new_tab(self, file_path: str | Path, file_data: str | None, focus: bool = True,
+                         tab_idx: int = -1) -> int:
         editor_wrapper: CodeEditorWrapper = CodeEditorWrapper(self)
         editor: CodeEditor = editor_wrapper.editor
         info: InfoBlock = editor_wrapper.info_block
@@ -106,7 +225,7 @@ class Notepad(QMainWindow):
         if file_data:
             editor.setPlainText(file_data)
 
-        tab_idx = self.tabs.addTab(editor_wrapper, str(file_path))
+        tab_idx = self.tabs.insertTab(tab_idx, editor_wrapper, str(file_path))
         if isinstance(file_path, Path):
             self.__update_tab_state(tab_idx, file_path)
         else:
@@ -114,14 +233,25 @@ class Notepad(QMainWindow):
             self.tabs.setTabIcon(tab_idx, icon)
             info.hide()
 
-        def follow_editor_state(_editor: CodeEditor):
-            tab_idx = self.tabs.indexOf(_editor.parent())
+        # Only fires when the text becomes edited, or unedited again through undo, not on every change
+        def follow_editor_state(edited: bool):
+            if editor.is_loading():
+                return
+            tab_idx = self.tabs.indexOf(editor_wrapper)
             tab_name = self.tabs.tabText(tab_idx)
 
-            if _editor.is_edited and not tab_name.endswith('*'):
+            if edited and not tab_name.endswith('*'):
                 self.tabs.setTabText(tab_idx, tab_name + '*')
+            elif not edited and tab_name.endswith('*'):
+                self.tabs.setTabText(tab_idx, tab_name[:-1])
+
+        editor.document().modificationChanged.connect(follow_editor_state)
+
+        def follow_symbols():
+            if self.tabs.currentWidget() is editor_wrapper:
+                self.__update_outline()
 
-        editor.code_changed.connect(follow_editor_state)
+        editor.symbols_changed.connect(follow_symbols)
 
         if focus:
             self.tabs.setCurrentIndex(tab_idx)
@@ -131,27 +261,193 @@ class Notepad(QMainWindow):
         self.__create_new_tab('New', None)
 
     def open_file(self):
-        filename, _ = QFileDialog.getOpenFileName(self, locm().localize('notepad.window.open_file.title'))
-        if not filename:
+        filenames, _ = QFileDialog.getOpenFileNames(self, locm().localize('notepad.window.open_file.title'))
+        if filenames:
+            self.open_paths([Path(filename) for filename in filenames])
+
+    # Tabs start as placeholders holding path, icon and title; a tab is really opened on first activation
+    def open_paths(self, file_paths: list[Path], current: int = 0):
+        first_idx = self.tabs.count()
+        # Close buttons are cheaper to create in one pass than tab by tab
+        self.tabs.setTabsClosable(False)
+        self.__materializing = True
+        try:
+            for file_path in file_paths:
+                binding = match_binding_by_path(file_path)
+                icon = binding.icon if binding else find_icon('unknown')
+                tab_idx = self.tabs.addTab(TabPlaceholder(file_path), icon, file_path.name)
+                self.tabs.setTabToolTip(tab_idx, str(file_path))
+        finally:
+            self.__materializing = False
+            self.tabs.setTabsClosable(True)
+        self.__watch_tabs()
+
+        current_idx = first_idx + min(max(current, 0), len(file_paths) - 1)
+        if self.tabs.currentIndex() == current_idx:
+            self.__on_tab_activated(current_idx)
+        else:
+            self.tabs.setCurrentIndex(current_idx)
+
+    def session(self) -> Session:
+        files, current = [], 0
+        for tab_idx in range(self.tabs.count()):
+            stored_path_str = self.tabs.tabToolTip(tab_idx)
+            if not stored_path_str:
+                continue
+            if tab_idx == self.tabs.currentIndex():
+                current = len(files)
+            files.append(stored_path_str)
+        return Session(files, current)
+
+    def __on_tab_activated(self, tab_idx: int):
+        if isinstance(self.tabs.widget(tab_idx), CodeEditorWrapper):
+            self.tabs.widget(tab_idx).editor.idle_since = None
+        if self.__materializing or not isinstance(self.tabs.widget(tab_idx), TabPlaceholder):
+            return
+
+        placeholder: TabPlaceholder = self.tabs.widget(tab_idx)
+        self.__materializing = True
+        try:
+            self.tabs.removeTab(tab_idx)
+            self.__open_path(placeholder.file_path, tab_idx, placeholder)
+        finally:
+            self.__materializing = False
+            placeholder.deleteLater()
+        # Opening failed and the tab is gone: the neighbour Qt switched to meanwhile was not activated
+        if isinstance(self.tabs.currentWidget(), TabPlaceholder):
+            self.__on_tab_activated(self.tabs.currentIndex())
+
+    def __open_path(self, file_path: Path, tab_idx: int = -1, placeholder: TabPlaceholder | None = None):
+        # A tab reclaimed with its text compressed comes back as it was left, the file is unchanged since then
+        if placeholder is not None and placeholder.blob is not None:
+            self.__load_tab(file_path, file_path, tab_idx, placeholder=placeholder)
             return
-        file_path = Path(filename)
 
         try:
             file_size = file_path.stat().st_size
-            if file_size > 1024 * 1024 * 2:
-                raise RuntimeWarning("Operation with files larger than 2Mb is not yet implemented")
+        except Exception as e:
+            title = locm().localize('notepad.window.error.title')
+            description = locm().localize('notepad.window.open_file.error')
+            QMessageBox.critical(self, title, f'{description}. {e}')
+            return
+
+        if file_size >= ext.document_io.VIEWER_MIN_BYTES:
+            self.__open_viewer_tab(file_path, tab_idx)
+            return
 
-            with open(filename, 'r') as f:
-                file_data = f.read()
+        source_path = file_path
+        swap_path = ext.document_io.swap_file_path(str(file_path.resolve()))
+        if swap_path is not None and swap_path.exists():
+            title = locm().localize('notepad.window.question.title')
+            description = locm().localize('notepad.window.recover.description') % file_path
+            if QMessageBox.question(self, title, description) == QMessageBox.StandardButton.Yes:
+                source_path = swap_path
+            else:
+                ext.document_io.drop_swap(swap_path)
+        self.__load_tab(file_path, source_path, tab_idx, source_path is swap_path, placeholder)
+
+    # The tab is bound to the file (highlighter included) once the whole text is streamed in
+    def __load_tab(self, file_path: Path, source_path: Path, tab_idx: int = -1, recovered: bool = False,
+                   placeholder: TabPlaceholder | None = None):
+        tab_idx = self.__create_new_tab(file_path.name, None, tab_idx=tab_idx)
+        self.tabs.setTabToolTip(tab_idx, str(file_path))
+        editor: CodeEditor = self.tabs.widget(tab_idx).editor
+        editor.setReadOnly(True)
 
-            self.__create_new_tab(file_path, file_data)
+        if placeholder is not None:
+            # A tab reclaimed without its text is read again in the encoding it was opened with
+            blob, encoding = placeholder.blob, placeholder.encoding
+            view = placeholder.cursor_position, placeholder.scroll_value
+        else:
+            blob = encoding = view = None
+        # Taken before reading, changes made meanwhile are caught up once the load finishes
+        editor.disk_state = placeholder.disk_state if blob is not None else file_state(file_path)
+        editor.disk_digest = placeholder.disk_digest if blob is not None else None
+
+        # A swap file is UTF-8, the tab keeps the encoding of its file
+        file_encoding = None
+        if recovered:
+            file_encoding = encoding or ext.document_io.detect_file_encoding(file_path)
+            file_encoding = file_encoding or ext.document_io.DEFAULT_ENCODING
+            encoding = ext.document_io.SWAP_ENCODING
+
+        loader = DocumentLoader(source_path, editor.document(), encoding, blob, parent=editor)
+        loader.progress.connect(lambda loaded, total: self.__on_load_progress(editor, file_path, loaded, total))
+        loader.finished.connect(lambda: self.__on_load_finished(editor, file_path, recovered, view, file_encoding))
+        loader.failed.connect(lambda error: self.__on_load_failed(editor, error))
+        editor.loader = loader
+        loader.start()
+
+    # Too large to be edited: mapped read-only, lines are indexed in background and decoded on paint
+    def __open_viewer_tab(self, file_path: Path, tab_idx: int = -1):
+        index = LineIndex(file_path)
+        try:
+            index.open()
         except Exception as e:
+            index.close()
             title = locm().localize('notepad.window.error.title')
             description = locm().localize('notepad.window.open_file.error')
             QMessageBox.critical(self, title, f'{description}. {e}')
+            return
+
+        viewer_wrapper = FileViewerWrapper(index, self)
+        viewer_wrapper.info_block.update_file_path_label(str(file_path))
+        binding = match_binding_by_path(file_path)
+        icon = binding.icon if binding else find_icon('unknown')
+
+        tab_idx = self.tabs.insertTab(tab_idx, viewer_wrapper, icon, file_path.name)
+        self.tabs.setTabToolTip(tab_idx, str(file_path))
+        self.tabs.setCurrentIndex(tab_idx)
+        index.start()
+
+    def __on_load_progress(self, editor: CodeEditor, file_path: Path, loaded: int, total: int):
+        tab_idx = self.tabs.indexOf(editor.parent())
+        if tab_idx != -1 and total > 0:
+            self.tabs.setTabText(tab_idx, f'{file_path.name} {loaded * 100 // total}%')
+
+    def __on_load_finished(self, editor: CodeEditor, file_path: Path, recovered: bool,
+                           view: tuple[int, int] | None = None, file_encoding: str | None = None):
+        editor.encoding = file_encoding or editor.loader.encoding
+        editor.parent().info_block.update_encoding_label()
+        # The file may have grown while it was read, the text holds what was read of it
+        if not recovered and editor.loader.read_bytes is not None and editor.disk_state is not None:
+            editor.disk_state = editor.disk_state[0], editor.loader.read_bytes
+            editor.disk_digest = editor.loader.read_digest
+        editor.loader = None
+        editor.setReadOnly(False)
+        editor.highlight_current_line()
+
+        tab_idx = self.tabs.indexOf(editor.parent())
+        if tab_idx == -1:
+            return
+
+        self.__update_tab_state(tab_idx, file_path)
+        if recovered:
+            editor.is_edited = True
+            editor.swap_revision = editor.document().revision()
+            self.tabs.setTabText(tab_idx, file_path.name + '*')
+        if view is not None:
+            cursor_position, scroll_value = view
+            cursor = editor.textCursor()
+            cursor.setPosition(min(cursor_position, editor.document().characterCount() - 1))
+            editor.setTextCursor(cursor)
+            editor.verticalScrollBar().setValue(scroll_value)
+        self.__sync_with_disk(editor, file_path)
+
+    def __on_load_failed(self, editor: CodeEditor, error: str):
+        editor.loader = None
+        tab_idx = self.tabs.indexOf(editor.parent())
+        if tab_idx != -1:
+            self.__remove_tab(tab_idx)
+
+        title = locm().localize('notepad.window.error.title')
+        description = locm().localize('notepad.window.open_file.error')
+        QMessageBox.critical(self, title, f'{description}. {error}')
 
     def save_file(self):
         tab_idx = self.tabs.currentIndex()
+        if not self.__is_editable_tab(tab_idx):
+            return
         stored_path_str = self.tabs.tabToolTip(tab_idx)
 
         if len(stored_path_str) == 0:
@@ -165,8 +461,6 @@ class Notepad(QMainWindow):
             return
 
         self.__save_file(stored_path, tab_idx)
-        self.__update_tab_state(tab_idx, stored_path)
-        editor.is_edited = False
 
     def save_file_as(self) -> bool:
         filename, _ = QFileDialog.getSaveFileName(self, locm().localize('notepad.window.save_file.title'))
@@ -175,10 +469,18 @@ class Notepad(QMainWindow):
         file_path = Path(filename)
 
         tab_idx = self.tabs.currentIndex()
-        self.__save_file(filename, tab_idx)
-        self.__update_tab_state(tab_idx, file_path)
+        if not self.__is_editable_tab(tab_idx):
+            return False
+        self.__save_file(file_path, tab_idx)
         return True
 
+    def __is_editable_tab(self, tab_idx: int) -> bool:
+        editor_wrapper = self.tabs.widget(tab_idx)
+        if not isinstance(editor_wrapper, CodeEditorWrapper):
+            return False
+        editor: CodeEditor = editor_wrapper.editor
+        return not editor.is_loading() and not editor.is_saving()
+
     def __update_tab_state(self, tab_idx: int, file_path: Path):
         editor_wrapper: CodeEditorWrapper = self.tabs.widget(tab_idx)
         info: InfoBlock = editor_wrapper.info_block
@@ -198,20 +500,195 @@ class Notepad(QMainWindow):
         self.tabs.setTabIcon(tab_idx, icon)
         self.tabs.setTabText(tab_idx, file_path.name)
         self.tabs.setTabToolTip(tab_idx, str(file_path))
+        self.__watch_tabs()
 
-    def __save_file(self, filename: str | Path, tab_idx: int):
-        try:
-            editor_wrapper: CodeEditorWrapper = self.tabs.widget(tab_idx)
-            editor: CodeEditor = editor_wrapper.editor
-            file_data = editor.toPlainText()
+    # The text is snapshotted here and written by a worker; edits made meanwhile mark the tab edited again
+    def __save_file(self, file_path: Path, tab_idx: int):
+        editor_wrapper: CodeEditorWrapper = self.tabs.widget(tab_idx)
+        editor: CodeEditor = editor_wrapper.editor
+
+        writer = DocumentWriter(file_path, editor.toPlainText(), editor.encoding, editor)
+        writer.finished.connect(lambda: self.__on_save_finished(editor, file_path))
+        writer.failed.connect(lambda error: self.__on_save_failed(editor, error))
+        writer.unencodable.connect(lambda error: self.__on_save_unencodable(editor, file_path, error))
+        writer.cancelled.connect(lambda: self.__on_save_failed(editor, None))
+        editor.writer = writer
+        editor.is_edited = False
 
-            with open(filename, 'w') as f:
-                f.write(file_data)
+        self.tabs.setTabText(tab_idx, f'{self.__tab_name(tab_idx)} …')
+        writer.start()
 
-        except Exception as e:
+    def __on_save_finished(self, editor: CodeEditor, file_path: Path):
+        writer, editor.writer = editor.writer, None
+        editor.disk_state, editor.disk_digest = writer.disk_state, writer.disk_digest
+        self.__drop_swap(editor)
+        tab_idx = self.tabs.indexOf(editor.parent())
+        if tab_idx == -1:
+            return
+
+        self.__update_tab_state(tab_idx, file_path)
+        if editor.is_edited:
+            self.tabs.setTabText(tab_idx, file_path.name + '*')
+
+    def __on_save_failed(self, editor: CodeEditor, error: str | None):
+        editor.writer = None
+        editor.is_edited = True
+        tab_idx = self.tabs.indexOf(editor.parent())
+        if tab_idx != -1:
+            self.tabs.setTabText(tab_idx, self.__tab_name(tab_idx) + '*')
+
+        if error is not None:
             title = locm().localize('notepad.window.error.title')
             error_description = locm().localize('notepad.window.save_file.error')
-            QMessageBox.critical(self, title, f'{error_description}. {e}')
+            QMessageBox.critical(self, title, f'{error_description}. {error}')
+
+    # The file is left as it was, saving again as UTF-8 is offered
+    def __on_save_unencodable(self, editor: CodeEditor, file_path: Path, error: str):
+        self.__on_save_failed(editor, None)
+        tab_idx = self.tabs.indexOf(editor.parent())
+        if tab_idx == -1:
+            return
+
+        title = locm().localize('notepad.window.question.title')
+        description = locm().localize('notepad.window.save_file.unencodable') % (editor.encoding, error)
+        if QMessageBox.question(self, title, description) != QMessageBox.StandardButton.Yes:
+            return
+        editor.encoding = ext.document_io.DEFAULT_ENCODING
+        editor.parent().info_block.update_encoding_label()
+        if self.__is_editable_tab(tab_idx):
+            self.__save_file(file_path, tab_idx)
+
+    def __tab_name(self, tab_idx: int) -> str:
+        return self.tabs.tabText(tab_idx).removesuffix('*').removesuffix(' …')
+
+    def cancel_file_operation(self):
+        editor_wrapper = self.tabs.currentWidget()
+        if not isinstance(editor_wrapper, CodeEditorWrapper):
+            return
+
+        editor: CodeEditor = editor_wrapper.editor
+        if editor.is_saving():
+            editor.writer.cancel()
+        elif editor.is_loading():
+            # A partially loaded text is not worth keeping open
+            editor.loader.cancel()
+            editor.loader = None
+            self.__remove_tab(self.tabs.indexOf(editor_wrapper))
+
+    def find(self):
+        editor_wrapper = self.tabs.currentWidget()
+        if isinstance(editor_wrapper, CodeEditorWrapper):
+            editor_wrapper.show_find_bar()
+
+    def replace(self):
+        editor_wrapper = self.tabs.currentWidget()
+        if isinstance(editor_wrapper, CodeEditorWrapper):
+            editor_wrapper.show_find_bar(replace=True)
+
+    def find_next(self):
+        editor_wrapper = self.tabs.currentWidget()
+        if isinstance(editor_wrapper, CodeEditorWrapper) and editor_wrapper.find_bar is not None:
+            editor_wrapper.find_bar.find_next()
+
+    def find_previous(self):
+        editor_wrapper = self.tabs.currentWidget()
+        if isinstance(editor_wrapper, CodeEditorWrapper) and editor_wrapper.find_bar is not None:
+            editor_wrapper.find_bar.find_previous()
+
+    def toggle_fold(self):
+        editor_wrapper = self.tabs.currentWidget()
+        if isinstance(editor_wrapper, CodeEditorWrapper):
+            editor_wrapper.editor.toggle_fold()
+
+    def find_in_folder(self):
+        if self.__search_dock is None:
+            self.__search_dock = locm().bind(QDockWidget(self), 'notepad.find_in_folder.title', window_title_setter)
+            search_panel = SearchPanel(self.__search_dock)
+            search_panel.location_activated.connect(self.open_location)
+            self.__search_dock.setWidget(search_panel)
+            self.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self.__search_dock)
+
+        stored_path_str = self.tabs.tabToolTip(self.tabs.currentIndex())
+        self.__search_dock.show()
+        self.__search_dock.widget().open(Path(stored_path_str).parent if stored_path_str else None)
+
+    def open_location(self, file_path: Path, line: int, column: int = 0):
+        tab_idx = self.__find_tab(file_path)
+        if tab_idx == -1:
+            self.open_paths([file_path])
+        else:
+            self.tabs.setCurrentIndex(tab_idx)
+        # Opening may have failed, leaving another tab current
+        tab_idx = self.__find_tab(file_path)
+        if tab_idx != self.tabs.currentIndex():
+            return
+
+        wrapper = self.tabs.currentWidget()
+        if isinstance(wrapper, CodeEditorWrapper):
+            wrapper.editor.goto(line, column)
+        elif isinstance(wrapper, FileViewerWrapper):
+            wrapper.viewer.goto(line)
+
+    def show_outline(self):
+        if self.__outline_dock is None:
+            self.__outline_dock = locm().bind(QDockWidget(self), 'notepad.outline.title', window_title_setter)
+            outline_panel = OutlinePanel(self.__outline_dock)
+            outline_panel.symbol_activated.connect(self.__on_symbol_activated)
+            self.__outline_dock.setWidget(outline_panel)
+            self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea, self.__outline_dock)
+
+        self.__outline_dock.show()
+        self.__update_outline()
+
+    def __update_outline(self):
+        if self.__outline_dock is None or self.__outline_dock.isHidden():
+            return
+        editor_wrapper = self.tabs.currentWidget()
+        processor = editor_wrapper.editor.processor if isinstance(editor_wrapper, CodeEditorWrapper) else None
+        self.__outline_dock.widget().show_symbols(processor.symbols() if processor is not None else [])
+
+    def __on_symbol_activated(self, symbol_idx: int):
+        editor_wrapper = self.tabs.currentWidget()
+        if not isinstance(editor_wrapper, CodeEditorWrapper) or editor_wrapper.editor.processor is None:
+            return
+        symbols = editor_wrapper.editor.processor.symbols()
+        if symbol_idx < len(symbols):
+            editor_wrapper.editor.goto(symbols[symbol_idx].line, symbols[symbol_idx].column)
+
+    # Looks in the current tab, then in the other open ones; a definition is preferred to an import of the name
+    def goto_definition(self):
+        current_wrapper = self.tabs.currentWidget()
+        if not isinstance(current_wrapper, CodeEditorWrapper):
+            return
+        name = current_wrapper.editor.word_under_cursor()
+        if not name:
+            return
+
+        current_idx = self.tabs.currentIndex()
+        found = None
+        for tab_idx in [current_idx] + [idx for idx in range(self.tabs.count()) if idx != current_idx]:
+            editor_wrapper = self.tabs.widget(tab_idx)
+            if not isinstance(editor_wrapper, CodeEditorWrapper) or editor_wrapper.editor.processor is None:
+                continue
+            symbol = find_definition(editor_wrapper.editor.processor.symbols(), name)
+            if symbol is not None and (found is None or found[1].kind == 'import'):
+                found = (tab_idx, symbol)
+                if symbol.kind != 'import':
+                    break
+        if found is None:
+            return
+
+        tab_idx, symbol = found
+        self.tabs.setCurrentIndex(tab_idx)
+        self.tabs.widget(tab_idx).editor.goto(symbol.line, symbol.column)
+
+    def __find_tab(self, file_path: Path) -> int:
+        file_path = file_path.resolve()
+        for tab_idx in range(self.tabs.count()):
+            stored_path_str = self.tabs.tabToolTip(tab_idx)
+            if stored_path_str and Path(stored_path_str).resolve() == file_path:
+                return tab_idx
+        return -1
 
     def change_language(self):
         lm = locm()
@@ -226,3 +703,219 @@ class Notepad(QMainWindow):
         idx, ok_pressed = getItemAt(self, title_txt, call_to_action_txt, items, current_item)
         if ok_pressed:
             locm().set_locale(locales[idx])
+
+    # First call starts profiling the current tab highlighter, the next one stops it and shows the report
+    def toggle_highlighting_profile(self):
+        editor_wrapper = self.tabs.currentWidget()
+        highlighter = editor_wrapper.info_block.highlighter if isinstance(editor_wrapper, CodeEditorWrapper) else None
+        if not isinstance(highlighter, RuleBasedHighlighter):
+            title = locm().localize('notepad.window.warning.title')
+            QMessageBox.warning(self, title, locm().localize('notepad.window.profile_highlighting.unavailable'))
+            return
+
+        if highlighter.profiler is None:
+            highlighter.start_profiling()
+            return
+
+        profiler = highlighter.stop_profiling()
+        title = locm().localize('notepad.window.profile_highlighting.title')
+        showReport(self, title, format_report(profiler.report()), lambda: self.__save_profile(profiler))
+
+    def __save_profile(self, profiler: RuleProfiler):
+        filename, _ = QFileDialog.getSaveFileName(self, locm().localize('notepad.window.save_file.title'),
+                                                  'highlighting-profile.json')
+        if not filename:
+            return
+
+        try:
+            profiler.dump(filename)
+        except Exception as e:
+            title = locm().localize('notepad.window.error.title')
+            error_description = locm().localize('notepad.window.save_file.error')
+            QMessageBox.critical(self, title, f'{error_description}. {e}')
+
+    # Only tabs edited since their last snapshot are written; text is snapshotted here, written by a worker
+    def autosave(self):
+        for tab_idx in range(self.tabs.count()):
+            editor_wrapper = self.tabs.widget(tab_idx)
+            if not isinstance(editor_wrapper, CodeEditorWrapper):
+                continue
+
+            editor: CodeEditor = editor_wrapper.editor
+            revision = editor.document().revision()
+            if not editor.is_edited or editor.is_loading() or revision == editor.swap_revision:
+                continue
+
+            if editor.swap_path is None:
+                stored_path_str = self.tabs.tabToolTip(tab_idx)
+                swap_key = str(Path(stored_path_str).resolve()) if stored_path_str else f'untitled:{uuid4().hex}'
+                editor.swap_path = ext.document_io.swap_file_path(swap_key)
+            if editor.swap_path is None:
+                return
+
+            ext.document_io.save_swap(editor.swap_path, editor.toPlainText())
+            editor.swap_revision = revision
+
+    def __drop_swap(self, editor: CodeEditor):
+        if editor.swap_path is not None:
+            ext.document_io.drop_swap(editor.swap_path)
+        editor.swap_path = None
+        editor.swap_revision = -1
+
+    # Unmodified file tabs left in background for IDLE_TAB_S give their editor, document and highlighter up
+    def reclaim_idle_tabs(self):
+        now = monotonic()
+        for tab_idx in range(self.tabs.count()):
+            editor_wrapper = self.tabs.widget(tab_idx)
+            if not isinstance(editor_wrapper, CodeEditorWrapper) or tab_idx == self.tabs.currentIndex():
+                continue
+
+            editor: CodeEditor = editor_wrapper.editor
+            if editor.idle_since is None:
+                editor.idle_since = now
+                continue
+            if now - editor.idle_since < ext.document_io.IDLE_TAB_S or not self.__is_reclaimable(editor):
+                continue
+
+            if ext.document_io.IDLE_TAB_COMPRESS:
+                self.__compress_tab(editor)
+            else:
+                self.__reclaim_tab(editor)
+
+    def __is_reclaimable(self, editor: CodeEditor) -> bool:
+        tab_idx = self.tabs.indexOf(editor.parent())
+        return (tab_idx not in (-1, self.tabs.currentIndex()) and editor.idle_since is not None
+                and len(self.tabs.tabToolTip(tab_idx)) != 0 and not editor.is_edited
+                and not editor.is_loading() and not editor.is_saving())
+
+    def __compress_tab(self, editor: CodeEditor):
+        if editor.compressor is not None:
+            return
+
+        revision = editor.document().revision()
+        compressor = DocumentCompressor(editor.toPlainText(), editor)
+        compressor.finished.connect(lambda blob: self.__reclaim_tab(editor, blob, revision))
+        # Reloading from disk is still better than keeping the document
+        compressor.failed.connect(lambda _: self.__reclaim_tab(editor))
+        editor.compressor = compressor
+        compressor.start()
+
+    # Without a blob the text is reloaded from disk on activation
+    def __reclaim_tab(self, editor: CodeEditor, blob: bytes | None = None, revision: int | None = None):
+        editor.compressor = None
+        # The tab may have been focused, edited or closed while its text was compressed
+        if not self.__is_reclaimable(editor) or (revision is not None and revision != editor.document().revision()):
+            return
+
+        editor_wrapper: CodeEditorWrapper = editor.parent()
+        tab_idx = self.tabs.indexOf(editor_wrapper)
+        placeholder = TabPlaceholder(Path(self.tabs.tabToolTip(tab_idx)))
+        placeholder.blob = blob
+        placeholder.encoding = editor.encoding
+        placeholder.disk_state = editor.disk_state
+        placeholder.disk_digest = editor.disk_digest
+        placeholder.cursor_position = editor.textCursor().position()
+        placeholder.scroll_value = editor.verticalScrollBar().value()
+
+        icon, tab_name = self.tabs.tabIcon(tab_idx), self.tabs.tabText(tab_idx)
+        self.__materializing = True
+        try:
+            self.tabs.removeTab(tab_idx)
+            self.tabs.insertTab(tab_idx, placeholder, icon, tab_name)
+            self.tabs.setTabToolTip(tab_idx, str(placeholder.file_path))
+        finally:
+            self.__materializing = False
+        editor_wrapper.deleteLater()
+
+    def __watch_tabs(self):
+        self.__watcher.set_paths(filter(None, (self.tabs.tabToolTip(tab_idx) for tab_idx in range(self.tabs.count()))))
+
+    def __on_file_changed(self, path_str: str):
+        for tab_idx in range(self.tabs.count()):
+            if self.tabs.tabToolTip(tab_idx) != path_str:
+                continue
+
+            widget = self.tabs.widget(tab_idx)
+            if isinstance(widget, TabPlaceholder):
+                # The compressed text is stale, activation reads the file again
+                widget.blob = None
+            elif isinstance(widget, CodeEditorWrapper):
+                self.__sync_with_disk(widget.editor, Path(path_str))
+
+    # Only the lines changed on disk are replaced; edits of the tab are discarded if the user agrees
+    def __sync_with_disk(self, editor: CodeEditor, file_path: Path, whole: bool = False):
+        # Until the save is done, the change is likely the save itself
+        if editor.is_loading() or editor.writer is not None or editor.reloader is not None:
+            return
+        state = file_state(file_path)
+        if state is None or state == editor.disk_state:
+            return
+
+        # A file that grew since it was read, as a log does, is read from where the text ends
+        if not whole and not editor.is_edited and editor.disk_state is not None and editor.disk_digest is not None \
+                and ext.document_io.is_ascii_compatible(editor.encoding) \
+                and state[0] >= editor.disk_state[0] and state[1] > editor.disk_state[1]:
+            last_block = editor.document().lastBlock()
+            reloader = DocumentReloader(file_path, None, editor.encoding, editor, editor.disk_state[1],
+                                        editor.disk_digest, last_block.text(), last_block.blockNumber() + 1)
+            self.__start_reload(editor, file_path, reloader, editor.disk_state)
+            return
+
+        if editor.is_edited:
+            # Asked once per change, even if more of them come while the question is open
+            editor.disk_state = state
+            title = locm().localize('notepad.window.question.title')
+            description = locm().localize('notepad.window.file_changed.description') % file_path
+            if QMessageBox.question(self, title, description) != QMessageBox.StandardButton.Yes:
+                return
+
+        reloader = DocumentReloader(file_path, editor.toPlainText(), editor.encoding, editor)
+        self.__start_reload(editor, file_path, reloader, state)
+
+    def __start_reload(self, editor: CodeEditor, file_path: Path, reloader: DocumentReloader,
+                       failed_state: tuple[int, int] | None):
+        revision = editor.document().revision()
+        reloader.finished.connect(lambda: self.__on_reload_finished(editor, file_path, revision))
+        reloader.failed.connect(lambda _: self.__on_reload_failed(editor, failed_state))
+        editor.reloader = reloader
+        reloader.start()
+
+    def __on_reload_finished(self, editor: CodeEditor, file_path: Path, revision: int):
+        reloader, editor.reloader = editor.reloader, None
+        tab_idx = self.tabs.indexOf(editor.parent())
+        if tab_idx == -1:
+            return
+        # Typed into while the file was read, the diff no longer fits the text
+        if editor.document().revision() != revision:
+            self.__sync_with_disk(editor, file_path)
+            return
+        if reloader.replacements is None:
+            self.__sync_with_disk(editor, file_path, whole=True)
+            return
+
+        # The view stays on the same lines, or keeps following the end of a growing file
+        scroll_bar = editor.verticalScrollBar()
+        follow_end = scroll_bar.value() == scroll_bar.maximum()
+        anchor = QTextCursor(editor.firstVisibleBlock())
+        first_visible, scroll_value = anchor.blockNumber(), scroll_bar.value()
+
+        was_edited = editor.is_edited
+        apply_line_diff(editor.document(), reloader.replacements)
+        scroll_bar.setValue(scroll_bar.maximum() if follow_end else scroll_value + anchor.blockNumber() - first_visible)
+        editor.disk_state = reloader.disk_state
+        editor.disk_digest = reloader.disk_digest
+
+        # The text matches the file again; undoing the reload makes it edited
+        editor.is_edited = False
+        if was_edited:
+            self.__drop_swap(editor)
+            self.tabs.setTabText(tab_idx, file_path.name)
+        # Bytes left unread at the end of a tail are read with the next change, not in a loop
+        if file_state(file_path) != reloader.seen_state:
+            self.__sync_with_disk(editor, file_path)
+
+    def __on_reload_failed(self, editor: CodeEditor, state: tuple[int, int] | None):
+        editor.reloader = None
+        editor.disk_state = state
+        # The text may no longer match the file up to that state, growing is not trusted as an append then
+        editor.disk_digest = None